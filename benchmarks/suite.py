@@ -0,0 +1,315 @@
+"""Times and memory-profiles tiling, nodata removal and STAC creation on
+synthetic rasters, and compares the results of two runs.
+
+Each stage runs in a fresh process, so that its peak resident memory is its
+own. Python allocations, which include NumPy arrays but not GDAL's block
+cache, are traced separately.
+
+Usage:
+
+    python benchmarks/suite.py run results.json \
+        --raster-size 4000 --raster-size 8000 \
+        --tile-size 500 --tile-size 1000 --workers 1 --repeat 3
+    python benchmarks/suite.py compare baseline.json results.json
+"""
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from glob import glob
+from tempfile import TemporaryDirectory
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import click
+import numpy as np
+import rasterio
+from pystac import CatalogType
+from synthetic import LEFT_BOTTOM, parse_class_mix, write_raster
+
+import stactools.chesapeake_lulc
+from stactools.chesapeake_lulc import stac
+from stactools.chesapeake_lulc.constants import CollectionId, TileEngine
+from stactools.chesapeake_lulc.streaming import tile_collection
+from stactools.chesapeake_lulc.utils import remove_nodata, tile
+
+
+def _tile(raster: str, tiles: str, tmp_dir: str, tile_size: int,
+          workers: int) -> int:
+    return len(
+        tile(raster,
+             tmp_dir,
+             tile_size,
+             LEFT_BOTTOM,
+             workers=workers,
+             engine=TileEngine.RASTERIO))
+
+
+def _tile_skip_nodata(raster: str, tiles: str, tmp_dir: str, tile_size: int,
+                      workers: int) -> int:
+    return len(
+        tile(raster,
+             tmp_dir,
+             tile_size,
+             LEFT_BOTTOM,
+             workers=workers,
+             engine=TileEngine.RASTERIO,
+             skip_nodata=True))
+
+
+def _remove_nodata(raster: str, tiles: str, tmp_dir: str, tile_size: int,
+                   workers: int) -> int:
+    return len(
+        remove_nodata(tiles,
+                      os.path.join(tmp_dir, "nodata"),
+                      workers,
+                      dry_run=True))
+
+
+def _create_item(raster: str, tiles: str, tmp_dir: str, tile_size: int,
+                 workers: int) -> int:
+    hrefs = sorted(glob(os.path.join(tiles, "*.tif")))
+    for href in hrefs:
+        stac.create_item(href)
+    return len(hrefs)
+
+
+def _create_collection(raster: str, tiles: str, tmp_dir: str, tile_size: int,
+                       workers: int) -> int:
+    hrefs = sorted(glob(os.path.join(tiles, "*.tif")))
+    collection = stac.create_collection(CollectionId.LC7.value)
+    collection.set_self_href(os.path.join(tmp_dir, "collection.json"))
+    collection.catalog_type = CatalogType.SELF_CONTAINED
+    items, _ = stac.create_items(hrefs, workers=workers)
+    for item in items:
+        collection.add_item(item)
+    collection.make_all_asset_hrefs_relative()
+    collection.save()
+    return len(items)
+
+
+def _tile_collection(raster: str, tiles: str, tmp_dir: str, tile_size: int,
+                     workers: int) -> int:
+    tile_dir = os.path.join(tmp_dir, "tiles")
+    os.mkdir(tile_dir)
+    return len(
+        tile_collection(raster,
+                        tile_dir,
+                        os.path.join(tmp_dir, "collection"),
+                        CollectionId.LC7.value,
+                        tile_size,
+                        LEFT_BOTTOM,
+                        workers=workers))
+
+
+# The stages that take ``tiles`` read the tiles of the skip-nodata-free
+# tiling, written once per raster and tile size before they run.
+STAGES: Dict[str, Callable[[str, str, str, int, int], int]] = {
+    "tile": _tile,
+    "tile-skip-nodata": _tile_skip_nodata,
+    "remove-nodata": _remove_nodata,
+    "create-item": _create_item,
+    "create-collection": _create_collection,
+    "tile-collection": _tile_collection,
+}
+
+
+def _measure(stage: str, raster: str, tiles: str, tile_size: int,
+             workers: int) -> Dict[str, Any]:
+    """Runs a stage in the current process, returning its count of tiles or
+    Items, elapsed seconds and peak memory."""
+    with TemporaryDirectory() as tmp_dir:
+        tracemalloc.start()
+        start = time.perf_counter()
+        count = STAGES[stage](raster, tiles, tmp_dir, tile_size, workers)
+        seconds = time.perf_counter() - start
+        _, python_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != "darwin":
+        max_rss *= 1024
+    return {
+        "count": count,
+        "seconds": seconds,
+        "python_peak_bytes": python_peak,
+        "max_rss_bytes": max_rss,
+    }
+
+
+def _measure_in_process(stage: str, raster: str, tiles: str, tile_size: int,
+                        workers: int) -> Dict[str, Any]:
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1) as pool:
+        return pool.apply(_measure, (stage, raster, tiles, tile_size, workers))
+
+
+def environment() -> Dict[str, Any]:
+    """Describes the commit and machine the benchmarks ran on."""
+    try:
+        commit: Optional[str] = subprocess.run(["git", "rev-parse", "HEAD"],
+                                               cwd=os.path.dirname(
+                                                   os.path.abspath(__file__)),
+                                               capture_output=True,
+                                               text=True,
+                                               check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "created": datetime.now(timezone.utc).isoformat(),
+        "version": stactools.chesapeake_lulc.__version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "rasterio": rasterio.__version__,
+        "gdal": rasterio.__gdal_version__,
+    }
+
+
+@click.group()
+def cli() -> None:
+    pass
+
+
+@cli.command("run")
+@click.argument("OUTFILE")
+@click.option("-r",
+              "--raster-size",
+              "raster_sizes",
+              multiple=True,
+              type=int,
+              default=[4000, 8000],
+              help="Width and height of a synthetic raster in pixels")
+@click.option("-t",
+              "--tile-size",
+              "tile_sizes",
+              multiple=True,
+              type=int,
+              default=[500, 1000],
+              help="Tile size in meters")
+@click.option("-s",
+              "--stage",
+              "stages",
+              multiple=True,
+              type=click.Choice(list(STAGES)),
+              help="Stage to run, all by default")
+@click.option("-w", "--workers", default=1, help="Number of workers")
+@click.option("-n", "--repeat", default=3, help="Number of timed runs")
+@click.option("-m",
+              "--margin",
+              default=0.25,
+              help="Fraction of the raster width, from each edge, that is "
+              "nodata")
+@click.option("--class-mix",
+              help="Comma separated value=weight pairs, e.g. 1=5,2=3")
+def run(outfile: str, raster_sizes: List[int], tile_sizes: List[int],
+        stages: List[str], workers: int, repeat: int, margin: float,
+        class_mix: Optional[str]) -> None:
+    """Runs the benchmarks and writes the results to OUTFILE as JSON."""
+    stages = list(stages) or list(STAGES)
+    results = []
+    with TemporaryDirectory() as tmp_dir:
+        for raster_size in raster_sizes:
+            raster_dir = os.path.join(tmp_dir, str(raster_size))
+            os.mkdir(raster_dir)
+            raster = write_raster(raster_dir,
+                                  raster_size,
+                                  margin=margin,
+                                  class_mix=parse_class_mix(class_mix))
+            for tile_size in tile_sizes:
+                tiles = os.path.join(raster_dir, f"tiles-{tile_size}")
+                os.mkdir(tiles)
+                tile(raster,
+                     tiles,
+                     tile_size,
+                     LEFT_BOTTOM,
+                     engine=TileEngine.RASTERIO)
+                for stage in stages:
+                    runs = [
+                        _measure_in_process(stage, raster, tiles, tile_size,
+                                            workers) for _ in range(repeat)
+                    ]
+                    seconds = [run["seconds"] for run in runs]
+                    result = {
+                        "stage":
+                        stage,
+                        "raster_size":
+                        raster_size,
+                        "tile_size":
+                        tile_size,
+                        "workers":
+                        workers,
+                        "count":
+                        runs[0]["count"],
+                        "seconds":
+                        seconds,
+                        "best":
+                        min(seconds),
+                        "mean":
+                        sum(seconds) / len(seconds),
+                        "python_peak_bytes":
+                        max(run["python_peak_bytes"] for run in runs),
+                        "max_rss_bytes":
+                        max(run["max_rss_bytes"] for run in runs),
+                    }
+                    results.append(result)
+                    click.echo(
+                        f"{stage:>18} {raster_size:>6}px {tile_size:>5}m: "
+                        f"{result['count']:>5}, best {result['best']:.3f}s, "
+                        f"rss {result['max_rss_bytes'] / 2**20:.0f} MiB")
+    with open(outfile, "w") as file:
+        json.dump({
+            "environment": environment(),
+            "results": results
+        },
+                  file,
+                  indent=2)
+
+
+def _key(result: Dict[str, Any]) -> Tuple[str, int, int, int]:
+    return (result["stage"], result["raster_size"], result["tile_size"],
+            result["workers"])
+
+
+@cli.command("compare")
+@click.argument("BASELINE")
+@click.argument("CURRENT")
+@click.option("--threshold",
+              default=1.2,
+              help="Ratio of best times above which a stage has regressed")
+def compare(baseline: str, current: str, threshold: float) -> None:
+    """Compares the best times and peak memory of two runs, failing if any
+    stage is more than THRESHOLD times slower."""
+    with open(baseline) as file:
+        before = {
+            _key(result): result
+            for result in json.load(file)["results"]
+        }
+    with open(current) as file:
+        after = {_key(result): result for result in json.load(file)["results"]}
+
+    regressions = 0
+    for key in sorted(set(before) & set(after)):
+        ratio = after[key]["best"] / before[key]["best"]
+        rss_ratio = after[key]["max_rss_bytes"] / before[key]["max_rss_bytes"]
+        flag = ""
+        if ratio > threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        stage, raster_size, tile_size, workers = key
+        click.echo(f"{stage:>18} {raster_size:>6}px {tile_size:>5}m "
+                   f"w{workers}: {before[key]['best']:.3f}s -> "
+                   f"{after[key]['best']:.3f}s ({ratio:.2f}x), "
+                   f"rss {rss_ratio:.2f}x{flag}")
+    if regressions:
+        raise click.ClickException(f"{regressions} stages regressed")
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,158 @@
+"""Generates synthetic Chesapeake land cover and land use rasters.
+
+The rasters match the layout of the source data: uint8, ESRI:102039, 1 m
+pixels, 512 pixel internal tiles, deflate compression and overviews from
+2 to 64. Classes are drawn at random for square patches, weighted by a
+class mix, and a margin around the edges is nodata, so that tiling leaves
+empty tiles to remove.
+
+Usage:
+
+    python benchmarks/synthetic.py OUTDIR --size 20000 --margin 0.25 \
+        --collection chesapeake-lc-7 --class-mix 1=5,2=3,3=1
+"""
+import os
+from typing import Dict, List, Optional, Tuple
+
+import click
+import numpy as np
+import rasterio
+from rasterio.crs import CRS
+from rasterio.enums import Resampling
+from rasterio.transform import from_origin
+from rasterio.windows import Window
+
+from stactools.chesapeake_lulc.constants import (COG_BLOCKSIZE, COG_COMPRESS,
+                                                 CollectionId)
+
+# Class values, nodata value and file name prefix for each collection. The
+# prefixes let Metadata infer the collection from the tile names.
+COLLECTIONS: Dict[CollectionId, Tuple[List[int], int, str]] = {
+    CollectionId.LC7: (list(range(1, 8)), 15, "Synthetic_7class"),
+    CollectionId.LC13: (list(range(1, 14)), 0, "Synthetic_13Class"),
+    CollectionId.LU: (list(range(1, 18)), 0, "Synthetic_LU"),
+}
+
+CRS_CODE = "ESRI:102039"
+LEFT_BOTTOM = (1300000, 1770000)
+OVERVIEW_FACTORS = [2, 4, 8, 16, 32, 64]
+
+
+def write_raster(outdir: str,
+                 size: int,
+                 collection_id: CollectionId = CollectionId.LC7,
+                 margin: float = 0.25,
+                 class_mix: Optional[Dict[int, float]] = None,
+                 patch: int = 64,
+                 seed: int = 0) -> str:
+    """Writes a synthetic classification raster.
+
+    The raster is written one row of internal tiles at a time, so memory is
+    bounded by ``size * COG_BLOCKSIZE`` bytes.
+
+    Args:
+        outdir (str): Directory that will contain the raster.
+        size (int): Width and height in pixels, and so in meters.
+        collection_id (CollectionId): Collection whose classes and nodata
+            value are used.
+        margin (float): Fraction of the width, from each edge, that is
+            nodata.
+        class_mix (Optional[Dict[int, float]]): Relative weight of each
+            class value. Defaults to equal weights for all classes.
+        patch (int): Size in pixels of the squares of a single class.
+        seed (int): Seed of the random number generator.
+    Returns:
+        str: Path of the raster.
+    """
+    values, nodata, prefix = COLLECTIONS[collection_id]
+    if class_mix is None:
+        class_mix = {value: 1.0 for value in values}
+    unknown = set(class_mix) - set(values)
+    if unknown:
+        raise ValueError(
+            f"{collection_id.value} has no classes {sorted(unknown)}")
+    weights = np.array(list(class_mix.values()), dtype=float)
+
+    rng = np.random.default_rng(seed)
+    patches = -(-size // patch)
+    classes = rng.choice(np.array(list(class_mix), dtype=np.uint8),
+                         size=(patches, patches),
+                         p=weights / weights.sum())
+    low = int(size * margin)
+    high = size - low
+    cols = np.arange(size)
+    col_patches = cols // patch
+    valid_cols = (cols >= low) & (cols < high)
+
+    path = os.path.join(outdir, f"{prefix}_{size}.tif")
+    left, bottom = LEFT_BOTTOM
+    profile = {
+        "driver": "GTiff",
+        "width": size,
+        "height": size,
+        "count": 1,
+        "dtype": "uint8",
+        "crs": CRS.from_string(CRS_CODE),
+        "transform": from_origin(left, bottom + size, 1, 1),
+        "nodata": nodata,
+        "tiled": True,
+        "blockxsize": COG_BLOCKSIZE,
+        "blockysize": COG_BLOCKSIZE,
+        "compress": COG_COMPRESS,
+    }
+    with rasterio.open(path, "w", **profile) as dataset:
+        for row in range(0, size, COG_BLOCKSIZE):
+            rows = np.arange(row, min(row + COG_BLOCKSIZE, size))
+            data = classes[rows[:, None] // patch, col_patches]
+            valid = ((rows >= low) & (rows < high))[:, None] & valid_cols
+            data[~valid] = nodata
+            dataset.write(data, 1, window=Window(0, row, size, len(rows)))
+        dataset.build_overviews(OVERVIEW_FACTORS, Resampling.nearest)
+        dataset.update_tags(ns="rio_overview", resampling="nearest")
+    return path
+
+
+def parse_class_mix(value: Optional[str]) -> Optional[Dict[int, float]]:
+    """Parses a class mix given as ``value=weight`` pairs separated by
+    commas."""
+    if not value:
+        return None
+    mix = {}
+    for pair in value.split(","):
+        class_value, weight = pair.split("=")
+        mix[int(class_value)] = float(weight)
+    return mix
+
+
+@click.command()
+@click.argument("OUTDIR")
+@click.option("-s",
+              "--size",
+              default=10000,
+              help="Width and height in pixels (meters)")
+@click.option("-c",
+              "--collection",
+              default=CollectionId.LC7.value,
+              type=click.Choice([id.value for id in CollectionId]),
+              help="Collection whose classes and nodata value are used")
+@click.option("-m",
+              "--margin",
+              default=0.25,
+              type=click.FloatRange(0, 0.5),
+              help="Fraction of the width, from each edge, that is nodata")
+@click.option("--class-mix",
+              help="Comma separated value=weight pairs, e.g. 1=5,2=3")
+@click.option("--seed", default=0, help="Random seed")
+def main(outdir: str, size: int, collection: str, margin: float,
+         class_mix: Optional[str], seed: int) -> None:
+    path = write_raster(outdir,
+                        size,
+                        CollectionId(collection),
+                        margin,
+                        parse_class_mix(class_mix),
+                        seed=seed)
+    print(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Compares the gdal and rasterio tiling engines on the bundled test rasters.
+
+Usage:
+
+    python benchmarks/tile_engines.py --size 2500 --workers 1
+"""
+import os
+import shutil
+import time
+from glob import glob
+from tempfile import TemporaryDirectory
+
+import click
+
+from stactools.chesapeake_lulc.constants import TileEngine
+from stactools.chesapeake_lulc.utils import tile
+
+DATA_FILES = os.path.join(os.path.dirname(__file__), "..", "tests",
+                          "data-files")
+
+
+@click.command()
+@click.option("-s", "--size", default=2500, help="Tile size in meters")
+@click.option("-w", "--workers", default=1, help="Number of workers")
+@click.option("-r", "--repeat", default=3, help="Number of timed runs")
+def main(size: int, workers: int, repeat: int) -> None:
+    engines = [TileEngine.RASTERIO]
+    if shutil.which("gdal_translate"):
+        engines.insert(0, TileEngine.GDAL)
+    else:
+        print("gdal_translate not found, skipping the gdal engine")
+
+    for infile in sorted(glob(os.path.join(DATA_FILES, "*.tif"))):
+        print(os.path.basename(infile))
+        for engine in engines:
+            timings = []
+            for _ in range(repeat):
+                with TemporaryDirectory() as tmp_dir:
+                    start = time.perf_counter()
+                    outfiles = tile(infile,
+                                    tmp_dir,
+                                    size, (1300000, 1770000),
+                                    workers=workers,
+                                    engine=engine)
+                    timings.append(time.perf_counter() - start)
+            print(f"  {engine.value:>8}: {len(outfiles)} tiles, "
+                  f"best {min(timings):.3f}s, "
+                  f"mean {sum(timings) / len(timings):.3f}s")
+
+
+if __name__ == "__main__":
+    main()
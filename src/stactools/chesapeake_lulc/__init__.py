@@ -1,10 +1,15 @@
-import stactools.core
+from typing import Any
 
-from stactools.chesapeake_lulc.stac import create_collection, create_item
+__all__ = ['create_collection', 'create_item', 'create_items']
 
-__all__ = ['create_collection', 'create_item']
 
-stactools.core.use_fsspec()
+def __getattr__(name: str) -> Any:
+    # The STAC functions are imported on first use, since they pull in
+    # rasterio, shapely and pystac, which dominate the package import time.
+    if name in __all__:
+        from stactools.chesapeake_lulc import stac
+        return getattr(stac, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def register_plugin(registry):
@@ -0,0 +1,181 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import fsspec
+from stactools.core.io import ReadHrefModifier
+
+from stactools.chesapeake_lulc.instrumentation import metrics
+from stactools.chesapeake_lulc.metadata import Metadata, ReadStats
+
+DEFAULT_MAX_ENTRIES = 1000000
+
+
+class MetadataCache:
+    """On-disk SQLite cache of the values :class:`Metadata` reads from COGs.
+
+    Entries are keyed by href and a fingerprint of the file (size plus ETag
+    or modification time), so a changed file is read again. A file whose
+    file system reports neither is always read and never cached. When the
+    cache holds more than ``max_entries`` entries the least recently used
+    ones are evicted. The cache may be shared between threads.
+
+    Hits are recorded in memory and written in a single transaction when
+    the cache is closed, or before entries are evicted, so that a run that
+    only hits does not commit once per COG.
+    """
+
+    def __init__(self,
+                 path: str,
+                 max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._used: Dict[str, float] = {}
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute("CREATE TABLE IF NOT EXISTS metadata ("
+                                     "href TEXT PRIMARY KEY, "
+                                     "fingerprint TEXT NOT NULL, "
+                                     "data TEXT NOT NULL, "
+                                     "last_used REAL NOT NULL)")
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS metadata_last_used "
+                "ON metadata (last_used)")
+        self._count = self._connection.execute(
+            "SELECT COUNT(*) FROM metadata").fetchone()[0]
+
+    def __enter__(self) -> "MetadataCache":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute(
+                "SELECT COUNT(*) FROM metadata").fetchone()[0]
+
+    def close(self) -> None:
+        """Records the hits of this run and closes the database."""
+        with self._lock:
+            self._flush_used()
+        self._connection.close()
+
+    def get_metadata(self,
+                     href: str,
+                     read_href_modifier: Optional[ReadHrefModifier] = None,
+                     read_stats: Optional[ReadStats] = None) -> Metadata:
+        """Returns Metadata for the href, reading the COG only if the cache
+        has no entry for its current fingerprint.
+
+        Args:
+            href (str): HREF to a COG containing classification data.
+            read_href_modifier (Callable[[str], str]): An optional function
+                to modify the href (e.g. to add a token to a url).
+            read_stats (Optional[ReadStats]): Passed to :class:`Metadata` on a
+                cache miss.
+        Returns:
+            Metadata: Metadata for the COG.
+        """
+        modified_href = read_href_modifier(
+            href) if read_href_modifier else href
+        fingerprint = _fingerprint(modified_href)
+        if fingerprint is None:
+            with self._lock:
+                self.misses += 1
+                metrics.count("cache.miss")
+            return Metadata(href, read_href_modifier, read_stats)
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT fingerprint, data FROM metadata WHERE href = ?",
+                (href, )).fetchone()
+            if row is not None and row[0] == fingerprint:
+                self._used[href] = time.time()
+                self.hits += 1
+                metrics.count("cache.hit")
+                return Metadata.from_dict(href, json.loads(row[1]))
+
+        metadata = Metadata(href, read_href_modifier, read_stats)
+        data = json.dumps(metadata.to_dict())
+        with self._lock:
+            self.misses += 1
+            metrics.count("cache.miss")
+            with self._connection:
+                cursor = self._connection.execute(
+                    "UPDATE metadata SET fingerprint = ?, data = ?, "
+                    "last_used = ? WHERE href = ?",
+                    (fingerprint, data, time.time(), href))
+                if cursor.rowcount == 0:
+                    self._connection.execute(
+                        "INSERT INTO metadata VALUES (?, ?, ?, ?)",
+                        (href, fingerprint, data, time.time()))
+                    self._count += 1
+            self._used.pop(href, None)
+            if self._count > self.max_entries:
+                self._evict()
+        return metadata
+
+    def _flush_used(self) -> None:
+        """Writes the last use of each hit since the last flush."""
+        if not self._used:
+            return
+        with self._connection:
+            self._connection.executemany(
+                "UPDATE metadata SET last_used = ? WHERE href = ?",
+                [(used, href) for href, used in self._used.items()])
+        self._used.clear()
+
+    def _evict(self) -> None:
+        """Deletes the least recently used entries over ``max_entries``,
+        through the ``last_used`` index."""
+        self._flush_used()
+        with self._connection:
+            cursor = self._connection.execute(
+                "DELETE FROM metadata WHERE href IN (SELECT href FROM "
+                "metadata ORDER BY last_used LIMIT ?)",
+                (self._count - self.max_entries, ))
+        self._count -= cursor.rowcount
+
+
+def modified_time(href: str) -> Optional[float]:
+    """Returns the modification time of a file as a POSIX timestamp, or None
+    if the file system does not report one."""
+    if "://" not in href:
+        return os.stat(href).st_mtime
+    info = _info(href)
+    for key in ["LastModified", "last_modified", "mtime", "updated"]:
+        value = info.get(key)
+        if isinstance(value, datetime):
+            return value.timestamp()
+        elif isinstance(value, (int, float)):
+            return float(value)
+    return None
+
+
+def _fingerprint(href: str) -> Optional[str]:
+    """Returns the size and ETag, or modification time, of a file without
+    reading it, or None if the file system reports neither, since the size
+    alone does not identify a version of the file."""
+    if "://" not in href:
+        stat = os.stat(href)
+        return f"{stat.st_size}:{stat.st_mtime_ns}"
+    info = _info(href)
+    version = next(
+        (info[key] for key in
+         ["ETag", "etag", "LastModified", "last_modified", "mtime", "updated"]
+         if info.get(key)), None)
+    if version is None:
+        return None
+    return f"{info.get('size')}:{version}"
+
+
+def _info(href: str) -> Dict[str, Any]:
+    fs, path = fsspec.core.url_to_fs(href)
+    return fs.info(path)
@@ -1,15 +1,33 @@
+import json
 import os
-from typing import Optional
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 import click
 from click import Choice
 from pystac import CatalogType
 
-from stactools.chesapeake_lulc import stac
-from stactools.chesapeake_lulc.constants import (DEFAULT_LEFT_BOTTOM,
-                                                 DEFAULT_TILE_SIZE,
-                                                 CollectionId)
-from stactools.chesapeake_lulc.utils import remove_nodata, tile
+from stactools.chesapeake_lulc import constants, stac
+from stactools.chesapeake_lulc.cache import MetadataCache
+from stactools.chesapeake_lulc.constants import (DEFAULT_FOOTPRINT_TOLERANCE,
+                                                 CollectionId, ExportFormat,
+                                                 StatisticsMode, TileEngine,
+                                                 ValidationMode)
+from stactools.chesapeake_lulc.export import export_items
+from stactools.chesapeake_lulc.instrumentation import (Profiler, format_report,
+                                                       metrics)
+from stactools.chesapeake_lulc.metadata import ReadStats
+from stactools.chesapeake_lulc.query import TileQuery
+from stactools.chesapeake_lulc.reclassify import read_lut
+from stactools.chesapeake_lulc.streaming import (merge_collections,
+                                                 reclassify_collection,
+                                                 tile_collection,
+                                                 write_collection)
+from stactools.chesapeake_lulc.update import update_collection
+from stactools.chesapeake_lulc.utils import (parse_shard, remove_nodata,
+                                             shard_items, tile, tile_index,
+                                             write_manifest)
+from stactools.chesapeake_lulc.validation import (get_validator,
+                                                  validate_collection)
 
 
 def create_chesapeake_lulc_command(cli):
@@ -19,42 +37,206 @@ def create_chesapeake_lulc_command(cli):
         "chesapeake-lulc",
         short_help=("Commands for working with stactools-chesapeake-lulc"),
     )
-    def chesapeake_lulc():
-        pass
+    @click.option("--profile",
+                  is_flag=True,
+                  help="Print the calls and time of each stage at exit")
+    @click.option("--metrics-out",
+                  help="Write the calls and time of each stage to this JSON "
+                  "file at exit")
+    @click.option("--cprofile",
+                  "cprofile_path",
+                  help="Profile the main thread with cProfile and write the "
+                  "statistics to this file")
+    @click.option("--trace-memory",
+                  is_flag=True,
+                  help="Trace Python allocations and report the peak and the "
+                  "largest allocating lines")
+    @click.pass_context
+    def chesapeake_lulc(ctx: click.Context, profile: bool,
+                        metrics_out: Optional[str],
+                        cprofile_path: Optional[str],
+                        trace_memory: bool) -> None:
+        """Commands for working with stactools-chesapeake-lulc.
+
+        With --profile or --metrics-out, the time spent in each stage, e.g.
+        reading COG headers, reprojecting geometries, validating and writing
+        JSON, is recorded and reported once the command finishes.
+        """
+        if not (profile or metrics_out or cprofile_path or trace_memory):
+            return
+        profiler = Profiler(cprofile_path, trace_memory)
+
+        def report() -> None:
+            result = profiler.stop()
+            if metrics_out:
+                with open(metrics_out, "w") as file:
+                    json.dump(result, file, indent=2)
+            if profile or trace_memory or not metrics_out:
+                click.echo(format_report(result), err=True)
+
+        profiler.start()
+        ctx.call_on_close(report)
 
     @chesapeake_lulc.command("tile", help="Tiles the input file to a grid")
-    @click.argument("INFILE")
+    @click.argument("INFILE", nargs=-1, required=True)
     @click.argument("OUTDIR")
     @click.option("-s",
                   "--size",
-                  default=DEFAULT_TILE_SIZE,
+                  default=constants.DEFAULT_TILE_SIZE,
                   help="Tile size in meters")
     @click.option("-l",
                   "--left-bottom",
-                  default=DEFAULT_LEFT_BOTTOM,
+                  default=constants.DEFAULT_LEFT_BOTTOM,
                   type=(int, int),
                   help="left, bottom coordinate origin of tiles")
     @click.option("-n", "--nodata", type=int, help="nodata value")
-    def tile_command(infile: str,
+    @click.option("-w",
+                  "--workers",
+                  default=1,
+                  type=click.IntRange(min=1),
+                  help="Number of tiles to write concurrently")
+    @click.option("-e",
+                  "--engine",
+                  default=TileEngine.GDAL.value,
+                  type=Choice([engine.value for engine in TileEngine]),
+                  help="Engine used to write tiles")
+    @click.option("--skip-nodata",
+                  is_flag=True,
+                  help="Do not write tiles that contain only nodata")
+    @click.option("--resume",
+                  is_flag=True,
+                  help="Skip tiles completed by an earlier, interrupted run")
+    @click.option("-b",
+                  "--bbox",
+                  type=(float, float, float, float),
+                  help="Only tile cells that intersect this left, bottom, "
+                  "right, top box, in the source CRS")
+    @click.option("--shard",
+                  callback=_shard_option,
+                  help="Only tile shard INDEX/COUNT of the grid cells, "
+                  "e.g. 0/4, with INDEX from 0")
+    def tile_command(infile: Tuple[str, ...],
                      outdir: str,
                      size: int,
                      left_bottom: tuple((int, int)),
-                     nodata: Optional[int] = None) -> None:
+                     nodata: Optional[int] = None,
+                     workers: int = 1,
+                     engine: str = TileEngine.GDAL.value,
+                     skip_nodata: bool = False,
+                     resume: bool = False,
+                     bbox: Optional[Tuple[float, float, float, float]] = None,
+                     shard: Optional[Tuple[int, int]] = None) -> None:
         """Tiles the input file to a grid.
 
         The source chesapeake-lulc data are large GeoTIFFS, so we tile them to COGs.
 
+        Several INFILEs, e.g. state or county mosaics, can be tiled together
+        with --engine rasterio, without merging them into a VRT first. Each
+        tile reads only the sources that overlap it, later sources take
+        precedence where they overlap, and tiles are named after the first
+        source.
+
+        Each COG is written to a temporary file and renamed into place once
+        complete, and completed tiles are recorded in
+        OUTDIR/tile-journal.jsonl. After an interruption, rerun the same
+        command with --resume to write only the remaining tiles.
+
+        With --shard, the grid cells are dealt round-robin to COUNT shards
+        and only those of shard INDEX are written, so that the shards can be
+        tiled on separate machines into the same or separate OUTDIRs. Each
+        shard records its tiles in its own journal,
+        OUTDIR/tile-journal-INDEX-of-COUNT.jsonl, and is resumed with the
+        same --shard.
+
         \b
         Args:
-            infile (str): HREF to source GeoTIFF to be tiled
+            infile (tuple(str, ...)): HREFs to source GeoTIFFs to be tiled
             outdir (str): Directory that will contain the tiles
             size (int): Tile size in meters
             left_bottom (tuple(int, int)): X, Y coordinates of tile grid origin.
                 Defined as the lower left corner of the area to be tiled.
             nodata (int): nodata value to use for tiled COGs
+            workers (int): Number of tiles to write concurrently
+            engine (str): "gdal" to run gdal_translate per tile, or
+                "rasterio" to read tiles as windows of a single open dataset
+            skip_nodata (bool): Do not write tiles that contain only nodata.
+                Empty tiles are detected from the source overviews, so
+                remove-nodata-tifs is not needed afterwards.
+            resume (bool): Skip tiles recorded as complete in the journal
+                of an earlier run with the same parameters.
+            bbox (Optional[tuple(float, float, float, float)]): Only tile
+                cells that intersect this box.
+            shard (Optional[tuple(int, int)]): Only tile this shard of the
+                cells.
 
         """
-        tile(infile, outdir, size, left_bottom, nodata)
+        tile(_sources(infile), outdir, size, left_bottom, nodata, workers,
+             TileEngine(engine), skip_nodata, resume, bbox, shard)
+
+    @chesapeake_lulc.command(
+        "tile-index",
+        help="Writes the grid cells that tile would write as GeoJSON or "
+        "GeoParquet")
+    @click.argument("INFILE", nargs=-1, required=True)
+    @click.argument("OUTFILE")
+    @click.option("-s",
+                  "--size",
+                  default=constants.DEFAULT_TILE_SIZE,
+                  help="Tile size in meters")
+    @click.option("-l",
+                  "--left-bottom",
+                  default=constants.DEFAULT_LEFT_BOTTOM,
+                  type=(int, int),
+                  help="left, bottom coordinate origin of tiles")
+    @click.option("-n", "--nodata", type=int, help="nodata value")
+    @click.option("--skip-nodata",
+                  is_flag=True,
+                  help="Leave out tiles that contain only nodata")
+    @click.option("-b",
+                  "--bbox",
+                  type=(float, float, float, float),
+                  help="Only tile cells that intersect this left, bottom, "
+                  "right, top box, in the source CRS")
+    @click.option("--shard",
+                  callback=_shard_option,
+                  help="Only tile shard INDEX/COUNT of the grid cells, "
+                  "e.g. 0/4, with INDEX from 0")
+    def tile_index_command(infile: Tuple[str, ...],
+                           outfile: str,
+                           size: int,
+                           left_bottom: tuple((int, int)),
+                           nodata: Optional[int] = None,
+                           skip_nodata: bool = False,
+                           bbox: Optional[Tuple[float, float, float,
+                                                float]] = None,
+                           shard: Optional[Tuple[int, int]] = None) -> None:
+        """Writes the grid cells that tile would write for the same options
+        to OUTFILE, without writing any tiles.
+
+        Each cell has its column and row in the grid and its left, bottom,
+        right and top bounds in the source CRS. OUTFILE is GeoParquet, with
+        geometries in the source CRS, if it ends in .parquet or .geoparquet,
+        and GeoJSON, with geometries in EPSG:4326, otherwise. GeoParquet
+        output requires pyarrow.
+
+        \b
+        Args:
+            infile (tuple(str, ...)): HREFs to source GeoTIFFs to be tiled.
+            outfile (str): File that will contain the tile index.
+            size (int): Tile size in meters.
+            left_bottom (tuple(int, int)): X, Y coordinates of tile grid
+                origin.
+            nodata (int): nodata value used to detect empty tiles.
+            skip_nodata (bool): Leave out tiles that contain only nodata.
+            bbox (Optional[tuple(float, float, float, float)]): Only include
+                cells that intersect this box.
+            shard (Optional[tuple(int, int)]): Only include this shard of
+                the cells.
+        """
+        index = tile_index(_sources(infile), size, left_bottom, nodata,
+                           skip_nodata, bbox, shard)
+        index.write(outfile)
+        click.echo(f"{len(index)} tiles")
 
     @chesapeake_lulc.command(
         "remove-nodata-tifs",
@@ -63,8 +245,26 @@ def create_chesapeake_lulc_command(cli):
     @click.option("-n",
                   "--nodata_dir",
                   help="directory to place nodata TIF files")
+    @click.option("-w",
+                  "--workers",
+                  default=1,
+                  type=click.IntRange(min=1),
+                  help="Number of files to check concurrently")
+    @click.option("-m",
+                  "--manifest",
+                  help="JSON or CSV file to write the result for each file")
+    @click.option("--dry-run",
+                  is_flag=True,
+                  help="Check the files without moving them")
+    @click.option("--count-pixels",
+                  is_flag=True,
+                  help="Count the valid pixels in every file")
     def remove_nodata_tifs_command(indir: str,
-                                   nodata_dir: Optional[str] = None) -> None:
+                                   nodata_dir: Optional[str] = None,
+                                   workers: int = 1,
+                                   manifest: Optional[str] = None,
+                                   dry_run: bool = False,
+                                   count_pixels: bool = False) -> None:
         """Moves TIF files that contain only nodata values to a new directory.
 
         Useful after tiling a large area where many tiles do not intersect valid
@@ -72,14 +272,28 @@ def create_chesapeake_lulc_command(cli):
         named "nodata_tifs". Use the --nodata_dir option to override this
         default location and name.
 
+        Use --dry-run with --manifest to plan a cleanup without moving any
+        files. Valid pixel counts are only recorded for files with data when
+        --count-pixels is given, since otherwise each check stops at the
+        first valid pixel.
+
+        \b
         Args:
             indir (str): Directory of TIF files to be examined.
             nodata_dir (Optional[str]): Optional directory for the nodata TIF
                 files.
+            workers (int): Number of files to check concurrently.
+            manifest (Optional[str]): Optional JSON or CSV file for the path,
+                status, valid pixel count and elapsed time of each file.
+            dry_run (bool): Check the files without moving them.
+            count_pixels (bool): Count the valid pixels in every file.
         """
         if nodata_dir is None:
             nodata_dir = os.path.join(indir, "nodata_tifs")
-        remove_nodata(indir, nodata_dir)
+        results = remove_nodata(indir, nodata_dir, workers, dry_run,
+                                count_pixels)
+        if manifest:
+            write_manifest(results, manifest)
 
     @chesapeake_lulc.command(
         "create-item",
@@ -87,7 +301,33 @@ def create_chesapeake_lulc_command(cli):
                     "Cover COG file"))
     @click.argument("INFILE")
     @click.argument("OUTDIR")
-    def create_item_command(infile: str, outdir: str) -> None:
+    @click.option("--read-stats",
+                  is_flag=True,
+                  help="Print the HTTP requests and bytes used to read INFILE")
+    @click.option("--validate",
+                  default=ValidationMode.ALL.value,
+                  type=Choice([mode.value for mode in ValidationMode]),
+                  help="Validate the Item against the bundled schemas")
+    @click.option("--statistics",
+                  default=StatisticsMode.NONE.value,
+                  type=Choice([mode.value for mode in StatisticsMode]),
+                  help="Count the pixels of each class, optionally at an "
+                  "overview")
+    @click.option("--footprint",
+                  is_flag=True,
+                  help="Use the valid data footprint as the Item geometry")
+    @click.option("--footprint-tolerance",
+                  default=DEFAULT_FOOTPRINT_TOLERANCE,
+                  type=click.FloatRange(min=0),
+                  help="Footprint simplification tolerance in meters")
+    def create_item_command(
+            infile: str,
+            outdir: str,
+            read_stats: bool = False,
+            validate: str = ValidationMode.ALL.value,
+            statistics: str = StatisticsMode.NONE.value,
+            footprint: bool = False,
+            footprint_tolerance: float = DEFAULT_FOOTPRINT_TOLERANCE) -> None:
         """Creates a STAC Item for a tile of Chesapeake Conservancey land cover
         or land use classification data.
 
@@ -95,13 +335,33 @@ def create_chesapeake_lulc_command(cli):
         Args:
             infile (str): HREF of the classification map COG.
             outdir (str): Directory that will contain the STAC Item.
+            read_stats (bool): Print the HTTP requests and bytes used to
+                read the COG header.
+            validate (str): "none" to skip validation. "sample" and "all"
+                both validate the Item.
+            statistics (str): "exact" or "approximate" to write the pixel
+                count of each class to the raster band histogram.
+            footprint (bool): Use the footprint of the valid data, traced
+                from the mask at an overview, as the Item geometry.
+            footprint_tolerance (float): Footprint simplification tolerance
+                in meters. Larger values give fewer vertices.
         """
-        item = stac.create_item(infile)
+        stats = ReadStats() if read_stats else None
+        tolerance = footprint_tolerance if footprint else None
+        item = stac.create_item(infile,
+                                read_stats=stats,
+                                statistics=StatisticsMode(statistics),
+                                footprint_tolerance=tolerance)
+        if stats is not None:
+            click.echo(f"{infile}: {stats.requests} requests, "
+                       f"{stats.bytes} bytes")
         item_path = os.path.join(outdir, f"{item.id}.json")
         item.set_self_href(item_path)
         item.make_asset_hrefs_relative()
-        item.validate()
-        item.save_object()
+        if ValidationMode(validate) != ValidationMode.NONE:
+            get_validator().validate(item)
+        with metrics.stage("write.item"):
+            item.save_object()
 
     @chesapeake_lulc.command(
         "create-collection",
@@ -112,10 +372,78 @@ def create_chesapeake_lulc_command(cli):
     @click.argument("OUTDIR")
     @click.argument("COLLECTION_ID",
                     type=Choice([id.value for id in CollectionId]))
-    def create_collection_command(infile: str, outdir: str,
-                                  collection_id: str) -> None:
+    @click.option("-w",
+                  "--workers",
+                  default=1,
+                  type=click.IntRange(min=1),
+                  help="Number of items to create concurrently")
+    @click.option("-c",
+                  "--cache",
+                  help="SQLite file caching COG metadata between runs")
+    @click.option("-u",
+                  "--update",
+                  is_flag=True,
+                  help="Update the existing collection in OUTDIR")
+    @click.option("--stream",
+                  is_flag=True,
+                  help="Write each Item as soon as it is created")
+    @click.option("--validate",
+                  default=ValidationMode.ALL.value,
+                  type=Choice([mode.value for mode in ValidationMode]),
+                  help="Validate all Items, a sample of them, or none")
+    @click.option("--statistics",
+                  default=StatisticsMode.NONE.value,
+                  type=Choice([mode.value for mode in StatisticsMode]),
+                  help="Count the pixels of each class, optionally at an "
+                  "overview")
+    @click.option("--footprint",
+                  is_flag=True,
+                  help="Use the valid data footprint as the Item geometry")
+    @click.option("--footprint-tolerance",
+                  default=DEFAULT_FOOTPRINT_TOLERANCE,
+                  type=click.FloatRange(min=0),
+                  help="Footprint simplification tolerance in meters")
+    @click.option("--shard",
+                  callback=_shard_option,
+                  help="Only create Items for shard INDEX/COUNT of the "
+                  "hrefs, e.g. 0/4, with INDEX from 0")
+    def create_collection_command(
+            infile: str,
+            outdir: str,
+            collection_id: str,
+            workers: int = 1,
+            cache: Optional[str] = None,
+            update: bool = False,
+            stream: bool = False,
+            validate: str = ValidationMode.ALL.value,
+            statistics: str = StatisticsMode.NONE.value,
+            footprint: bool = False,
+            footprint_tolerance: float = DEFAULT_FOOTPRINT_TOLERANCE,
+            shard: Optional[Tuple[int, int]] = None) -> None:
         """Creates a STAC Collection for Items defined by the hrefs in INFILE."
 
+        Items that cannot be created are reported after the collection has
+        been saved with the remaining items, and the command then fails.
+
+        With --update, the collection already in OUTDIR is brought in line
+        with INFILE: Items are created for new hrefs and for COGs modified
+        since their Item was written, Items for hrefs no longer listed are
+        deleted, and only the affected files are written.
+
+        With --stream, each Item is validated and written as soon as it is
+        created and collection.json is written last, so memory use does not
+        grow with the number of Items.
+
+        Validation uses schemas bundled with the package and compiled once,
+        so it does not need network access. With --validate sample, the
+        collection and the first of every 100 Items are validated; with
+        --validate none, nothing is. Items are validated in batches using
+        --workers processes.
+
+        With --shard, the hrefs are dealt round-robin to COUNT shards and
+        OUTDIR holds a partial collection of the Items of shard INDEX. Give
+        each shard its own OUTDIR and combine them with merge.
+
         \b
         Args:
             infile (str): Text file containing one href per line. The hrefs
@@ -124,18 +452,455 @@ def create_chesapeake_lulc_command(cli):
             outdir (str): Directory that will contain the collection.
             collection_id (str): Collection ID. Must be one of
                 "chesapeake-lc-7", "chesapeake-lc-13", or "chesapeake-lu".
+            workers (int): Number of items to create concurrently.
+            cache (Optional[str]): SQLite file caching COG metadata. COGs
+                that have not changed since they were cached are not opened.
+            update (bool): Update the existing collection in OUTDIR.
+            stream (bool): Write each Item as soon as it is created.
+            validate (str): Validate "all" Items, a "sample" of them, or
+                "none".
+            statistics (str): "exact" or "approximate" to write the pixel
+                count of each class to the raster band histogram.
+            footprint (bool): Use the footprint of the valid data, traced
+                from the mask at an overview, as the Item geometry.
+            footprint_tolerance (float): Footprint simplification tolerance
+                in meters. Larger values give fewer vertices.
+            shard (Optional[tuple(int, int)]): Only create Items for this
+                shard of the hrefs.
+        """
+        if update and stream:
+            raise click.UsageError(
+                "--update and --stream cannot be used together")
+
+        validation_mode = ValidationMode(validate)
+        statistics_mode = StatisticsMode(statistics)
+        tolerance = footprint_tolerance if footprint else None
+        collection_path = os.path.join(outdir, "collection.json")
+        metadata_cache = MetadataCache(cache) if cache else None
+        try:
+            if stream:
+                with open(infile) as file:
+                    lines = shard_items((line.strip() for line in file), shard)
+                    errors = write_collection(collection_id,
+                                              lines,
+                                              outdir,
+                                              workers=workers,
+                                              cache=metadata_cache,
+                                              validate=validation_mode,
+                                              statistics=statistics_mode,
+                                              footprint_tolerance=tolerance)
+            elif update:
+                with open(infile) as file:
+                    hrefs = list(
+                        shard_items((line.strip() for line in file), shard))
+                result = update_collection(collection_path,
+                                           hrefs,
+                                           workers=workers,
+                                           cache=metadata_cache,
+                                           validate=validation_mode,
+                                           statistics=statistics_mode,
+                                           footprint_tolerance=tolerance)
+                click.echo(f"{len(result.added)} added, "
+                           f"{len(result.updated)} updated, "
+                           f"{len(result.removed)} removed, "
+                           f"{len(result.unchanged)} unchanged")
+                errors = result.errors
+            else:
+                with open(infile) as file:
+                    hrefs = list(
+                        shard_items((line.strip() for line in file), shard))
+                collection = stac.create_collection(collection_id)
+                collection.set_self_href(collection_path)
+                collection.catalog_type = CatalogType.SELF_CONTAINED
+                items, errors = stac.create_items(
+                    hrefs,
+                    workers=workers,
+                    cache=metadata_cache,
+                    statistics=statistics_mode,
+                    footprint_tolerance=tolerance)
+                for item in items:
+                    collection.add_item(item)
+                stac.set_extent_from_items(collection, items)
+                collection.make_all_asset_hrefs_relative()
+                validate_collection(collection, validation_mode, workers)
+                with metrics.stage("write.collection"):
+                    collection.save()
+        finally:
+            if metadata_cache is not None:
+                metadata_cache.close()
+
+        if errors:
+            for href, error in errors.items():
+                click.echo(f"{href}: {error}", err=True)
+            raise click.ClickException(
+                f"{len(errors)} items could not be created")
+
+    @chesapeake_lulc.command(
+        "create-items",
+        short_help=("Writes STAC Items for Chesapeake Conservancy land cover "
+                    "or land use COGs to one NDJSON or GeoParquet file"),
+    )
+    @click.argument("INFILE")
+    @click.argument("OUTFILE")
+    @click.argument("COLLECTION_ID",
+                    type=Choice([id.value for id in CollectionId]))
+    @click.option("-f",
+                  "--format",
+                  "export_format",
+                  type=Choice([format.value for format in ExportFormat]),
+                  help="Output format. Defaults to geoparquet for .parquet "
+                  "files and ndjson otherwise")
+    @click.option("-w",
+                  "--workers",
+                  default=1,
+                  type=click.IntRange(min=1),
+                  help="Number of items to create concurrently")
+    @click.option("-c",
+                  "--cache",
+                  help="SQLite file caching COG metadata between runs")
+    @click.option("--validate",
+                  default=ValidationMode.ALL.value,
+                  type=Choice([mode.value for mode in ValidationMode]),
+                  help="Validate all Items, a sample of them, or none")
+    @click.option("--statistics",
+                  default=StatisticsMode.NONE.value,
+                  type=Choice([mode.value for mode in StatisticsMode]),
+                  help="Count the pixels of each class, optionally at an "
+                  "overview")
+    @click.option("--footprint",
+                  is_flag=True,
+                  help="Use the valid data footprint as the Item geometry")
+    @click.option("--footprint-tolerance",
+                  default=DEFAULT_FOOTPRINT_TOLERANCE,
+                  type=click.FloatRange(min=0),
+                  help="Footprint simplification tolerance in meters")
+    def create_items_command(
+            infile: str,
+            outfile: str,
+            collection_id: str,
+            export_format: Optional[str] = None,
+            workers: int = 1,
+            cache: Optional[str] = None,
+            validate: str = ValidationMode.ALL.value,
+            statistics: str = StatisticsMode.NONE.value,
+            footprint: bool = False,
+            footprint_tolerance: float = DEFAULT_FOOTPRINT_TOLERANCE) -> None:
+        """Writes STAC Items for the hrefs in INFILE to a single file, ready
+        for bulk ingest, e.g. with pypgstac.
+
+        Items are written as newline-delimited JSON or as GeoParquet as soon
+        as they are created. Each Item has its collection id in the
+        "collection" field and absolute asset hrefs. GeoParquet output
+        requires pyarrow.
+
+        Items that cannot be created are reported after OUTFILE has been
+        written with the remaining items, and the command then fails.
+
+        \b
+        Args:
+            infile (str): Text file containing one href per line. The hrefs
+                should point to Chesapeake Conservancy land cover or land use
+                COG files.
+            outfile (str): File that will contain the Items.
+            collection_id (str): Collection ID. Must be one of
+                "chesapeake-lc-7", "chesapeake-lc-13", or "chesapeake-lu".
+            export_format (Optional[str]): "ndjson" or "geoparquet".
+            workers (int): Number of items to create concurrently.
+            cache (Optional[str]): SQLite file caching COG metadata.
+            validate (str): Validate "all" Items, a "sample" of them, or
+                "none".
+            statistics (str): "exact" or "approximate" to write the pixel
+                count of each class to the raster band histogram.
+            footprint (bool): Use the footprint of the valid data, traced
+                from the mask at an overview, as the Item geometry.
+            footprint_tolerance (float): Footprint simplification tolerance
+                in meters. Larger values give fewer vertices.
+        """
+        if export_format is None:
+            if os.path.splitext(outfile)[1].lower() in (".parquet",
+                                                        ".geoparquet"):
+                export_format = ExportFormat.GEOPARQUET.value
+            else:
+                export_format = ExportFormat.NDJSON.value
+
+        tolerance = footprint_tolerance if footprint else None
+        metadata_cache = MetadataCache(cache) if cache else None
+        try:
+            with open(infile) as file:
+                errors = export_items(collection_id,
+                                      (line.strip() for line in file),
+                                      outfile,
+                                      ExportFormat(export_format),
+                                      workers=workers,
+                                      cache=metadata_cache,
+                                      validate=ValidationMode(validate),
+                                      statistics=StatisticsMode(statistics),
+                                      footprint_tolerance=tolerance)
+        finally:
+            if metadata_cache is not None:
+                metadata_cache.close()
+
+        if errors:
+            for href, error in errors.items():
+                click.echo(f"{href}: {error}", err=True)
+            raise click.ClickException(
+                f"{len(errors)} items could not be created")
+
+    @chesapeake_lulc.command(
+        "tile-collection",
+        short_help=("Tiles the input file to a grid and creates a STAC "
+                    "collection of the tiles in one pass"),
+    )
+    @click.argument("INFILE", nargs=-1, required=True)
+    @click.argument("TILE_DIR")
+    @click.argument("OUTDIR")
+    @click.argument("COLLECTION_ID",
+                    type=Choice([id.value for id in CollectionId]))
+    @click.option("-s",
+                  "--size",
+                  default=constants.DEFAULT_TILE_SIZE,
+                  help="Tile size in meters")
+    @click.option("-l",
+                  "--left-bottom",
+                  default=constants.DEFAULT_LEFT_BOTTOM,
+                  type=(int, int),
+                  help="left, bottom coordinate origin of tiles")
+    @click.option("-n", "--nodata", type=int, help="nodata value")
+    @click.option("-w",
+                  "--workers",
+                  default=1,
+                  type=click.IntRange(min=1),
+                  help="Number of tiles to write concurrently")
+    @click.option("--validate",
+                  default=ValidationMode.ALL.value,
+                  type=Choice([mode.value for mode in ValidationMode]),
+                  help="Validate all Items, a sample of them, or none")
+    @click.option("-b",
+                  "--bbox",
+                  type=(float, float, float, float),
+                  help="Only tile cells that intersect this left, bottom, "
+                  "right, top box, in the source CRS")
+    @click.option("--shard",
+                  callback=_shard_option,
+                  help="Only tile shard INDEX/COUNT of the grid cells, "
+                  "e.g. 0/4, with INDEX from 0")
+    def tile_collection_command(
+            infile: Tuple[str, ...],
+            tile_dir: str,
+            outdir: str,
+            collection_id: str,
+            size: int,
+            left_bottom: tuple((int, int)),
+            nodata: Optional[int] = None,
+            workers: int = 1,
+            validate: str = ValidationMode.ALL.value,
+            bbox: Optional[Tuple[float, float, float, float]] = None,
+            shard: Optional[Tuple[int, int]] = None) -> None:
+        """Tiles INFILE to COGs in TILE_DIR and writes a STAC Collection of
+        them to OUTDIR. Several INFILEs are tiled together as with tile.
+
+        This replaces running tile, remove-nodata-tifs and create-collection
+        in turn. Grid cells that contain only nodata are detected from the
+        source overviews and not written, and each Item is created from the
+        grid its tile was written with, so no tile is read back. Items are
+        written as their tiles are, and collection.json is written last.
+
+        With --shard, only that shard of the grid cells is tiled, as with
+        tile, and OUTDIR holds a partial collection of its tiles. Give each
+        shard its own OUTDIR and combine them with merge.
+
+        \b
+        Args:
+            infile (tuple(str, ...)): HREFs to source GeoTIFFs to be tiled.
+            tile_dir (str): Directory that will contain the tiles.
+            outdir (str): Directory that will contain the collection.
+            collection_id (str): Collection ID. Must be one of
+                "chesapeake-lc-7", "chesapeake-lc-13", or "chesapeake-lu".
+            size (int): Tile size in meters.
+            left_bottom (tuple(int, int)): X, Y coordinates of tile grid
+                origin. Defined as the lower left corner of the area to be
+                tiled.
+            nodata (int): nodata value to use for tiled COGs.
+            workers (int): Number of tiles to write concurrently.
+            validate (str): Validate "all" Items, a "sample" of them, or
+                "none".
+            bbox (Optional[tuple(float, float, float, float)]): Only tile
+                cells that intersect this box.
+            shard (Optional[tuple(int, int)]): Only tile this shard of the
+                cells.
+        """
+        outfiles = tile_collection(_sources(infile), tile_dir, outdir,
+                                   collection_id, size,
+                                   left_bottom, nodata, workers,
+                                   ValidationMode(validate), bbox, shard)
+        click.echo(f"{len(outfiles)} tiles written")
+
+    @chesapeake_lulc.command(
+        "merge",
+        short_help=("Merges the collections written by the shards of a "
+                    "sharded run into a single collection"),
+    )
+    @click.argument("OUTDIR")
+    @click.argument("COLLECTION", nargs=-1, required=True)
+    @click.option("--validate",
+                  default=ValidationMode.NONE.value,
+                  type=Choice([mode.value for mode in ValidationMode]),
+                  help="Validate all Items, a sample of them, or none")
+    def merge_command(outdir: str,
+                      collection: Tuple[str, ...],
+                      validate: str = ValidationMode.NONE.value) -> None:
+        """Merges the collections at each COLLECTION, e.g. those written by
+        tile-collection or create-collection with --shard, into a single
+        collection in OUTDIR.
+
+        Items are copied from their JSON files with their asset hrefs
+        rewritten relative to OUTDIR, and the collection extent is computed
+        from the Item bboxes and datetimes, so no COG is read. Items are
+        validated when their shards are written, so by default they are not
+        validated again.
+
+        \b
+        Args:
+            outdir (str): Directory that will contain the collection.
+            collection (tuple(str, ...)): Paths to the saved collection.json
+                of each shard.
+            validate (str): Validate "all" Items, a "sample" of them, or
+                "none".
+        """
+        item_ids = merge_collections(list(collection), outdir,
+                                     ValidationMode(validate))
+        click.echo(f"{len(item_ids)} items merged")
+
+    @chesapeake_lulc.command(
+        "reclassify",
+        short_help=("Reclassifies COGs to another collection's classes and "
+                    "creates a STAC collection of them"),
+    )
+    @click.argument("INFILE", nargs=-1, required=True)
+    @click.argument("TILE_DIR")
+    @click.argument("OUTDIR")
+    @click.argument("COLLECTION_ID",
+                    type=Choice([id.value for id in CollectionId]))
+    @click.option("--lut",
+                  help="JSON file mapping each source class value to a "
+                  "target class value")
+    @click.option("-w",
+                  "--workers",
+                  default=1,
+                  type=click.IntRange(min=1),
+                  help="Number of COGs to write concurrently")
+    @click.option("--validate",
+                  default=ValidationMode.ALL.value,
+                  type=Choice([mode.value for mode in ValidationMode]),
+                  help="Validate all Items, a sample of them, or none")
+    def reclassify_command(infile: Tuple[str, ...],
+                           tile_dir: str,
+                           outdir: str,
+                           collection_id: str,
+                           lut: Optional[str] = None,
+                           workers: int = 1,
+                           validate: str = ValidationMode.ALL.value) -> None:
+        """Maps the classes of each INFILE to those of COLLECTION_ID, writing
+        COGs to TILE_DIR and a STAC Collection of them to OUTDIR.
+
+        Without --lut, source classes are matched to target classes by
+        description, with the 13-class to 7-class land cover crosswalk in
+        reclassify.CLASS_CROSSWALK, and other collections need a lookup
+        table. Each COG is named after its INFILE with the collection part
+        of the name replaced, e.g. 13Class by 7class.
+
+        \b
+        Args:
+            infile (Tuple[str, ...]): COGs from a single collection.
+            tile_dir (str): Directory that will contain the COGs.
+            outdir (str): Directory that will contain the collection.
+            collection_id (str): Target collection ID. Must be one of
+                "chesapeake-lc-7", "chesapeake-lc-13", or "chesapeake-lu".
+            lut (Optional[str]): JSON object of source to target class
+                values, e.g. {"1": 1, "2": 3}.
+            workers (int): Number of COGs to write concurrently.
+            validate (str): Validate "all" Items, a "sample" of them, or
+                "none".
         """
-        with open(infile) as file:
-            hrefs = [line.strip() for line in file.readlines()]
-
-        collection = stac.create_collection(collection_id)
-        collection.set_self_href(os.path.join(outdir, "collection.json"))
-        collection.catalog_type = CatalogType.SELF_CONTAINED
-        for href in hrefs:
-            item = stac.create_item(href)
-            collection.add_item(item)
-        collection.make_all_asset_hrefs_relative()
-        collection.validate_all()
-        collection.save()
+        mapping = read_lut(lut) if lut else None
+        outfiles = reclassify_collection(list(infile), tile_dir, outdir,
+                                         collection_id, mapping, workers,
+                                         ValidationMode(validate))
+        click.echo(f"{len(outfiles)} COGs written")
+
+    @chesapeake_lulc.command(
+        "query",
+        short_help=("Looks up the class at points, or counts the classes in "
+                    "a polygon, across a tiled collection"),
+    )
+    @click.argument("COLLECTION")
+    @click.option("-p",
+                  "--point",
+                  "points",
+                  multiple=True,
+                  type=(float, float),
+                  help="Longitude and latitude of a point to look up")
+    @click.option("-g",
+                  "--geometry",
+                  help="GeoJSON file with a Polygon or MultiPolygon, or a "
+                  "Feature of one, in which to count pixels of each class")
+    @click.option("--max-open",
+                  default=constants.QUERY_MAX_OPEN_DATASETS,
+                  type=click.IntRange(min=1),
+                  help="Number of COGs to keep open")
+    def query_command(
+            collection: str,
+            points: List[Tuple[float, float]],
+            geometry: Optional[str] = None,
+            max_open: int = constants.QUERY_MAX_OPEN_DATASETS) -> None:
+        """Queries the COGs of the collection at COLLECTION and prints the
+        results as JSON: the class value at each point, null where there is
+        no data, and the pixel count of each class in the geometry.
+
+        \b
+        Args:
+            collection (str): Path to a saved collection.json.
+            points (List[Tuple[float, float]]): Longitude, latitude points.
+            geometry (Optional[str]): GeoJSON file of a polygon.
+            max_open (int): Number of COGs to keep open.
+        """
+        if not points and geometry is None:
+            raise click.UsageError("Give at least one --point or --geometry")
+        result: Dict[str, Any] = {}
+        with TileQuery.from_collection(collection, max_open) as tile_query:
+            if points:
+                values = tile_query.classes_at(points)
+                result["points"] = [{
+                    "lon": lon,
+                    "lat": lat,
+                    "class": value
+                } for (lon, lat), value in zip(points, values)]
+            if geometry is not None:
+                with open(geometry) as file:
+                    data = json.load(file)
+                if data.get("type") == "Feature":
+                    data = data["geometry"]
+                counts = tile_query.class_counts(data)
+                result["counts"] = {
+                    str(value): count
+                    for value, count in counts.items()
+                }
+        click.echo(json.dumps(result))
 
     return chesapeake_lulc
+
+
+def _shard_option(ctx: click.Context, param: click.Parameter,
+                  value: Optional[str]) -> Optional[Tuple[int, int]]:
+    if value is None:
+        return None
+    try:
+        return parse_shard(value)
+    except ValueError as error:
+        raise click.BadParameter(str(error))
+
+
+def _sources(infile: Tuple[str, ...]) -> Union[str, List[str]]:
+    """A single source is passed on as a string, as before several sources
+    were supported, so that tile journals stay compatible."""
+    return infile[0] if len(infile) == 1 else list(infile)
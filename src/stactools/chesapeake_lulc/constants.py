@@ -7,10 +7,81 @@ class CollectionId(Enum):
     LU = "chesapeake-lu"
 
 
+class TileEngine(Enum):
+    GDAL = "gdal"
+    RASTERIO = "rasterio"
+
+
+class ValidationMode(Enum):
+    NONE = "none"
+    SAMPLE = "sample"
+    ALL = "all"
+
+
+class ExportFormat(Enum):
+    NDJSON = "ndjson"
+    GEOPARQUET = "geoparquet"
+
+
+class StatisticsMode(Enum):
+    NONE = "none"
+    EXACT = "exact"
+    APPROXIMATE = "approximate"
+
+
 DEFAULT_TILE_SIZE = 10000  # meters
 DEFAULT_LEFT_BOTTOM = (1300000.0, 1650000.0)  # (x, y); meters; ESRI:102039
 
+COG_COMPRESS = "deflate"
+COG_BLOCKSIZE = 512
+# Largest offset, in pixels, from a whole pixel at which the origins of
+# sources tiled together are still considered aligned
+GRID_ALIGNMENT_TOLERANCE = 1e-6
+
+# Journal of completed tiles written by `tile` to its output directory
+TILE_JOURNAL = "tile-journal.jsonl"
+# Journal of one shard of a sharded `tile` run, so that shards can share an
+# output directory
+TILE_SHARD_JOURNAL = "tile-journal-{index}-of-{count}.jsonl"
+
+# GDAL configuration for reading only the header of a (remote) COG: no
+# directory listing or sidecar (.aux.xml, .ovr, .msk) probing, a header
+# large enough for our tiles in one request, merged and multiplexed range
+# requests, and cached reads.
+HEADER_READ_OPTIONS = {
+    "GDAL_DISABLE_READDIR_ON_OPEN": "EMPTY_DIR",
+    "CPL_VSIL_CURL_ALLOWED_EXTENSIONS": ".tif,.TIF,.tiff,.TIFF",
+    "GDAL_PAM_ENABLED": "NO",
+    "GDAL_INGESTED_BYTES_AT_OPEN": "32768",
+    "GDAL_HTTP_MERGE_CONSECUTIVE_RANGES": "YES",
+    "GDAL_HTTP_MULTIPLEX": "YES",
+    "GDAL_HTTP_VERSION": "2",
+    "VSI_CACHE": "TRUE",
+}
+
 START_TIME = "2013-01-01T00:00:00Z"
 END_TIME = "2014-12-31T23:59:59Z"
 
 CLASSIFICATION_SCHEMA = "https://stac-extensions.github.io/classification/v1.0.0/schema.json"
+
+# Approximate class statistics are counted at the coarsest overview whose
+# decimation factor does not exceed this.
+STATISTICS_OVERVIEW_FACTOR = 8
+
+# Valid data footprints are traced from the mask decimated by up to
+# FOOTPRINT_OVERVIEW_FACTOR, simplified by DEFAULT_FOOTPRINT_TOLERANCE and
+# densified to FOOTPRINT_DENSIFY_LENGTH before reprojection; meters.
+FOOTPRINT_OVERVIEW_FACTOR = 16
+DEFAULT_FOOTPRINT_TOLERANCE = 20.0
+FOOTPRINT_DENSIFY_LENGTH = 1000.0
+
+# In "sample" validation mode, the first of every VALIDATION_SAMPLE_STRIDE
+# Items is validated. Items are validated VALIDATION_BATCH_SIZE at a time.
+VALIDATION_SAMPLE_STRIDE = 100
+VALIDATION_BATCH_SIZE = 100
+
+# Open datasets kept by a query.TileQuery
+QUERY_MAX_OPEN_DATASETS = 64
+
+# Items per row group in GeoParquet exports
+GEOPARQUET_BATCH_SIZE = 1000
@@ -0,0 +1,206 @@
+import json
+from tempfile import TemporaryFile
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TypeVar
+
+from pystac import Item
+from pystac.utils import str_to_datetime
+from stactools.core.io import ReadHrefModifier
+
+from stactools.chesapeake_lulc import stac
+from stactools.chesapeake_lulc.cache import MetadataCache
+from stactools.chesapeake_lulc.constants import (GEOPARQUET_BATCH_SIZE,
+                                                 ExportFormat, StatisticsMode,
+                                                 ValidationMode)
+from stactools.chesapeake_lulc.validation import get_validator, in_sample
+
+DATETIME_FIELDS = ("datetime", "start_datetime", "end_datetime", "created",
+                   "updated")
+
+T = TypeVar("T")
+
+
+def export_items(
+        collection_id: str,
+        hrefs: Iterable[str],
+        outfile: str,
+        export_format: ExportFormat = ExportFormat.NDJSON,
+        read_href_modifier: Optional[ReadHrefModifier] = None,
+        workers: int = 1,
+        cache: Optional[MetadataCache] = None,
+        validate: ValidationMode = ValidationMode.NONE,
+        statistics: StatisticsMode = StatisticsMode.NONE,
+        footprint_tolerance: Optional[float] = None) -> Dict[str, Exception]:
+    """Creates Items and writes them to a single file for bulk ingest.
+
+    Items are written as soon as they are created, so memory use does not
+    grow with the number of Items. Each Item has its collection id in the
+    ``collection`` field, as bulk loaders expect, and absolute asset hrefs.
+
+    Args:
+        collection_id (str): ID of the STAC Collection of the Items.
+        hrefs (Iterable[str]): HREFs to COGs containing classification data.
+            May be a lazy iterable, e.g. an open file.
+        outfile (str): File to write.
+        export_format (ExportFormat): Newline-delimited JSON or GeoParquet.
+        read_href_modifier (Callable[[str], str]): An optional function to
+            modify the hrefs (e.g. to add a token to a url).
+        workers (int): Number of items to create concurrently.
+        cache (Optional[MetadataCache]): Optional cache of COG metadata.
+        validate (ValidationMode): Validate all Items, a sample of them, or
+            none.
+        statistics (StatisticsMode): Whether and how to compute class
+            statistics, see :func:`stac.create_item`.
+        footprint_tolerance (Optional[float]): If provided, Item geometries
+            are valid data footprints, see :func:`stac.create_item`.
+    Returns:
+        Dict[str, Exception]: The exception raised for each href that failed.
+    """
+    errors: Dict[str, Exception] = {}
+
+    def items() -> Iterator[Item]:
+        index = 0
+        for href, result in stac.iter_items(hrefs, read_href_modifier, workers,
+                                            cache, statistics,
+                                            footprint_tolerance):
+            if not isinstance(result, Item):
+                errors[href] = result
+                continue
+            if in_sample(index, validate):
+                get_validator().validate(result)
+            result.collection_id = collection_id
+            index += 1
+            yield result
+
+    if export_format == ExportFormat.GEOPARQUET:
+        write_geoparquet(items(), outfile)
+    else:
+        write_ndjson(items(), outfile)
+    return errors
+
+
+def write_ndjson(items: Iterable[Item], path: str) -> int:
+    """Writes Items as newline-delimited JSON, one Item per line.
+
+    Args:
+        items (Iterable[Item]): The Items to write.
+        path (str): File to write.
+    Returns:
+        int: The number of Items written.
+    """
+    count = 0
+    with open(path, "w") as file:
+        for item in items:
+            file.write(json.dumps(item.to_dict(include_self_link=False)))
+            file.write("\n")
+            count += 1
+    return count
+
+
+def write_geoparquet(items: Iterable[Item],
+                     path: str,
+                     batch_size: int = GEOPARQUET_BATCH_SIZE) -> int:
+    """Writes Items as a GeoParquet file, one row per Item.
+
+    Item properties are top-level columns, the geometry is WKB and datetimes
+    are UTC timestamps, following the stac-geoparquet layout. Requires
+    pyarrow.
+
+    Items may differ in their fields, e.g. only some have band statistics,
+    so the column types are unified across all Items: the Items are first
+    spooled to a temporary file as JSON while the type of each batch is
+    merged into the schema, and then written ``batch_size`` at a time, one
+    row group per batch. Memory use does not grow with the number of Items.
+
+    Args:
+        items (Iterable[Item]): The Items to write.
+        path (str): File to write.
+        batch_size (int): Number of Items per row group.
+    Returns:
+        int: The number of Items written.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("GeoParquet output requires pyarrow; install "
+                          "stactools-chesapeake-lulc[geoparquet]") from e
+
+    count = 0
+    schema = None
+    with TemporaryFile("w+") as spool:
+        for batch in _batches(items, batch_size):
+            lines = [
+                json.dumps(item.to_dict(include_self_link=False))
+                for item in batch
+            ]
+            rows = [_to_row(json.loads(line)) for line in lines]
+            batch_schema = pa.Table.from_pylist(rows).schema
+            if schema is None:
+                schema = batch_schema
+            else:
+                schema = pa.unify_schemas([schema, batch_schema],
+                                          promote_options="permissive")
+            spool.writelines(f"{line}\n" for line in lines)
+            count += len(lines)
+        if schema is None:
+            return 0
+
+        for name in DATETIME_FIELDS:
+            index = schema.get_field_index(name)
+            if index >= 0:
+                schema = schema.set(
+                    index, pa.field(name, pa.timestamp("us", tz="UTC")))
+        schema = schema.with_metadata({"geo": json.dumps(_geo_metadata())})
+        spool.seek(0)
+        with pq.ParquetWriter(path, schema) as writer:
+            for spooled in _batches(spool, batch_size):
+                rows = [_to_row(json.loads(line)) for line in spooled]
+                writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+    return count
+
+
+def _batches(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _to_row(data: Dict[str, Any]) -> Dict[str, Any]:
+    from shapely.geometry import shape
+
+    row = {
+        "type": data["type"],
+        "stac_version": data["stac_version"],
+        "stac_extensions": data["stac_extensions"],
+        "id": data["id"],
+        "geometry": shape(data["geometry"]).wkb,
+        "bbox": dict(zip(["xmin", "ymin", "xmax", "ymax"], data["bbox"])),
+    }
+    for key, value in data["properties"].items():
+        if key in DATETIME_FIELDS and value is not None:
+            value = str_to_datetime(value)
+        row[key] = value
+    row["links"] = data["links"]
+    row["assets"] = data["assets"]
+    row["collection"] = data.get("collection")
+    return row
+
+
+def _geo_metadata() -> Dict[str, Any]:
+    # No "crs" means OGC:CRS84, and an empty list of geometry types means
+    # they are not known up front.
+    return {
+        "version": "1.0.0",
+        "primary_column": "geometry",
+        "columns": {
+            "geometry": {
+                "encoding": "WKB",
+                "geometry_types": []
+            }
+        },
+    }
@@ -0,0 +1,93 @@
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+import rasterio
+from rasterio.features import shapes
+from rasterio.io import DatasetReader
+from rasterio.warp import transform_geom
+from shapely.geometry import MultiPolygon, Polygon, mapping, shape
+from shapely.geometry.base import BaseGeometry
+from shapely.ops import unary_union
+
+from stactools.chesapeake_lulc.constants import (FOOTPRINT_DENSIFY_LENGTH,
+                                                 FOOTPRINT_OVERVIEW_FACTOR,
+                                                 HEADER_READ_OPTIONS)
+from stactools.chesapeake_lulc.instrumentation import metrics
+
+
+@metrics.timed("footprint")
+def data_footprint(href: str, tolerance: float) -> Optional[Dict[str, Any]]:
+    """Returns the footprint of the valid data in a COG, in EPSG:4326.
+
+    The dataset mask is read decimated by up to
+    ``constants.FOOTPRINT_OVERVIEW_FACTOR``, which GDAL serves from an
+    overview, and vectorized. The polygons are simplified and then densified
+    in the source CRS, so that the reprojected edges follow the source
+    edges.
+
+    Args:
+        href (str): HREF of the COG.
+        tolerance (float): Simplification tolerance in source CRS units.
+            Larger values give fewer vertices.
+    Returns:
+        Optional[Dict[str, Any]]: The GeoJSON footprint, or None if the COG
+        has no valid data.
+    """
+    with rasterio.Env(**HEADER_READ_OPTIONS):
+        with rasterio.open(href) as dataset:
+            footprint = source_footprint(dataset)
+            crs = dataset.crs
+    if footprint is None:
+        return None
+    footprint = footprint.simplify(tolerance, preserve_topology=True)
+    footprint = _densify(footprint, FOOTPRINT_DENSIFY_LENGTH)
+    return transform_geom(crs, "EPSG:4326", mapping(footprint))
+
+
+def source_footprint(dataset: DatasetReader) -> Optional[BaseGeometry]:
+    """Vectorizes the mask of band 1 at a reduced resolution.
+
+    Args:
+        dataset (DatasetReader): Open dataset.
+    Returns:
+        Optional[BaseGeometry]: The valid data area in the dataset's CRS,
+        or None if there is none.
+    """
+    factor = max([
+        factor for factor in dataset.overviews(1)
+        if factor <= FOOTPRINT_OVERVIEW_FACTOR
+    ],
+                 default=1)
+    height = max(1, math.ceil(dataset.height / factor))
+    width = max(1, math.ceil(dataset.width / factor))
+    mask = dataset.read_masks(1, out_shape=(height, width))
+    transform = dataset.transform * dataset.transform.scale(
+        dataset.width / width, dataset.height / height)
+    polygons = [
+        shape(geometry)
+        for geometry, _ in shapes(mask, mask=mask > 0, transform=transform)
+    ]
+    if not polygons:
+        return None
+    return unary_union(polygons)
+
+
+def _densify(geometry: BaseGeometry, length: float) -> BaseGeometry:
+    if geometry.geom_type == "MultiPolygon":
+        return MultiPolygon(
+            [_densify(polygon, length) for polygon in geometry.geoms])
+    return Polygon(_densify_ring(list(geometry.exterior.coords), length), [
+        _densify_ring(list(ring.coords), length) for ring in geometry.interiors
+    ])
+
+
+def _densify_ring(coords: List[Tuple[float, float]],
+                  length: float) -> List[Tuple[float, float]]:
+    """Adds vertices so that no segment is longer than ``length``."""
+    densified = [coords[0]]
+    for (x0, y0), (x1, y1) in zip(coords, coords[1:]):
+        steps = max(1, math.ceil(math.hypot(x1 - x0, y1 - y0) / length))
+        for step in range(1, steps + 1):
+            densified.append(
+                (x0 + (x1 - x0) * step / steps, y0 + (y1 - y0) * step / steps))
+    return densified
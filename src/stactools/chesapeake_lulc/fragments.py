@@ -1,15 +1,23 @@
 import json
-from typing import Any, Dict
+import os
+import sys
+from copy import deepcopy
+from functools import lru_cache
+from typing import IO, Any, Dict
 
-import pkg_resources
 from pystac import Asset, Extent, Link, MediaType, Provider
 from pystac.utils import make_absolute_href
 
 from stactools.chesapeake_lulc.constants import CollectionId
+from stactools.chesapeake_lulc.instrumentation import metrics
 
 
 class StacFragments:
-    """Class for accessing asset data."""
+    """Class for accessing asset data.
+
+    Fragment files are parsed once per collection id and cached for the
+    life of the process; callers always receive copies.
+    """
 
     def __init__(self, collection_id: str) -> None:
         collection_ids = [id.value for id in CollectionId]
@@ -20,10 +28,13 @@ class StacFragments:
         self.collection_id = collection_id
 
     def get_asset(self, href: str) -> Asset:
-        asset = self._load("asset.json")
-        asset["type"] = MediaType.COG
-        asset["href"] = make_absolute_href(href)
-        return Asset.from_dict(asset)
+        asset = _asset_template(self.collection_id).clone()
+        asset.href = make_absolute_href(href)
+        return asset
+
+    def get_asset_dict(self) -> Dict[str, Any]:
+        """Returns the asset fragment, without an href, as a dictionary."""
+        return self._load("asset.json")
 
     def get_collection(self) -> Dict[str, Any]:
         data = self._load("collection.json")
@@ -35,10 +46,45 @@ class StacFragments:
         return data
 
     def _load(self, file_name: str) -> Any:
-        try:
-            with pkg_resources.resource_stream(
-                    "stactools.chesapeake_lulc.fragments",
-                    f"fragments/{self.collection_id}/{file_name}") as stream:
-                return json.load(stream)
-        except FileNotFoundError as e:
-            raise e
+        return deepcopy(_load(self.collection_id, file_name))
+
+
+def preload_fragments() -> None:
+    """Loads the fragments for every collection into the cache.
+
+    Useful before forking worker processes, so each worker does not parse
+    the fragment files again.
+    """
+    for collection_id in CollectionId:
+        _load(collection_id.value, "collection.json")
+        _asset_template(collection_id.value)
+
+
+@lru_cache(maxsize=None)
+def _load(collection_id: str, file_name: str) -> Any:
+    """Parses a fragment file. The result is shared and must not be
+    modified."""
+    with metrics.stage("fragments.load"):
+        with _open(collection_id, file_name) as stream:
+            return json.load(stream)
+
+
+def _open(collection_id: str, file_name: str) -> IO[bytes]:
+    if sys.version_info >= (3, 9):
+        from importlib.resources import files
+        package = files("stactools.chesapeake_lulc")
+        return (package / "fragments" / collection_id / file_name).open("rb")
+    else:
+        return open(
+            os.path.join(os.path.dirname(__file__), "fragments", collection_id,
+                         file_name), "rb")
+
+
+@lru_cache(maxsize=None)
+def _asset_template(collection_id: str) -> Asset:
+    """Returns the shared Asset for a collection, without an href. It must
+    be cloned before use."""
+    asset = deepcopy(_load(collection_id, "asset.json"))
+    asset["type"] = MediaType.COG
+    asset["href"] = ""
+    return Asset.from_dict(asset)
@@ -0,0 +1,271 @@
+import json
+import math
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from rasterio.crs import CRS
+from rasterio.warp import transform
+
+COLUMNS = ("col", "row", "left", "bottom", "right", "top")
+
+# Cells compared with every source at once by SourceIndex.overlapping
+_OVERLAP_CHUNK_SIZE = 4096
+
+# Little-endian WKB of a polygon with a single, closed five point ring
+_WKB_POLYGON = np.dtype([("byte_order", "u1"), ("type", "<u4"),
+                         ("rings", "<u4"), ("points", "<u4"),
+                         ("coordinates", "<f8", (10, ))])
+
+
+class TileIndex:
+    """An array-backed index of the cells of a tile grid.
+
+    Each cell has a column and row number, counted from the grid origin
+    eastward and northward, and its left, bottom, right and top bounds.
+    Cells are ordered by column and then by row.
+    """
+
+    def __init__(self,
+                 cols: np.ndarray,
+                 rows: np.ndarray,
+                 bounds: np.ndarray,
+                 crs: Optional[CRS] = None) -> None:
+        self.cols = cols
+        self.rows = rows
+        self.bounds = bounds
+        self.crs = crs
+
+    @classmethod
+    def create(cls,
+               left: float,
+               bottom: float,
+               right: float,
+               top: float,
+               size: float,
+               bbox: Optional[Tuple[float, float, float, float]] = None,
+               crs: Optional[CRS] = None) -> "TileIndex":
+        """Creates the grid of cells covering the given bounds.
+
+        Cell edges are computed as ``origin + n * size`` rather than by
+        repeated addition, so they do not drift for non-integer sizes. Cells
+        at the right and top of the grid are clipped to the bounds.
+
+        Args:
+            left (float): Left coordinate of the grid origin.
+            bottom (float): Bottom coordinate of the grid origin.
+            right (float): Right limit of the grid.
+            top (float): Top limit of the grid.
+            size (float): Cell size in the units of the coordinates.
+            bbox (Optional[Tuple[float, float, float, float]]): If provided,
+                only cells that intersect this left, bottom, right, top box
+                are included.
+            crs (Optional[CRS]): CRS of the coordinates.
+        Returns:
+            TileIndex: The grid cells.
+        """
+        if size <= 0:
+            raise ValueError(f"size must be positive, got {size}")
+        lefts = _edges(left, right, size)
+        bottoms = _edges(bottom, top, size)
+        cols = np.repeat(np.arange(len(lefts)), len(bottoms))
+        rows = np.tile(np.arange(len(bottoms)), len(lefts))
+        cell_lefts = lefts[cols]
+        cell_bottoms = bottoms[rows]
+        bounds = np.column_stack([
+            cell_lefts, cell_bottoms,
+            np.minimum(cell_lefts + size, right),
+            np.minimum(cell_bottoms + size, top)
+        ])
+        index = cls(cols, rows, bounds, crs)
+        if bbox is not None:
+            index = index.intersecting(bbox)
+        return index
+
+    def __len__(self) -> int:
+        return len(self.cols)
+
+    def select(self, mask: np.ndarray) -> "TileIndex":
+        """Returns the cells where ``mask`` is True."""
+        return TileIndex(self.cols[mask], self.rows[mask], self.bounds[mask],
+                         self.crs)
+
+    def shard(self, index: int, count: int) -> "TileIndex":
+        """Returns every ``count``-th cell, starting at the ``index``-th.
+
+        Shards are dealt round-robin in cell order, so neighbouring cells,
+        which tend to be alike in how much valid data they hold, go to
+        different shards, and the ``count`` shards together hold every cell
+        exactly once.
+        """
+        check_shard(index, count)
+        return self.select(np.arange(len(self)) % count == index)
+
+    def intersecting(self, bbox: Tuple[float, float, float,
+                                       float]) -> "TileIndex":
+        """Returns the cells whose interiors intersect a left, bottom, right,
+        top box."""
+        left, bottom, right, top = bbox
+        return self.select((self.bounds[:, 0] < right)
+                           & (self.bounds[:, 2] > left)
+                           & (self.bounds[:, 1] < top)
+                           & (self.bounds[:, 3] > bottom))
+
+    def to_dict(self) -> Dict[str, List[Any]]:
+        """Returns the index as a dictionary of columns."""
+        return {
+            "col": self.cols.tolist(),
+            "row": self.rows.tolist(),
+            "left": self.bounds[:, 0].tolist(),
+            "bottom": self.bounds[:, 1].tolist(),
+            "right": self.bounds[:, 2].tolist(),
+            "top": self.bounds[:, 3].tolist(),
+        }
+
+    def write(self, path: str) -> None:
+        """Writes the index as GeoParquet for ``.parquet`` and ``.geoparquet``
+        files, and as GeoJSON otherwise."""
+        if os.path.splitext(path)[1].lower() in (".parquet", ".geoparquet"):
+            self.to_geoparquet(path)
+        else:
+            self.to_geojson(path)
+
+    def to_geojson(self, path: str) -> None:
+        """Writes the index as a GeoJSON FeatureCollection.
+
+        Cell corners are reprojected to EPSG:4326, as GeoJSON requires, in a
+        single call. The properties hold the columns, with bounds in the
+        grid's CRS.
+        """
+        rings = self._rings()
+        if self.crs is not None and len(self):
+            xs, ys = transform(self.crs, "EPSG:4326", rings[:, :, 0].ravel(),
+                               rings[:, :, 1].ravel())
+            rings = np.stack([xs, ys], axis=-1).reshape(rings.shape)
+        columns = self.to_dict()
+        features = [{
+            "type": "Feature",
+            "geometry": {
+                "type": "Polygon",
+                "coordinates": [ring]
+            },
+            "properties": {
+                name: columns[name][i]
+                for name in COLUMNS
+            },
+        } for i, ring in enumerate(rings.tolist())]
+        with open(path, "w") as file:
+            json.dump({
+                "type": "FeatureCollection",
+                "features": features
+            }, file)
+
+    def to_geoparquet(self, path: str) -> None:
+        """Writes the index as a GeoParquet file with WKB geometries in the
+        grid's CRS. Requires pyarrow."""
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("GeoParquet output requires pyarrow; install "
+                              "stactools-chesapeake-lulc[geoparquet]") from e
+
+        wkb = np.zeros(len(self), dtype=_WKB_POLYGON)
+        wkb["byte_order"] = 1
+        wkb["type"] = 3
+        wkb["rings"] = 1
+        wkb["points"] = 5
+        wkb["coordinates"] = self._rings().reshape(len(self), 10)
+        offsets = np.arange(len(self) + 1,
+                            dtype=np.int32) * _WKB_POLYGON.itemsize
+        geometry = pa.Array.from_buffers(
+            pa.binary(), len(self),
+            [None, pa.py_buffer(offsets),
+             pa.py_buffer(wkb.tobytes())])
+
+        table = pa.table({
+            "col": pa.array(self.cols, pa.int32()),
+            "row": pa.array(self.rows, pa.int32()),
+            "left": self.bounds[:, 0],
+            "bottom": self.bounds[:, 1],
+            "right": self.bounds[:, 2],
+            "top": self.bounds[:, 3],
+            "geometry": geometry,
+        })
+        column: Dict[str, Any] = {
+            "encoding": "WKB",
+            "geometry_types": ["Polygon"]
+        }
+        if self.crs is not None:
+            column["crs"] = self.crs.to_dict(projjson=True)
+        if len(self):
+            column["bbox"] = [
+                float(self.bounds[:, 0].min()),
+                float(self.bounds[:, 1].min()),
+                float(self.bounds[:, 2].max()),
+                float(self.bounds[:, 3].max())
+            ]
+        geo = {
+            "version": "1.0.0",
+            "primary_column": "geometry",
+            "columns": {
+                "geometry": column
+            }
+        }
+        table = table.replace_schema_metadata({"geo": json.dumps(geo)})
+        pq.write_table(table, path)
+
+    def _rings(self) -> np.ndarray:
+        """Returns the closed, counterclockwise ring of each cell as an array
+        of shape (cells, 5, 2)."""
+        left, bottom, right, top = self.bounds.T
+        xs = np.stack([left, right, right, left, left], axis=1)
+        ys = np.stack([bottom, bottom, top, top, bottom], axis=1)
+        return np.stack([xs, ys], axis=-1)
+
+
+class SourceIndex:
+    """An in-memory spatial index of the bounds of source rasters.
+
+    Bounds are held in an array, so that the sources overlapping many grid
+    cells are found with vectorized comparisons, a chunk of cells at a time.
+    """
+
+    def __init__(self, bounds: np.ndarray) -> None:
+        self.bounds = np.asarray(bounds, dtype=float).reshape(-1, 4)
+
+    def __len__(self) -> int:
+        return len(self.bounds)
+
+    @property
+    def extent(self) -> Tuple[float, float, float, float]:
+        """The left, bottom, right and top bounds of all sources."""
+        return (float(self.bounds[:, 0].min()), float(self.bounds[:, 1].min()),
+                float(self.bounds[:, 2].max()), float(self.bounds[:, 3].max()))
+
+    def overlapping(self, index: TileIndex) -> List[List[int]]:
+        """Returns, for each cell of ``index``, the positions of the sources
+        whose interiors intersect it, in source order."""
+        overlaps: List[List[int]] = []
+        for start in range(0, len(index), _OVERLAP_CHUNK_SIZE):
+            cells = index.bounds[start:start + _OVERLAP_CHUNK_SIZE, None, :]
+            hits = ((cells[..., 0] < self.bounds[:, 2])
+                    & (cells[..., 2] > self.bounds[:, 0])
+                    & (cells[..., 1] < self.bounds[:, 3])
+                    & (cells[..., 3] > self.bounds[:, 1]))
+            overlaps.extend(np.flatnonzero(row).tolist() for row in hits)
+        return overlaps
+
+
+def check_shard(index: int, count: int) -> None:
+    """Raises a ValueError unless ``index`` is a shard of ``count``."""
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Invalid shard {index}/{count}: the count must be "
+                         "positive and the index from 0 to count - 1")
+
+
+def _edges(start: float, stop: float, size: float) -> np.ndarray:
+    """Returns ``start + n * size`` for every n that is less than ``stop``."""
+    count = max(0, math.ceil((stop - start) / size) + 1)
+    edges = start + np.arange(count) * size
+    return edges[edges < stop]
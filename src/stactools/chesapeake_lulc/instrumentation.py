@@ -0,0 +1,195 @@
+import cProfile
+import linecache
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, List, Optional, TypeVar, cast
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+class Metrics:
+    """Per-stage call counters and wall clock timers.
+
+    Recording is off until :attr:`enabled` is set, and then :meth:`stage`
+    and :meth:`count` return at once, so instrumented code costs a flag
+    check when no one is measuring it. Times are summed across threads and
+    include the time spent in nested stages. Work done in worker processes,
+    e.g. batch validation in ``validate_items``, is not recorded.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._timers: Dict[str, List[float]] = {}
+        self._counters: Dict[str, int] = {}
+
+    def reset(self) -> None:
+        """Discards everything recorded so far."""
+        with self._lock:
+            self._timers = {}
+            self._counters = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Times the body of a ``with`` block as one call of a stage."""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def timed(self, name: str) -> Callable[[F], F]:
+        """Decorator that times each call of a function as a stage."""
+
+        def decorator(func: F) -> F:
+
+            @wraps(func)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                with self.stage(name):
+                    return func(*args, **kwargs)
+
+            return cast(F, wrapper)
+
+        return decorator
+
+    def add_time(self, name: str, seconds: float) -> None:
+        """Records one call of a stage that took ``seconds``."""
+        with self._lock:
+            timer = self._timers.get(name)
+            if timer is None:
+                self._timers[name] = [1, seconds, seconds]
+            else:
+                timer[0] += 1
+                timer[1] += seconds
+                timer[2] = max(timer[2], seconds)
+
+    def count(self, name: str, n: int = 1) -> None:
+        """Adds ``n`` to a counter."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Returns the stages, with their calls and total, mean and maximum
+        seconds, and the counters, sorted by name."""
+        with self._lock:
+            stages = {
+                name: {
+                    "calls": int(calls),
+                    "total_seconds": total,
+                    "mean_seconds": total / calls,
+                    "max_seconds": longest,
+                }
+                for name, (calls, total,
+                           longest) in sorted(self._timers.items())
+            }
+            counters = dict(sorted(self._counters.items()))
+        return {"stages": stages, "counters": counters}
+
+
+# The process-wide metrics that the library records to.
+metrics = Metrics()
+
+
+class Profiler:
+    """Records :data:`metrics` for the duration of a run, optionally with
+    cProfile and tracemalloc.
+
+    cProfile only profiles the thread that called :meth:`start`, so with
+    several workers the time spent writing tiles or creating Items in
+    worker threads is missing from its statistics, though not from the
+    stage timers.
+
+    Args:
+        cprofile_path (Optional[str]): If provided, the calling thread is
+            profiled with cProfile and the statistics are written to this
+            file, for ``pstats`` or snakeviz.
+        trace_memory (bool): Trace Python allocations with tracemalloc and
+            report the peak and the lines that allocated the most.
+        top (int): Number of allocating lines to report.
+    """
+
+    def __init__(self,
+                 cprofile_path: Optional[str] = None,
+                 trace_memory: bool = False,
+                 top: int = 10) -> None:
+        self.cprofile_path = cprofile_path
+        self.trace_memory = trace_memory
+        self.top = top
+        self._profile: Optional[cProfile.Profile] = None
+        self._start = 0.0
+
+    def start(self) -> None:
+        metrics.reset()
+        metrics.enabled = True
+        if self.trace_memory:
+            tracemalloc.start()
+        if self.cprofile_path is not None:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        self._start = time.perf_counter()
+
+    def stop(self) -> Dict[str, Any]:
+        """Stops recording and returns the report, writing the cProfile
+        statistics if requested."""
+        elapsed = time.perf_counter() - self._start
+        if self._profile is not None and self.cprofile_path is not None:
+            self._profile.disable()
+            self._profile.dump_stats(self.cprofile_path)
+            self._profile = None
+        metrics.enabled = False
+        report: Dict[str, Any] = {"elapsed_seconds": elapsed}
+        report.update(metrics.to_dict())
+        if self.trace_memory:
+            report["memory"] = self._memory()
+            tracemalloc.stop()
+        return report
+
+    def _memory(self) -> Dict[str, Any]:
+        _, peak = tracemalloc.get_traced_memory()
+        statistics = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, linecache.__file__),
+        ]).statistics("lineno")
+        return {
+            "peak_bytes":
+            peak,
+            "top": [{
+                "location": f"{stat.traceback[0].filename}:"
+                f"{stat.traceback[0].lineno}",
+                "bytes": stat.size,
+                "blocks": stat.count,
+            } for stat in statistics[:self.top]],
+        }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Formats the report returned by :meth:`Profiler.stop` as a table."""
+    lines = [
+        f"{'stage':<24} {'calls':>7} {'total s':>9} {'mean ms':>9} "
+        f"{'max ms':>9}"
+    ]
+    for name, stage in report["stages"].items():
+        lines.append(f"{name:<24} {stage['calls']:>7} "
+                     f"{stage['total_seconds']:>9.3f} "
+                     f"{stage['mean_seconds'] * 1000:>9.2f} "
+                     f"{stage['max_seconds'] * 1000:>9.2f}")
+    for name, value in report["counters"].items():
+        lines.append(f"{name:<24} {value:>7}")
+    lines.append(f"{'elapsed':<24} {'':>7} {report['elapsed_seconds']:>9.3f}")
+    memory = report.get("memory")
+    if memory is not None:
+        lines.append(f"python memory peak: "
+                     f"{memory['peak_bytes'] / 2**20:.1f} MiB")
+        for allocation in memory["top"]:
+            lines.append(f"  {allocation['bytes'] / 2**10:>10.1f} KiB "
+                         f"{allocation['blocks']:>7} "
+                         f"{allocation['location']}")
+    return "\n".join(lines)
@@ -1,37 +1,180 @@
+import logging
 import os.path
-from typing import Optional
+import re
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
 
 import rasterio
+from affine import Affine
+from rasterio.coords import BoundingBox
+from rasterio.crs import CRS
+from rasterio.transform import array_bounds
 from rasterio.warp import transform_geom
 from shapely.geometry import box, mapping, shape
 from stactools.core.io import ReadHrefModifier
 
-from stactools.chesapeake_lulc.constants import CollectionId
+from stactools.chesapeake_lulc.constants import (HEADER_READ_OPTIONS,
+                                                 CollectionId)
+from stactools.chesapeake_lulc.instrumentation import metrics
+
+_DOWNLOAD_PATTERN = re.compile(r"VSICURL: Downloading ([\d,-]+) ")
+_GDAL_LOGGER = logging.getLogger("rasterio._env")
+
+
+class ReadStats:
+    """Counts the HTTP range requests and bytes GDAL uses to read files.
+
+    Counts are gathered from GDAL's /vsicurl debug messages, so local files
+    always count zero.
+    """
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.bytes = 0
+
+    def __repr__(self) -> str:
+        return f"ReadStats(requests={self.requests}, bytes={self.bytes})"
+
+    def add(self, ranges: str) -> None:
+        self.requests += 1
+        for byte_range in ranges.split(","):
+            start, end = byte_range.split("-")
+            self.bytes += int(end) - int(start) + 1
+
+
+class _ReadStatsHandler(logging.Handler):
+    """Routes /vsicurl download messages to the ReadStats of the thread
+    that issued them."""
+
+    def __init__(self) -> None:
+        super().__init__(logging.DEBUG)
+        self.local = threading.local()
+        self.collect_lock = threading.Lock()
+        self.active = 0
+        self.previous_level = logging.NOTSET
+
+    def emit(self, record: logging.LogRecord) -> None:
+        stats = getattr(self.local, "stats", None)
+        if stats is None:
+            return
+        match = _DOWNLOAD_PATTERN.search(record.getMessage())
+        if match:
+            stats.add(match.group(1))
+
+
+_handler = _ReadStatsHandler()
+
+
+@contextmanager
+def _collect(stats: Optional[ReadStats]) -> Iterator[None]:
+    if stats is None:
+        yield
+        return
+    with _handler.collect_lock:
+        if _handler.active == 0:
+            _handler.previous_level = _GDAL_LOGGER.level
+            _GDAL_LOGGER.setLevel(logging.DEBUG)
+            _GDAL_LOGGER.addHandler(_handler)
+        _handler.active += 1
+    _handler.local.stats = stats
+    try:
+        with rasterio.Env(CPL_DEBUG=True):
+            yield
+    finally:
+        _handler.local.stats = None
+        with _handler.collect_lock:
+            _handler.active -= 1
+            if _handler.active == 0:
+                _GDAL_LOGGER.removeHandler(_handler)
+                _GDAL_LOGGER.setLevel(_handler.previous_level)
 
 
 class Metadata:
-    """Class for accessing Item metadata from a COG."""
+    """Class for accessing Item metadata from a COG.
+
+    Only the header is read, with GDAL configured by
+    ``constants.HEADER_READ_OPTIONS`` to skip sidecar file probing and to
+    merge range requests.
+    """
 
     def __init__(self,
                  href: str,
-                 read_href_modifier: Optional[ReadHrefModifier] = None):
+                 read_href_modifier: Optional[ReadHrefModifier] = None,
+                 read_stats: Optional[ReadStats] = None):
         if read_href_modifier:
             modified_href = read_href_modifier(href)
         else:
             modified_href = href
-        with rasterio.open(modified_href) as dataset:
-            self.source_crs = dataset.crs
-            self.source_bbox = dataset.bounds
-            self.source_geometry = mapping(box(*self.source_bbox))
-            self.source_shape = dataset.shape
-            self.source_transform = list(dataset.transform)[0:6]
+        with metrics.stage("metadata.read"):
+            with rasterio.Env(**HEADER_READ_OPTIONS), _collect(
+                    read_stats), rasterio.open(modified_href) as dataset:
+                self.source_crs = dataset.crs
+                self.source_bbox = dataset.bounds
+                self.source_geometry = mapping(box(*self.source_bbox))
+                self.source_shape = dataset.shape
+                self.source_transform = list(dataset.transform)[0:6]
 
         self.href = href
+        self._geometry: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def from_dict(cls, href: str, data: Dict[str, Any]) -> "Metadata":
+        """Creates Metadata from the output of :meth:`to_dict` without
+        opening the COG."""
+        metadata = cls.__new__(cls)
+        metadata.href = href
+        metadata.source_crs = CRS.from_wkt(data["crs"])
+        metadata.source_bbox = BoundingBox(*data["bounds"])
+        metadata.source_geometry = mapping(box(*metadata.source_bbox))
+        metadata.source_shape = tuple(data["shape"])
+        metadata.source_transform = data["transform"]
+        metadata._geometry = data.get("geometry")
+        return metadata
+
+    @classmethod
+    def from_grid(cls, href: str, crs: CRS, transform: Affine,
+                  shape: Tuple[int, int]) -> "Metadata":
+        """Creates Metadata for a COG from the grid it was written with,
+        without opening it.
+
+        Args:
+            href (str): HREF of the COG.
+            crs (CRS): CRS of the COG.
+            transform (Affine): Geotransform of the COG.
+            shape (Tuple[int, int]): Height and width of the COG in pixels.
+        Returns:
+            Metadata: The metadata that would be read from the COG.
+        """
+        metadata = cls.__new__(cls)
+        metadata.href = href
+        metadata.source_crs = crs
+        metadata.source_bbox = BoundingBox(
+            *array_bounds(shape[0], shape[1], transform))
+        metadata.source_geometry = mapping(box(*metadata.source_bbox))
+        metadata.source_shape = tuple(shape)
+        metadata.source_transform = list(transform)[0:6]
+        metadata._geometry = None
+        return metadata
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Returns the values read from the COG, and the derived geometry, as
+        a JSON-serializable dictionary."""
+        return {
+            "crs": self.source_crs.to_wkt(),
+            "bounds": list(self.source_bbox),
+            "shape": list(self.source_shape),
+            "transform": self.source_transform,
+            "geometry": self.geometry,
+        }
 
     @property
     def geometry(self):
-        return transform_geom(self.source_crs, "EPSG:4326",
-                              self.source_geometry)
+        if self._geometry is None:
+            with metrics.stage("metadata.transform"):
+                self._geometry = transform_geom(self.source_crs, "EPSG:4326",
+                                                self.source_geometry)
+        return self._geometry
 
     @property
     def bbox(self):
@@ -53,15 +196,19 @@ class Metadata:
 
     @property
     def collection_id(self):
-        filename = self.item_id.lower()
-        if "lu" in filename:
-            id = CollectionId.LU.value
-        elif "7class" in filename:
-            id = CollectionId.LC7.value
-        elif "13class" in filename:
-            id = CollectionId.LC13.value
-        else:
-            raise ValueError(
-                f"Collection ID not able to be inferred from href: {self.href}"
-            )
-        return id
+        return infer_collection_id(self.href)
+
+
+def infer_collection_id(href: str) -> str:
+    """Infers the collection of a COG from its file name."""
+    filename = os.path.splitext(os.path.basename(href))[0].lower()
+    if "lu" in filename:
+        id = CollectionId.LU.value
+    elif "7class" in filename:
+        id = CollectionId.LC7.value
+    elif "13class" in filename:
+        id = CollectionId.LC13.value
+    else:
+        raise ValueError(
+            f"Collection ID not able to be inferred from href: {href}")
+    return id
@@ -0,0 +1,313 @@
+import math
+import os
+import re
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import rasterio
+from affine import Affine
+from pystac import Collection, StacIO
+from pystac.utils import make_absolute_href
+from rasterio.crs import CRS
+from rasterio.errors import WindowError
+from rasterio.features import geometry_mask
+from rasterio.io import DatasetReader
+from rasterio.transform import array_bounds, rowcol
+from rasterio.warp import transform, transform_geom
+from rasterio.windows import Window
+from rasterio.windows import bounds as window_bounds
+from shapely.geometry import box, shape
+from shapely.geometry.base import BaseGeometry
+from shapely.prepared import PreparedGeometry, prep
+
+from stactools.chesapeake_lulc.constants import (HEADER_READ_OPTIONS,
+                                                 QUERY_MAX_OPEN_DATASETS)
+from stactools.chesapeake_lulc.grid import SourceIndex
+from stactools.chesapeake_lulc.instrumentation import metrics
+from stactools.chesapeake_lulc.metadata import Metadata
+from stactools.chesapeake_lulc.stac_io import use_fsspec
+from stactools.chesapeake_lulc.utils import block_windows
+
+# The left and bottom grid coordinates in a tile name, e.g. _E1300000_N1770000
+_TILE_NAME = re.compile(r"_E(\d+)_N(\d+)")
+
+# A longitude, latitude pair
+Point = Tuple[float, float]
+
+
+class TileQuery:
+    """Point and polygon class queries over the COGs of a tiled collection.
+
+    The tile bounds are held in memory. When every tile is named with its
+    grid coordinates, as :func:`utils.tile` names them, and the tiles share
+    a size, points are located with a hash of grid cells; otherwise they
+    are compared with all the bounds at once. Query geometries are
+    reprojected to the tiles' CRS once per query, and only the COG blocks
+    they overlap are read. The most recently used datasets are kept open.
+
+    Queries are not thread-safe.
+
+    Args:
+        hrefs (Sequence[str]): HREFs of the COGs.
+        bounds (np.ndarray): Left, bottom, right and top bounds of each COG,
+            in ``crs``.
+        crs (CRS): CRS of the COGs.
+        max_open (int): Number of datasets to keep open.
+    """
+
+    def __init__(self,
+                 hrefs: Sequence[str],
+                 bounds: np.ndarray,
+                 crs: CRS,
+                 max_open: int = QUERY_MAX_OPEN_DATASETS) -> None:
+        if max_open < 1:
+            raise ValueError(f"max_open must be at least 1, got {max_open}")
+        self.hrefs = list(hrefs)
+        self.index = SourceIndex(bounds)
+        self.crs = crs
+        self.max_open = max_open
+        self._grid = _grid_hash(self.hrefs, self.index.bounds)
+        self._datasets: "OrderedDict[str, DatasetReader]" = OrderedDict()
+
+    @classmethod
+    def from_collection(
+            cls,
+            collection_path: str,
+            max_open: int = QUERY_MAX_OPEN_DATASETS) -> "TileQuery":
+        """Creates a query over the ``data`` assets of a saved collection.
+
+        Tile bounds come from the projection extension fields of each Item,
+        so no COG is opened until it is queried.
+        """
+        use_fsspec()
+        collection = Collection.from_file(collection_path)
+        stac_io = StacIO.default()
+        hrefs = []
+        bounds = []
+        crs: Optional[CRS] = None
+        for link in collection.get_item_links():
+            item_href = link.get_absolute_href()
+            if item_href is None:
+                raise ValueError(f"Item link has no absolute href: {link}")
+            item = stac_io.read_json(item_href)
+            properties = item["properties"]
+            item_crs = CRS.from_wkt(properties["proj:wkt2"])
+            if crs is None:
+                crs = item_crs
+            elif item_crs != crs:
+                raise ValueError(f"{item['id']} is not in the CRS of the "
+                                 "other Items")
+            height, width = properties["proj:shape"]
+            bounds.append(
+                array_bounds(height, width,
+                             Affine(*properties["proj:transform"][0:6])))
+            hrefs.append(
+                make_absolute_href(item["assets"]["data"]["href"], item_href))
+        if crs is None:
+            raise ValueError(f"{collection_path} has no Items")
+        return cls(hrefs, np.array(bounds), crs, max_open)
+
+    @classmethod
+    def from_hrefs(cls,
+                   hrefs: Sequence[str],
+                   max_open: int = QUERY_MAX_OPEN_DATASETS) -> "TileQuery":
+        """Creates a query over COGs, reading the header of each."""
+        metadata = [Metadata(href) for href in hrefs]
+        if not metadata:
+            raise ValueError("No COGs to query")
+        crs = metadata[0].source_crs
+        for item in metadata[1:]:
+            if item.source_crs != crs:
+                raise ValueError(f"{item.href} is not in the CRS of "
+                                 f"{metadata[0].href}")
+        bounds = np.array([list(item.source_bbox) for item in metadata])
+        return cls(hrefs, bounds, crs, max_open)
+
+    def locate(self, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        """Returns the position of the tile containing each point, in the
+        tiles' CRS, or -1 for points outside every tile."""
+        xs = np.asarray(xs, dtype=float)
+        ys = np.asarray(ys, dtype=float)
+        bounds = self.index.bounds
+        if self._grid is not None:
+            origin_x, origin_y, size, cells = self._grid
+            cols = np.floor((xs - origin_x) / size).astype(np.int64)
+            rows = np.floor((ys - origin_y) / size).astype(np.int64)
+            keys = zip(cols.tolist(), rows.tolist())
+            positions = np.array([cells.get(key, -1) for key in keys],
+                                 dtype=np.int64)
+        else:
+            inside = ((xs[:, None] >= bounds[:, 0])
+                      & (xs[:, None] < bounds[:, 2])
+                      & (ys[:, None] >= bounds[:, 1])
+                      & (ys[:, None] < bounds[:, 3]))
+            positions = np.where(inside.any(axis=1), inside.argmax(axis=1), -1)
+        # Cells at the edge of the grid may be clipped to the source.
+        found = positions >= 0
+        tiles = bounds[positions[found]]
+        found[found] = ((xs[found] >= tiles[:, 0]) & (xs[found] < tiles[:, 2])
+                        & (ys[found] >= tiles[:, 1])
+                        & (ys[found] < tiles[:, 3]))
+        return np.where(found, positions, -1)
+
+    def classes_at(self, points: Sequence[Point]) -> List[Optional[int]]:
+        """Returns the class value at each longitude, latitude point, or None
+        where there is no tile or the pixel is nodata.
+
+        Points are reprojected in a single call and read tile by tile,
+        through GDAL's block cache.
+        """
+        if not len(points):
+            return []
+        with metrics.stage("query.transform"):
+            lons, lats = zip(*points)
+            xs, ys = transform("EPSG:4326", self.crs, list(lons), list(lats))
+        xs = np.asarray(xs)
+        ys = np.asarray(ys)
+        positions = self.locate(xs, ys)
+        values: List[Optional[int]] = [None] * len(points)
+        with metrics.stage("query.read"):
+            for position in np.unique(positions[positions >= 0]).tolist():
+                selected = np.flatnonzero(positions == position)
+                dataset = self._open(self.hrefs[position])
+                coords = zip(xs[selected].tolist(), ys[selected].tolist())
+                for i, sample in zip(selected.tolist(),
+                                     dataset.sample(coords, indexes=1)):
+                    if dataset.nodata is None or sample[0] != dataset.nodata:
+                        values[i] = int(sample[0])
+        return values
+
+    def class_counts(self, geometry: Dict[str, Any]) -> Dict[int, int]:
+        """Counts the pixels of each class whose centers are in a GeoJSON
+        geometry in EPSG:4326.
+
+        Only the blocks of each tile that intersect the geometry are read
+        and rasterized.
+
+        Args:
+            geometry (Dict[str, Any]): GeoJSON Polygon or MultiPolygon.
+        Returns:
+            Dict[int, int]: The number of valid pixels of each class value
+            present, sorted by value.
+        """
+        with metrics.stage("query.transform"):
+            source_geometry = transform_geom("EPSG:4326", self.crs, geometry)
+        polygon = shape(source_geometry)
+        prepared = prep(polygon)
+        left, bottom, right, top = polygon.bounds
+        bounds = self.index.bounds
+        candidates = np.flatnonzero((bounds[:, 0] < right)
+                                    & (bounds[:, 2] > left)
+                                    & (bounds[:, 1] < top)
+                                    & (bounds[:, 3] > bottom))
+        counts = np.zeros(0, dtype=np.int64)
+        with metrics.stage("query.read"):
+            for position in candidates.tolist():
+                dataset = self._open(self.hrefs[position])
+                for data in _blocks_in(dataset, polygon, prepared,
+                                       source_geometry):
+                    block_counts = np.bincount(data)
+                    if len(block_counts) > len(counts):
+                        counts = np.pad(counts,
+                                        (0, len(block_counts) - len(counts)))
+                    counts[:len(block_counts)] += block_counts
+        return {
+            value: int(count)
+            for value, count in enumerate(counts.tolist()) if count
+        }
+
+    def close(self) -> None:
+        """Closes the open datasets."""
+        while self._datasets:
+            _, dataset = self._datasets.popitem()
+            dataset.close()
+
+    def __enter__(self) -> "TileQuery":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def _open(self, href: str) -> DatasetReader:
+        """Returns an open dataset, closing the least recently used one if
+        more than ``max_open`` would be open."""
+        dataset = self._datasets.get(href)
+        if dataset is not None:
+            self._datasets.move_to_end(href)
+            metrics.count("query.dataset.hit")
+            return dataset
+        metrics.count("query.dataset.miss")
+        with rasterio.Env(**HEADER_READ_OPTIONS):
+            dataset = rasterio.open(href)
+        self._datasets[href] = dataset
+        if len(self._datasets) > self.max_open:
+            _, oldest = self._datasets.popitem(last=False)
+            oldest.close()
+        return dataset
+
+
+def _blocks_in(dataset: DatasetReader, polygon: BaseGeometry,
+               prepared: PreparedGeometry,
+               geometry: Dict[str, Any]) -> Iterator[np.ndarray]:
+    """Yields the valid values, in a flat array, of the pixels of each block
+    of band 1 whose centers are in the polygon."""
+    left, bottom, right, top = polygon.bounds
+    row_start, col_start = rowcol(dataset.transform, left, top, op=math.floor)
+    row_stop, col_stop = rowcol(dataset.transform, right, bottom, op=math.ceil)
+    try:
+        window = Window(col_start, row_start, col_stop - col_start,
+                        row_stop - row_start).intersection(
+                            Window(0, 0, dataset.width, dataset.height))
+    except WindowError:
+        return
+    for block_window in block_windows(dataset, window):
+        block_transform = dataset.window_transform(block_window)
+        if not prepared.intersects(
+                box(*window_bounds(block_window, dataset.transform))):
+            continue
+        inside = geometry_mask([geometry],
+                               (block_window.height, block_window.width),
+                               block_transform,
+                               invert=True)
+        if not inside.any():
+            continue
+        inside &= dataset.read_masks(1, window=block_window) != 0
+        yield dataset.read(1, window=block_window)[inside]
+
+
+def _grid_hash(
+    hrefs: List[str], bounds: np.ndarray
+) -> Optional[Tuple[float, float, float, Dict[Tuple[int, int], int]]]:
+    """Returns the grid origin, cell size and position of each grid cell's
+    tile, if every tile is named after a cell of a single grid."""
+    if not hrefs:
+        return None
+    corners = []
+    for href in hrefs:
+        matches = _TILE_NAME.findall(os.path.basename(href))
+        if not matches:
+            return None
+        corners.append(matches[-1])
+    lefts = np.array([float(left) for left, _ in corners])
+    bottoms = np.array([float(bottom) for _, bottom in corners])
+    size = float(
+        max((bounds[:, 2] - bounds[:, 0]).max(),
+            (bounds[:, 3] - bounds[:, 1]).max()))
+    origin_x = float(lefts.min())
+    origin_y = float(bottoms.min())
+    cols = (lefts - origin_x) / size
+    rows = (bottoms - origin_y) / size
+    if not (np.allclose(cols, np.round(cols))
+            and np.allclose(rows, np.round(rows))):
+        return None
+    if not (np.allclose(lefts, bounds[:, 0], atol=abs(size) * 1e-6)
+            and np.allclose(bottoms, bounds[:, 1], atol=abs(size) * 1e-6)):
+        return None
+    keys = zip(
+        np.round(cols).astype(int).tolist(),
+        np.round(rows).astype(int).tolist())
+    cells = {key: position for position, key in enumerate(keys)}
+    if len(cells) < len(hrefs):
+        return None
+    return origin_x, origin_y, size, cells
@@ -0,0 +1,228 @@
+import json
+import os
+import re
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+import rasterio
+import rasterio.shutil
+from rasterio.io import DatasetReader, MemoryFile
+from rasterio.windows import Window
+
+from stactools.chesapeake_lulc.constants import (COG_BLOCKSIZE, COG_COMPRESS,
+                                                 CollectionId)
+from stactools.chesapeake_lulc.fragments import StacFragments
+from stactools.chesapeake_lulc.instrumentation import metrics
+from stactools.chesapeake_lulc.metadata import Metadata, infer_collection_id
+from stactools.chesapeake_lulc.utils import atomic_output, block_windows, imap
+
+# Target classes of source classes whose descriptions differ between the
+# 13-class and 7-class land cover products. Classes with the same
+# description in both are matched by name.
+CLASS_CROSSWALK = {
+    "Emergent Wetlands": "Low Vegetation",
+    "Tree Canopy": "Tree Canopy and Shrubs",
+    "Shrubland": "Tree Canopy and Shrubs",
+    "Structures": "Impervious Surfaces",
+    "Tree Canopy over Structures": "Tree Canopy and Shrubs",
+    "Tree Canopy over Impervious Surfaces": "Tree Canopy and Shrubs",
+    "Tree Canopy over impervious Roads": "Tree Canopy and Shrubs",
+}
+
+# The part of a file name that identifies its collection, as matched by
+# metadata.infer_collection_id, and the replacement for each collection.
+_NAME_PATTERNS = {
+    CollectionId.LU.value: (r"(?<![a-z])lu(?![a-z])", "LU"),
+    CollectionId.LC7.value: (r"7class", "7class"),
+    CollectionId.LC13.value: (r"13class", "13Class"),
+}
+
+
+def class_lut(source_id: str,
+              target_id: str,
+              mapping: Optional[Dict[int, int]] = None) -> np.ndarray:
+    """Builds a lookup table from the pixel values of one collection to
+    those of another.
+
+    Without a ``mapping``, each source class is mapped to the target class
+    with the same ``classification:classes`` description, or the one named
+    for it in :data:`CLASS_CROSSWALK`. Values that are not source classes,
+    including the source nodata value, map to the target nodata value.
+
+    Args:
+        source_id (str): ID of the collection of the source COGs.
+        target_id (str): ID of the collection of the reclassified COGs.
+        mapping (Optional[Dict[int, int]]): Target value of each source
+            class value. May map classes to the target nodata value.
+    Returns:
+        np.ndarray: An array of 256 uint8 target values, indexed by source
+        value.
+    Raises:
+        ValueError: If a source class has no target class, or the mapping
+            has values that are not target classes.
+    """
+    source = _classes(source_id)
+    target = _classes(target_id)
+    nodata = _nodata(target_id)
+    if mapping is None:
+        values = {description: value for value, description in target.items()}
+        mapping = {}
+        for value, description in source.items():
+            description = CLASS_CROSSWALK.get(description, description)
+            if description in values:
+                mapping[value] = values[description]
+
+    unmapped = sorted(set(source) - set(mapping))
+    if unmapped:
+        raise ValueError(
+            f"No {target_id} class for {source_id} classes "
+            f"{', '.join(f'{value} ({source[value]})' for value in unmapped)}"
+            "; supply a lookup table")
+    invalid = sorted(value for value in mapping if not 0 <= value <= 255)
+    if invalid:
+        raise ValueError(f"Not 8-bit source values: "
+                         f"{', '.join(str(value) for value in invalid)}")
+    invalid = sorted(set(mapping.values()) - set(target) - {nodata})
+    if invalid:
+        raise ValueError(f"Not {target_id} classes: "
+                         f"{', '.join(str(value) for value in invalid)}")
+
+    lut = np.full(256, nodata, dtype=np.uint8)
+    lut[list(mapping)] = list(mapping.values())
+    return lut
+
+
+def read_lut(path: str) -> Dict[int, int]:
+    """Reads a lookup table from a JSON object of source class values to
+    target class values, e.g. ``{"1": 1, "2": 3}``."""
+    with open(path) as file:
+        data = json.load(file)
+    return {int(source): int(target) for source, target in data.items()}
+
+
+def reclassify(dataset: DatasetReader, outfile: str, lut: np.ndarray,
+               nodata: int) -> Metadata:
+    """Writes band 1 of a dataset, mapped through a lookup table, as a COG.
+
+    The band is read, mapped and written one internal block at a time to a
+    compressed in-memory GeoTIFF, which is then copied to the COG, so memory
+    is bounded by the compressed size of the output rather than its pixels.
+    Overviews are resampled with nearest neighbour, as the values are
+    classes.
+
+    Args:
+        dataset (DatasetReader): Open uint8 source dataset.
+        outfile (str): Path of the COG.
+        lut (np.ndarray): Target value of each source value, from
+            :func:`class_lut`.
+        nodata (int): Target nodata value.
+    Returns:
+        Metadata: The metadata of the written COG, from the source grid.
+    """
+    if dataset.dtypes[0] != "uint8":
+        raise ValueError(f"Only uint8 sources can be reclassified, "
+                         f"{dataset.name} is {dataset.dtypes[0]}")
+    profile = {
+        "driver": "GTiff",
+        "width": dataset.width,
+        "height": dataset.height,
+        "count": 1,
+        "dtype": "uint8",
+        "crs": dataset.crs,
+        "transform": dataset.transform,
+        "nodata": nodata,
+        "tiled": True,
+        "blockxsize": COG_BLOCKSIZE,
+        "blockysize": COG_BLOCKSIZE,
+        "compress": COG_COMPRESS,
+    }
+    window = Window(0, 0, dataset.width, dataset.height)
+    with metrics.stage("reclassify"), MemoryFile() as memfile:
+        with memfile.open(**profile) as mem:
+            for block_window in block_windows(dataset, window):
+                mem.write(lut[dataset.read(1, window=block_window)],
+                          1,
+                          window=block_window)
+        with memfile.open() as mem, atomic_output(outfile) as partial:
+            rasterio.shutil.copy(mem,
+                                 partial,
+                                 driver="COG",
+                                 compress=COG_COMPRESS,
+                                 blocksize=COG_BLOCKSIZE,
+                                 resampling="NEAREST")
+    return Metadata.from_grid(outfile, dataset.crs, dataset.transform,
+                              dataset.shape)
+
+
+def output_name(infile: str, target_id: str) -> str:
+    """Returns the file name of the reclassified COG for ``infile``: its
+    name, with the part that identifies its collection replaced by that of
+    the target collection."""
+    base = os.path.basename(infile)
+    pattern, _ = _NAME_PATTERNS[infer_collection_id(infile)]
+    _, replacement = _NAME_PATTERNS[target_id]
+    name = re.sub(pattern, replacement, base, count=1, flags=re.IGNORECASE)
+    if infer_collection_id(name) != target_id:
+        raise ValueError(f"Cannot name the {target_id} COG for {infile}")
+    return name
+
+
+def iter_reclassified(infiles: Sequence[str],
+                      outdir: str,
+                      target_id: str,
+                      mapping: Optional[Dict[int, int]] = None,
+                      workers: int = 1) -> Iterator[Tuple[str, Metadata]]:
+    """Reclassifies COGs to a target collection, yielding each as it is
+    written.
+
+    The collection of the sources is inferred from their file names and
+    must be the same for all of them. Each source is written to
+    ``outdir`` under :func:`output_name`, with ``workers`` sources
+    reclassified concurrently and at most twice ``workers`` in flight.
+
+    Args:
+        infiles (Sequence[str]): HREFs of the source COGs.
+        outdir (str): Directory that will contain the reclassified COGs.
+        target_id (str): ID of the target collection.
+        mapping (Optional[Dict[int, int]]): Target value of each source
+            class value, see :func:`class_lut`. Derived from the class
+            descriptions if not provided.
+        workers (int): Number of COGs to write concurrently.
+    Returns:
+        Iterator[Tuple[str, Metadata]]: The path and metadata of each
+        written COG, in the order of ``infiles``.
+    """
+    if workers < 1:
+        raise ValueError(f"workers must be at least 1, got {workers}")
+    source_ids = {infer_collection_id(infile) for infile in infiles}
+    if len(source_ids) > 1:
+        raise ValueError(f"Sources are from several collections: "
+                         f"{', '.join(sorted(source_ids))}")
+    if not source_ids:
+        return
+    lut = class_lut(source_ids.pop(), target_id, mapping)
+    nodata = _nodata(target_id)
+    outfiles = [
+        os.path.join(outdir, output_name(infile, target_id))
+        for infile in infiles
+    ]
+
+    def write(paths: Tuple[str, str]) -> Tuple[str, Metadata]:
+        infile, outfile = paths
+        with rasterio.open(infile) as dataset:
+            return outfile, reclassify(dataset, outfile, lut, nodata)
+
+    yield from imap(write, list(zip(infiles, outfiles)), workers)
+
+
+def _classes(collection_id: str) -> Dict[int, str]:
+    asset = StacFragments(collection_id).get_asset_dict()
+    return {
+        c["value"]: c["description"]
+        for c in asset["classification:classes"]
+    }
+
+
+def _nodata(collection_id: str) -> int:
+    asset = StacFragments(collection_id).get_asset_dict()
+    return int(asset["raster:bands"][0]["nodata"])
@@ -1,19 +1,39 @@
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timezone
-from typing import Optional
+from typing import (Any, Deque, Dict, Iterable, Iterator, List, Optional,
+                    Sequence, Tuple, Union)
 
-from pystac import Collection, Item
+import numpy as np
+from pystac import Collection, Item, SpatialExtent, TemporalExtent
 from pystac.extensions.item_assets import AssetDefinition, ItemAssetsExtension
 from pystac.extensions.projection import ProjectionExtension
 from pystac.extensions.raster import RasterExtension
+from pystac.utils import str_to_datetime
+from shapely.geometry import shape
 from stactools.core.io import ReadHrefModifier
 
 from stactools.chesapeake_lulc import constants
+from stactools.chesapeake_lulc.cache import MetadataCache
+from stactools.chesapeake_lulc.constants import StatisticsMode
+from stactools.chesapeake_lulc.footprint import data_footprint
 from stactools.chesapeake_lulc.fragments import StacFragments
-from stactools.chesapeake_lulc.metadata import Metadata
+from stactools.chesapeake_lulc.instrumentation import metrics
+from stactools.chesapeake_lulc.metadata import Metadata, ReadStats
+from stactools.chesapeake_lulc.stac_io import use_fsspec
+from stactools.chesapeake_lulc.statistics import class_statistics
 
+use_fsspec()
 
+
+@metrics.timed("item.create")
 def create_item(href: str,
-                read_href_modifier: Optional[ReadHrefModifier] = None) -> Item:
+                read_href_modifier: Optional[ReadHrefModifier] = None,
+                read_stats: Optional[ReadStats] = None,
+                cache: Optional[MetadataCache] = None,
+                statistics: StatisticsMode = StatisticsMode.NONE,
+                footprint_tolerance: Optional[float] = None,
+                metadata: Optional[Metadata] = None) -> Item:
     """Create a collection-specific STAC Item for a COG tile of the Chesapeake
     Conservancy land cover or land use data.
 
@@ -21,14 +41,41 @@ def create_item(href: str,
         href (str): HREF to a COG containing classification data.
         read_href_modifier (Callable[[str], str]): An optional function to
             modify the href (e.g. to add a token to a url).
+        read_stats (Optional[ReadStats]): If provided, the HTTP requests and
+            bytes used to read the COG header are added to it.
+        cache (Optional[MetadataCache]): If provided, COG metadata is taken
+            from the cache when the file has not changed.
+        statistics (StatisticsMode): If not "none", the pixels of each class
+            are counted and written to the ``statistics`` and ``histogram``
+            of the asset's raster band. "approximate" counts the pixels of
+            an overview.
+        footprint_tolerance (Optional[float]): If provided, the geometry is
+            the footprint of the valid data, traced from the mask at an
+            overview and simplified with this tolerance in meters, instead
+            of the bounds of the COG.
+        metadata (Optional[Metadata]): If provided, COG metadata is taken
+            from it and the COG header is not read, e.g. for a COG whose
+            grid is known because it was just written.
     Returns:
         Item: STAC Item object representing the tile of classification data.
     """
-    metadata = Metadata(href, read_href_modifier)
+    if metadata is None and cache is not None:
+        metadata = cache.get_metadata(href, read_href_modifier, read_stats)
+    elif metadata is None:
+        metadata = Metadata(href, read_href_modifier, read_stats)
+
+    read_href = read_href_modifier(href) if read_href_modifier else href
+    geometry = metadata.geometry
+    bbox = metadata.bbox
+    if footprint_tolerance is not None:
+        footprint = data_footprint(read_href, footprint_tolerance)
+        if footprint is not None:
+            geometry = footprint
+            bbox = list(shape(footprint).bounds)
 
     item = Item(id=metadata.item_id,
-                geometry=metadata.geometry,
-                bbox=metadata.bbox,
+                geometry=geometry,
+                bbox=bbox,
                 datetime=None,
                 properties={
                     "start_datetime": constants.START_TIME,
@@ -44,11 +91,121 @@ def create_item(href: str,
 
     RasterExtension.add_to(item)
 
+    if statistics != StatisticsMode.NONE:
+        raster = RasterExtension.ext(asset)
+        bands = raster.bands or []
+        class_values = [
+            c["value"] for c in asset.extra_fields["classification:classes"]
+        ]
+        bands[0].statistics, bands[0].histogram = class_statistics(
+            read_href, class_values, statistics == StatisticsMode.APPROXIMATE)
+        raster.apply(bands)
+
     item.stac_extensions.append(constants.CLASSIFICATION_SCHEMA)
 
     return item
 
 
+def create_items(
+    hrefs: List[str],
+    read_href_modifier: Optional[ReadHrefModifier] = None,
+    workers: int = 1,
+    cache: Optional[MetadataCache] = None,
+    statistics: StatisticsMode = StatisticsMode.NONE,
+    footprint_tolerance: Optional[float] = None,
+) -> Tuple[List[Item], Dict[str, Exception]]:
+    """Create STAC Items for many COG tiles, optionally concurrently.
+
+    Items are created in a thread pool, since the work is dominated by
+    reading COG headers. A failure for one href does not stop the others.
+
+    Args:
+        hrefs (List[str]): HREFs to COGs containing classification data.
+        read_href_modifier (Callable[[str], str]): An optional function to
+            modify the hrefs (e.g. to add a token to a url).
+        workers (int): Number of items to create concurrently.
+        cache (Optional[MetadataCache]): If provided, COG metadata is taken
+            from the cache when the file has not changed.
+        statistics (StatisticsMode): Whether and how to compute class
+            statistics, see :func:`create_item`.
+        footprint_tolerance (Optional[float]): If provided, Item geometries
+            are valid data footprints, see :func:`create_item`.
+    Returns:
+        Tuple[List[Item], Dict[str, Exception]]: The created Items, in the
+        order of ``hrefs``, and the exception raised for each href that
+        failed.
+    """
+    items = []
+    errors = {}
+    for href, result in iter_items(hrefs, read_href_modifier, workers, cache,
+                                   statistics, footprint_tolerance):
+        if isinstance(result, Item):
+            items.append(result)
+        else:
+            errors[href] = result
+    return items, errors
+
+
+def iter_items(
+    hrefs: Iterable[str],
+    read_href_modifier: Optional[ReadHrefModifier] = None,
+    workers: int = 1,
+    cache: Optional[MetadataCache] = None,
+    statistics: StatisticsMode = StatisticsMode.NONE,
+    footprint_tolerance: Optional[float] = None,
+) -> Iterator[Tuple[str, Union[Item, Exception]]]:
+    """Lazily create STAC Items for many COG tiles, optionally concurrently.
+
+    Like :func:`create_items`, but yields each href with its Item, or the
+    exception raised for it, in the order of ``hrefs``. At most twice
+    ``workers`` Items are in flight, so memory does not grow with the number
+    of hrefs.
+
+    Args:
+        hrefs (Iterable[str]): HREFs to COGs containing classification data.
+        read_href_modifier (Callable[[str], str]): An optional function to
+            modify the hrefs (e.g. to add a token to a url).
+        workers (int): Number of items to create concurrently.
+        cache (Optional[MetadataCache]): If provided, COG metadata is taken
+            from the cache when the file has not changed.
+        statistics (StatisticsMode): Whether and how to compute class
+            statistics, see :func:`create_item`.
+        footprint_tolerance (Optional[float]): If provided, Item geometries
+            are valid data footprints, see :func:`create_item`.
+    Returns:
+        Iterator[Tuple[str, Union[Item, Exception]]]: Each href and its
+        Item or exception.
+    """
+    if workers < 1:
+        raise ValueError(f"workers must be at least 1, got {workers}")
+
+    def create(href: str) -> Union[Item, Exception]:
+        try:
+            return create_item(href,
+                               read_href_modifier,
+                               cache=cache,
+                               statistics=statistics,
+                               footprint_tolerance=footprint_tolerance)
+        except Exception as e:
+            return e
+
+    if workers == 1:
+        for href in hrefs:
+            yield href, create(href)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending: Deque[Tuple[str, Future]] = deque()
+        for href in hrefs:
+            pending.append((href, executor.submit(create, href)))
+            if len(pending) >= 2 * workers:
+                href, future = pending.popleft()
+                yield href, future.result()
+        while pending:
+            href, future = pending.popleft()
+            yield href, future.result()
+
+
 def create_collection(collection_id: str) -> Collection:
     """Creates a STAC Collection for Chesapeake Conservancy land cover or land
     use data.
@@ -59,7 +216,8 @@ def create_collection(collection_id: str) -> Collection:
     Returns:
         Collection: The created STAC Collection.
     """
-    fragment = StacFragments(collection_id).get_collection()
+    fragments = StacFragments(collection_id)
+    fragment = fragments.get_collection()
 
     collection = Collection(id=collection_id,
                             title=fragment["title"],
@@ -71,7 +229,7 @@ def create_collection(collection_id: str) -> Collection:
     collection.add_links(fragment["links"])
 
     item_assets = {}
-    asset_dict = StacFragments(collection_id).get_asset("").to_dict()
+    asset_dict = fragments.get_asset("").to_dict()
     asset_dict.pop("href")
     item_assets["data"] = AssetDefinition(asset_dict)
 
@@ -83,3 +241,43 @@ def create_collection(collection_id: str) -> Collection:
     collection.stac_extensions.append(constants.CLASSIFICATION_SCHEMA)
 
     return collection
+
+
+def item_datetimes(properties: Dict[str, Any]) -> List[datetime]:
+    """Returns the ``datetime``, ``start_datetime`` and ``end_datetime`` that
+    are set in the properties of an Item."""
+    return [
+        str_to_datetime(properties[key])
+        for key in ["datetime", "start_datetime", "end_datetime"]
+        if properties.get(key)
+    ]
+
+
+def set_extent(collection: Collection, bboxes: Sequence[Sequence[float]],
+               datetimes: Sequence[datetime]) -> None:
+    """Sets the spatial extent of a collection to the union of its Items'
+    bboxes and its temporal extent to span their datetimes.
+
+    Either extent is left as it is if there are no values for it, e.g. for
+    a collection without Items.
+    """
+    if bboxes:
+        array = np.array(bboxes, dtype=float)
+        collection.extent.spatial = SpatialExtent([[
+            float(array[:, 0].min()),
+            float(array[:, 1].min()),
+            float(array[:, 2].max()),
+            float(array[:, 3].max())
+        ]])
+    if datetimes:
+        collection.extent.temporal = TemporalExtent(
+            [[min(datetimes), max(datetimes)]])
+
+
+def set_extent_from_items(collection: Collection,
+                          items: Sequence[Item]) -> None:
+    """Sets the extent of a collection from its Items, see
+    :func:`set_extent`."""
+    set_extent(
+        collection, [item.bbox for item in items if item.bbox is not None],
+        [value for item in items for value in item_datetimes(item.properties)])
@@ -0,0 +1,22 @@
+import threading
+
+_lock = threading.Lock()
+_enabled = False
+
+
+def use_fsspec() -> None:
+    """Sets the default pystac StacIO to the fsspec StacIO of stactools, so
+    that STAC JSON can be read from and written to any fsspec file system,
+    e.g. ``s3://`` or ``gs://``.
+
+    Functions that read or write STAC JSON call this first, rather than
+    relying on a module that happens to have been imported. Only the first
+    call sets the default, so a StacIO set later with
+    ``StacIO.set_default`` is kept.
+    """
+    global _enabled
+    with _lock:
+        if not _enabled:
+            import stactools.core
+            stactools.core.use_fsspec()
+            _enabled = True
@@ -0,0 +1,103 @@
+from typing import List, Optional, Tuple
+
+import numpy as np
+import rasterio
+from pystac.extensions.raster import Histogram, Statistics
+from rasterio.io import DatasetReader
+from rasterio.windows import Window
+
+from stactools.chesapeake_lulc.constants import (HEADER_READ_OPTIONS,
+                                                 STATISTICS_OVERVIEW_FACTOR)
+from stactools.chesapeake_lulc.instrumentation import metrics
+from stactools.chesapeake_lulc.utils import block_windows
+
+
+def count_classes(dataset: DatasetReader) -> np.ndarray:
+    """Counts the valid pixels of each value in band 1.
+
+    The band is read one internal block at a time and counted with
+    ``np.bincount``, so memory is bounded by a single block.
+
+    Args:
+        dataset (DatasetReader): Open dataset with an unsigned integer band.
+    Returns:
+        np.ndarray: The number of valid pixels with each value, indexed by
+        value.
+    """
+    counts = np.zeros(0, dtype=np.int64)
+    window = Window(0, 0, dataset.width, dataset.height)
+    for block_window in block_windows(dataset, window):
+        data = dataset.read(1, window=block_window)
+        if dataset.nodata is None:
+            data = data[dataset.read_masks(1, window=block_window) != 0]
+        block_counts = np.bincount(data.ravel())
+        if len(block_counts) > len(counts):
+            counts = np.pad(counts, (0, len(block_counts) - len(counts)))
+        counts[:len(block_counts)] += block_counts
+    if dataset.nodata is not None and 0 <= dataset.nodata < len(counts):
+        counts[int(dataset.nodata)] = 0
+    return counts
+
+
+@metrics.timed("statistics")
+def class_statistics(
+        href: str,
+        class_values: List[int],
+        approximate: bool = False) -> Tuple[Statistics, Histogram]:
+    """Computes the class statistics and histogram of a classification COG.
+
+    The histogram has one bucket per value from the lowest to the highest
+    class value, following the GDAL convention of buckets centered on
+    integers. The statistics hold the lowest and highest classes present
+    and the percentage of valid pixels.
+
+    Args:
+        href (str): HREF of the COG.
+        class_values (List[int]): Values of the classes of the product.
+        approximate (bool): Count the pixels of an overview, no more than
+            ``constants.STATISTICS_OVERVIEW_FACTOR`` times coarser, and scale
+            the counts to the full resolution.
+    Returns:
+        Tuple[Statistics, Histogram]: The band statistics and histogram.
+    """
+    with rasterio.Env(**HEADER_READ_OPTIONS):
+        with rasterio.open(href) as dataset:
+            pixels = dataset.width * dataset.height
+            level = _overview_level(dataset) if approximate else None
+            if level is None:
+                counts = count_classes(dataset)
+                counted_pixels = pixels
+        if level is not None:
+            with rasterio.open(href, overview_level=level) as overview:
+                counts = count_classes(overview)
+                counted_pixels = overview.width * overview.height
+
+    low, high = min(class_values), max(class_values)
+    buckets = np.zeros(high - low + 1, dtype=np.int64)
+    in_range = counts[low:high + 1]
+    buckets[:len(in_range)] = in_range
+    scale = pixels / counted_pixels
+    present = np.nonzero(counts)[0]
+
+    statistics = Statistics.create(valid_percent=100 * float(counts.sum()) /
+                                   counted_pixels)
+    if len(present):
+        statistics.minimum = int(present.min())
+        statistics.maximum = int(present.max())
+    histogram = Histogram.create(
+        count=len(buckets),
+        min=low - 0.5,
+        max=high + 0.5,
+        buckets=[int(round(count * scale)) for count in buckets])
+    return statistics, histogram
+
+
+def _overview_level(dataset: DatasetReader) -> Optional[int]:
+    """Returns the index of the coarsest overview whose factor does not
+    exceed ``STATISTICS_OVERVIEW_FACTOR``, or None to use the full
+    resolution."""
+    levels = [
+        level for level, factor in enumerate(dataset.overviews(1))
+        if factor <= STATISTICS_OVERVIEW_FACTOR
+    ]
+    return max(levels, default=None)
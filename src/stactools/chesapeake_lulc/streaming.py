@@ -0,0 +1,307 @@
+import json
+import os
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from pystac import (CatalogType, Collection, Item, Link, MediaType, RelType,
+                    StacIO)
+from stactools.core.io import ReadHrefModifier
+
+from stactools.chesapeake_lulc import stac
+from stactools.chesapeake_lulc.cache import MetadataCache
+from stactools.chesapeake_lulc.constants import StatisticsMode, ValidationMode
+from stactools.chesapeake_lulc.instrumentation import metrics
+from stactools.chesapeake_lulc.reclassify import iter_reclassified
+from stactools.chesapeake_lulc.stac_io import use_fsspec
+from stactools.chesapeake_lulc.utils import iter_tiles
+from stactools.chesapeake_lulc.validation import get_validator, in_sample
+
+
+class StreamingCollectionWriter:
+    """Writes a self-contained collection one Item at a time.
+
+    Each Item is written as soon as it is added and then released; only the
+    Item links are kept. ``collection.json`` is written by :meth:`close`, so
+    the layout matches ``Collection.save()`` but peak memory does not grow
+    with the number of Items, and Items written before a crash are kept.
+
+    The collection extent is kept as the union of the Item bboxes and the
+    span of the Item datetimes as Items are added. Without Items, it is the
+    extent of the collection fragment.
+    """
+
+    def __init__(self, collection_id: str, outdir: str) -> None:
+        use_fsspec()
+        self.outdir = outdir
+        self.count = 0
+        self._bbox: Optional[List[float]] = None
+        self._datetimes: List[datetime] = []
+        self.collection = stac.create_collection(collection_id)
+        self.collection.set_self_href(os.path.join(outdir, "collection.json"))
+        self.collection.catalog_type = CatalogType.SELF_CONTAINED
+
+    def __enter__(self) -> "StreamingCollectionWriter":
+        return self
+
+    def __exit__(self, exc_type, *args) -> None:
+        # After a failure, leave collection.json unwritten rather than
+        # write a collection that looks complete.
+        if exc_type is None:
+            self.close()
+
+    def add_item(self, item: Item, validate: bool = False) -> None:
+        """Writes an Item and links it from the collection.
+
+        Args:
+            item (Item): The Item to write.
+            validate (bool): Validate the Item before writing it.
+        """
+        item_href = os.path.join(self.outdir, item.id, f"{item.id}.json")
+        item.set_self_href(item_href)
+        # Link the Item to the collection by href, as Collection.save()
+        # would, without attaching it: set_root would cache the Item in the
+        # collection and keep every written Item alive.
+        for rel in [RelType.ROOT, RelType.COLLECTION, RelType.PARENT]:
+            item.remove_links(rel)
+            item.add_link(
+                Link(rel,
+                     "../collection.json",
+                     media_type=MediaType.JSON,
+                     title=self.collection.title))
+        item.collection_id = self.collection.id
+        item.make_asset_hrefs_relative()
+        self._add_to_extent(item)
+        # Serialized without transforming hrefs, which would resolve the
+        # root link to collection.json before it is written.
+        item_dict = item.to_dict(include_self_link=False,
+                                 transform_hrefs=False)
+        if validate:
+            get_validator().validate_dict(json.loads(json.dumps(item_dict)),
+                                          item_href)
+        with metrics.stage("write.item"):
+            StacIO.default().save_json(item_href, item_dict)
+        self.collection.add_link(
+            Link(RelType.ITEM,
+                 f"./{item.id}/{item.id}.json",
+                 media_type=MediaType.GEOJSON))
+        self.count += 1
+
+    def close(self) -> None:
+        """Writes ``collection.json``."""
+        with metrics.stage("write.collection"):
+            self.collection.save_object(include_self_link=False)
+
+    def _add_to_extent(self, item: Item) -> None:
+        """Keeps the union of the Item bboxes and the earliest and latest
+        Item datetimes, so the extent takes constant memory."""
+        if item.bbox is not None:
+            bboxes = [item.bbox
+                      ] if self._bbox is None else [self._bbox, item.bbox]
+            self._bbox = [
+                min(bbox[0] for bbox in bboxes),
+                min(bbox[1] for bbox in bboxes),
+                max(bbox[2] for bbox in bboxes),
+                max(bbox[3] for bbox in bboxes)
+            ]
+        datetimes = self._datetimes + stac.item_datetimes(item.properties)
+        if datetimes:
+            self._datetimes = [min(datetimes), max(datetimes)]
+        stac.set_extent(self.collection,
+                        [] if self._bbox is None else [self._bbox],
+                        self._datetimes)
+
+
+def write_collection(
+        collection_id: str,
+        hrefs: Iterable[str],
+        outdir: str,
+        read_href_modifier: Optional[ReadHrefModifier] = None,
+        workers: int = 1,
+        cache: Optional[MetadataCache] = None,
+        validate: ValidationMode = ValidationMode.NONE,
+        statistics: StatisticsMode = StatisticsMode.NONE,
+        footprint_tolerance: Optional[float] = None) -> Dict[str, Exception]:
+    """Creates and writes a collection, streaming each Item to disk as soon
+    as it is created.
+
+    Args:
+        collection_id (str): ID of the STAC Collection.
+        hrefs (Iterable[str]): HREFs to COGs containing classification data.
+            May be a lazy iterable, e.g. an open file.
+        outdir (str): Directory that will contain the collection.
+        read_href_modifier (Callable[[str], str]): An optional function to
+            modify the hrefs (e.g. to add a token to a url).
+        workers (int): Number of items to create concurrently.
+        cache (Optional[MetadataCache]): Optional cache of COG metadata.
+        validate (ValidationMode): Validate all Items, a sample of them, or
+            none. The collection is validated unless this is "none".
+        statistics (StatisticsMode): Whether and how to compute class
+            statistics, see :func:`stac.create_item`.
+        footprint_tolerance (Optional[float]): If provided, Item geometries
+            are valid data footprints, see :func:`stac.create_item`.
+    Returns:
+        Dict[str, Exception]: The exception raised for each href that failed.
+    """
+    errors = {}
+    with StreamingCollectionWriter(collection_id, outdir) as writer:
+        for href, result in stac.iter_items(hrefs, read_href_modifier, workers,
+                                            cache, statistics,
+                                            footprint_tolerance):
+            if isinstance(result, Item):
+                writer.add_item(result, in_sample(writer.count, validate))
+            else:
+                errors[href] = result
+        if validate != ValidationMode.NONE:
+            get_validator().validate(writer.collection)
+    return errors
+
+
+def tile_collection(infile: Union[str, Sequence[str]],
+                    tile_dir: str,
+                    outdir: str,
+                    collection_id: str,
+                    size: int,
+                    left_bottom: Tuple[(int, int)],
+                    nodata: Optional[int] = None,
+                    workers: int = 1,
+                    validate: ValidationMode = ValidationMode.NONE,
+                    bbox: Optional[Tuple[float, float, float, float]] = None,
+                    shard: Optional[Tuple[int, int]] = None) -> List[str]:
+    """Tiles the given input and writes a collection of the tiles in a single
+    pass.
+
+    Grid cells that contain only nodata are skipped. Each tile's Item is
+    created from the grid the tile was written with, so no tile is opened
+    again, and is written as soon as its tile is, with ``collection.json``
+    written last.
+
+    Args:
+        infile (Union[str, Sequence[str]]): HREF to source GeoTIFF to be
+            tiled, or HREFs to several source GeoTIFFs, see
+            :func:`utils.tile`.
+        tile_dir (str): Directory that will contain the tiles.
+        outdir (str): Directory that will contain the collection.
+        collection_id (str): ID of the STAC Collection.
+        size (int): Tile size in meters.
+        left_bottom (Tuple[int, int]): X, Y coordinates of tile grid origin.
+        nodata (Optional[int]): nodata value to use for tiled COGs.
+        workers (int): Number of tiles to write concurrently.
+        validate (ValidationMode): Validate all Items, a sample of them, or
+            none. The collection is validated unless this is "none".
+        bbox (Optional[Tuple[float, float, float, float]]): If provided,
+            only tiles that intersect this left, bottom, right, top box, in
+            the source CRS, are written.
+        shard (Optional[Tuple[int, int]]): If provided, the index and count
+            of the shard of grid cells to write, see :func:`utils.tile`. The
+            collections of all shards can be combined with
+            :func:`merge_collections`.
+    Returns:
+        List[str]: Paths of the written tiles, in grid order.
+    """
+    outfiles = []
+    with StreamingCollectionWriter(collection_id, outdir) as writer:
+        for outfile, metadata in iter_tiles(infile, tile_dir, size,
+                                            left_bottom, nodata, workers, bbox,
+                                            shard):
+            item = stac.create_item(outfile, metadata=metadata)
+            writer.add_item(item, in_sample(writer.count, validate))
+            outfiles.append(outfile)
+        if validate != ValidationMode.NONE:
+            get_validator().validate(writer.collection)
+    return outfiles
+
+
+def reclassify_collection(
+        infiles: Sequence[str],
+        tile_dir: str,
+        outdir: str,
+        collection_id: str,
+        mapping: Optional[Dict[int, int]] = None,
+        workers: int = 1,
+        validate: ValidationMode = ValidationMode.NONE) -> List[str]:
+    """Reclassifies COGs to another collection and writes a collection of
+    the results in a single pass.
+
+    Each reclassified COG's Item is created from the grid of its source and
+    written as soon as the COG is, with ``collection.json`` written last.
+
+    Args:
+        infiles (Sequence[str]): HREFs of the source COGs, all from the same
+            collection.
+        tile_dir (str): Directory that will contain the reclassified COGs.
+        outdir (str): Directory that will contain the collection.
+        collection_id (str): ID of the target STAC Collection.
+        mapping (Optional[Dict[int, int]]): Target value of each source
+            class value, see :func:`reclassify.class_lut`. Derived from the
+            class descriptions if not provided.
+        workers (int): Number of COGs to write concurrently.
+        validate (ValidationMode): Validate all Items, a sample of them, or
+            none. The collection is validated unless this is "none".
+    Returns:
+        List[str]: Paths of the reclassified COGs, in the order of
+        ``infiles``.
+    """
+    outfiles = []
+    with StreamingCollectionWriter(collection_id, outdir) as writer:
+        for outfile, metadata in iter_reclassified(infiles, tile_dir,
+                                                   collection_id, mapping,
+                                                   workers):
+            item = stac.create_item(outfile, metadata=metadata)
+            writer.add_item(item, in_sample(writer.count, validate))
+            outfiles.append(outfile)
+        if validate != ValidationMode.NONE:
+            get_validator().validate(writer.collection)
+    return outfiles
+
+
+def merge_collections(
+        collection_paths: Sequence[str],
+        outdir: str,
+        validate: ValidationMode = ValidationMode.NONE) -> List[str]:
+    """Merges saved collections, e.g. those written by the shards of a
+    sharded run, into a single self-contained collection.
+
+    Each Item is read from its JSON file and written under ``outdir`` as
+    soon as it is read, with its asset hrefs relative to its new location,
+    so no COG is opened. The extent of the merged collection is computed
+    from the Items, see :class:`StreamingCollectionWriter`.
+
+    Args:
+        collection_paths (Sequence[str]): Paths to the saved
+            ``collection.json`` of each collection, all with the same id.
+        outdir (str): Directory that will contain the merged collection.
+        validate (ValidationMode): Validate all Items, a sample of them, or
+            none. The collection is validated unless this is "none".
+    Returns:
+        List[str]: IDs of the merged Items, in the order of the collections
+        and of their Item links.
+    Raises:
+        ValueError: If the collections have different ids or an Item is in
+            more than one of them.
+    """
+    use_fsspec()
+    collections = [Collection.from_file(path) for path in collection_paths]
+    collection_ids = {collection.id for collection in collections}
+    if len(collection_ids) != 1:
+        raise ValueError(f"Expected collections with one id, got "
+                         f"{', '.join(sorted(collection_ids)) or 'none'}")
+
+    item_ids: List[str] = []
+    seen = set()
+    with StreamingCollectionWriter(collection_ids.pop(), outdir) as writer:
+        for collection in collections:
+            for link in collection.get_item_links():
+                item_href = link.get_absolute_href()
+                if item_href is None:
+                    raise ValueError(f"Item link has no absolute href: {link}")
+                item = Item.from_file(item_href)
+                if item.id in seen:
+                    raise ValueError(
+                        f"Item {item.id} is in more than one collection")
+                seen.add(item.id)
+                item.make_asset_hrefs_absolute()
+                writer.add_item(item, in_sample(writer.count, validate))
+                item_ids.append(item.id)
+        if validate != ValidationMode.NONE:
+            get_validator().validate(writer.collection)
+    return item_ids
@@ -0,0 +1,166 @@
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, cast
+
+import fsspec
+from pystac import Collection, Item, Link, StacIO
+
+from stactools.chesapeake_lulc import stac
+from stactools.chesapeake_lulc.cache import MetadataCache, modified_time
+from stactools.chesapeake_lulc.constants import StatisticsMode, ValidationMode
+from stactools.chesapeake_lulc.instrumentation import metrics
+from stactools.chesapeake_lulc.stac_io import use_fsspec
+from stactools.chesapeake_lulc.validation import validate_items
+
+
+class CollectionUpdate:
+    """Summary of the Items changed by :func:`update_collection`."""
+
+    def __init__(self) -> None:
+        self.added: List[str] = []
+        self.updated: List[str] = []
+        self.removed: List[str] = []
+        self.unchanged: List[str] = []
+        self.errors: Dict[str, Exception] = {}
+
+
+def update_collection(
+        collection_path: str,
+        hrefs: List[str],
+        workers: int = 1,
+        cache: Optional[MetadataCache] = None,
+        validate: ValidationMode = ValidationMode.ALL,
+        statistics: StatisticsMode = StatisticsMode.NONE,
+        footprint_tolerance: Optional[float] = None) -> CollectionUpdate:
+    """Updates a saved, self-contained collection in place to match a list
+    of COG hrefs.
+
+    Items are matched to hrefs by id, which is the COG file name. An Item is
+    created for each new href and for each href whose COG was modified after
+    the Item file was written. Items whose href is no longer listed are
+    deleted. Only the created Items and ``collection.json`` are written;
+    unchanged Item files are not rewritten. If two hrefs have the same id,
+    the first is used. The collection may be on any file system fsspec
+    supports.
+
+    The collection extent is recomputed from the bboxes and datetimes of
+    the Items it holds after the update, which for unchanged Items are read
+    from their JSON, so no unchanged COG is opened.
+
+    Args:
+        collection_path (str): Path to the saved ``collection.json``.
+        hrefs (List[str]): HREFs to the COGs the collection should contain.
+        workers (int): Number of items to create concurrently.
+        cache (Optional[MetadataCache]): Optional cache of COG metadata.
+        validate (ValidationMode): Validate all created Items, a sample of
+            them, or none.
+        statistics (StatisticsMode): Whether and how to compute class
+            statistics, see :func:`stac.create_item`.
+        footprint_tolerance (Optional[float]): If provided, Item geometries
+            are valid data footprints, see :func:`stac.create_item`.
+    Returns:
+        CollectionUpdate: The ids of the added, updated, removed and
+        unchanged Items, and the errors for hrefs that failed.
+    """
+    use_fsspec()
+    collection = Collection.from_file(collection_path)
+    item_links: Dict[str, Link] = {}
+    for link in collection.get_item_links():
+        item_id = os.path.splitext(os.path.basename(_path(link)))[0]
+        item_links[item_id] = link
+
+    update = CollectionUpdate()
+    hrefs_to_create = []
+    ids = set()
+    for href in hrefs:
+        item_id = os.path.splitext(os.path.basename(href))[0]
+        if item_id in ids:
+            continue
+        ids.add(item_id)
+        if item_id not in item_links:
+            hrefs_to_create.append(href)
+        elif _is_newer(href, _path(item_links[item_id])):
+            hrefs_to_create.append(href)
+        else:
+            update.unchanged.append(item_id)
+
+    for item_id, link in item_links.items():
+        if item_id not in ids:
+            collection.links.remove(link)
+            _delete_item_file(_path(link))
+            update.removed.append(item_id)
+
+    # An existing Item is only replaced once its new version was created.
+    items, update.errors = stac.create_items(
+        hrefs_to_create,
+        workers=workers,
+        cache=cache,
+        statistics=statistics,
+        footprint_tolerance=footprint_tolerance)
+    for item in items:
+        if item.id in item_links:
+            collection.links.remove(item_links[item.id])
+            update.updated.append(item.id)
+        else:
+            update.added.append(item.id)
+        collection.add_item(item)
+        item.make_asset_hrefs_relative()
+    validate_items(items, validate, workers)
+    _update_extent(collection)
+
+    # Only resolved Item links, i.e. the Items created here, are saved.
+    with metrics.stage("write.collection"):
+        collection.save()
+    return update
+
+
+def _update_extent(collection: Collection) -> None:
+    bboxes: List[List[float]] = []
+    datetimes: List[datetime] = []
+    stac_io = StacIO.default()
+    for link in collection.get_item_links():
+        if link.is_resolved():
+            item = cast(Item, link.target)
+            bbox, properties = item.bbox, item.properties
+        else:
+            item_dict = stac_io.read_json(_path(link))
+            bbox, properties = item_dict.get("bbox"), item_dict["properties"]
+        if bbox is not None:
+            bboxes.append(bbox)
+        datetimes.extend(stac.item_datetimes(properties))
+    stac.set_extent(collection, bboxes, datetimes)
+
+
+def _path(link: Link) -> str:
+    href = link.get_absolute_href()
+    if href is None:
+        raise ValueError(f"Item link has no absolute href: {link}")
+    return href
+
+
+def _is_newer(href: str, item_path: str) -> bool:
+    """Returns True if the COG was modified after its Item was written, or
+    the Item file is missing. A COG without a modification time is treated
+    as unchanged, and one that cannot be found is recreated so that the
+    failure is reported."""
+    fs, path = fsspec.core.url_to_fs(item_path)
+    if not fs.exists(path):
+        return True
+    try:
+        source_time = modified_time(href)
+    except OSError:
+        return True
+    if source_time is None:
+        return False
+    item_time = modified_time(item_path)
+    return item_time is None or source_time > item_time
+
+
+def _delete_item_file(item_path: str) -> None:
+    fs, path = fsspec.core.url_to_fs(item_path)
+    if fs.exists(path):
+        fs.rm(path)
+        # Object stores have no empty directories to remove.
+        item_dir = os.path.dirname(path)
+        if fs.isdir(item_dir) and not fs.ls(item_dir):
+            fs.rmdir(item_dir)
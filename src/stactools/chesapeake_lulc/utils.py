@@ -1,12 +1,39 @@
+import csv
+import json
+import math
 import os
 import shutil
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
 from glob import glob
-from typing import List, Optional, Tuple
+from itertools import islice
+from typing import (Any, Callable, Deque, Dict, Iterable, Iterator, List,
+                    Optional, Sequence, TextIO, Tuple, TypeVar, Union)
 
 import numpy as np
 import rasterio
+import rasterio.shutil
+from affine import Affine
+from rasterio.errors import WindowError
+from rasterio.io import DatasetReader, MemoryFile
+from rasterio.windows import Window, from_bounds
 from stactools.core.utils.subprocess import call
 
+from stactools.chesapeake_lulc.constants import (COG_BLOCKSIZE, COG_COMPRESS,
+                                                 GRID_ALIGNMENT_TOLERANCE,
+                                                 TILE_JOURNAL,
+                                                 TILE_SHARD_JOURNAL,
+                                                 TileEngine)
+from stactools.chesapeake_lulc.grid import SourceIndex, TileIndex, check_shard
+from stactools.chesapeake_lulc.instrumentation import metrics
+from stactools.chesapeake_lulc.metadata import Metadata
+
+T = TypeVar("T")
+R = TypeVar("R")
+
 
 class Tile:
 
@@ -22,14 +49,17 @@ class Tile:
         self._top = top
         self._nodata = nodata
 
-    def subset(self, infile, outdir) -> None:
+    def outfile(self, infile: str, outdir: str) -> str:
         base = os.path.splitext(os.path.basename(infile))[0]
-        outfile = os.path.join(
+        return os.path.join(
             outdir,
             (f"{base}_E{str(int(self._left))}_N{str(int(self._bottom))}.tif"))
+
+    def subset(self, infile: str, outdir: str) -> str:
+        outfile = self.outfile(infile, outdir)
         args = [
-            "gdal_translate", "-of", "COG", "-co", "compress=deflate", "-co",
-            "blocksize=512", "-projwin",
+            "gdal_translate", "-of", "COG", "-co", f"compress={COG_COMPRESS}",
+            "-co", f"blocksize={COG_BLOCKSIZE}", "-projwin",
             str(self._left),
             str(self._top),
             str(self._right),
@@ -38,22 +68,775 @@ class Tile:
         if self._nodata is not None:
             args.extend(["-a_nodata", str(self._nodata)])
         args.append(infile)
-        args.append(outfile)
-        call(args)
+        with metrics.stage("tile.write"), atomic_output(outfile) as partial:
+            args.append(partial)
+            return_code = call(args)
+            if return_code != 0:
+                raise RuntimeError(
+                    f"gdal_translate failed with exit code {return_code} "
+                    f"while writing {outfile}")
+        return outfile
+
+    def window(self, transform: Affine) -> Window:
+        """Returns this tile's window, snapped to the pixel grid."""
+        return from_bounds(self._left, self._bottom, self._right, self._top,
+                           transform).round_offsets().round_lengths()
+
+    def has_data(self, dataset: DatasetReader, factor: int = 1) -> bool:
+        """Returns True if any pixel of this tile is valid data.
+
+        The dataset is read decimated by ``factor``, from an overview when
+        one exists at that level, and otherwise block by block at full
+        resolution, see :func:`has_valid_data`.
+        """
+        try:
+            window = self.window(dataset.transform).intersection(
+                Window(0, 0, dataset.width, dataset.height))
+        except WindowError:
+            return False
+        with metrics.stage("tile.scan"):
+            return has_valid_data(dataset, window, self._nodata, factor)
+
+    def subset_dataset(self, dataset: DatasetReader, infile: str,
+                       outdir: str) -> str:
+        """Writes this tile as a COG from an already open dataset.
+
+        The tile's window is snapped to the source pixel grid, the same as
+        ``gdal_translate -projwin``. Pixels outside the source are filled
+        with nodata.
+        """
+        return self.subset_datasets([dataset], infile, outdir)
+
+    def subset_datasets(self, datasets: List[DatasetReader], infile: str,
+                        outdir: str) -> str:
+        """Writes this tile as a COG mosaicked from already open datasets.
+
+        The tile's window is snapped to the pixel grid of the first dataset,
+        as in :meth:`subset_dataset`, and the same window is read from each
+        of the others. Each later dataset overwrites the pixels that its own
+        band 1 mask marks valid, as in a VRT.
+        """
+        dataset = datasets[0]
+        outfile = self.outfile(infile, outdir)
+        nodata = self._nodata if self._nodata is not None else dataset.nodata
+        window = self.window(dataset.transform)
+        with metrics.stage("tile.read"):
+            data = _read_filled(dataset, window, nodata)
+            for other in datasets[1:]:
+                other_window = self.window(other.transform)
+                other_window = Window(other_window.col_off,
+                                      other_window.row_off, window.width,
+                                      window.height)
+                other_data = _read_filled(other, other_window, nodata)
+                valid = _read_valid(other, other_window)
+                data[:, valid] = other_data[:, valid]
+
+        profile = {
+            "driver": "GTiff",
+            "width": window.width,
+            "height": window.height,
+            "count": dataset.count,
+            "dtype": dataset.dtypes[0],
+            "crs": dataset.crs,
+            "transform": dataset.window_transform(window),
+            "nodata": nodata,
+        }
+        with metrics.stage("tile.write"), MemoryFile() as memfile:
+            with memfile.open(**profile) as mem:
+                mem.write(data)
+                colormap = _colormap(dataset)
+                if colormap:
+                    mem.write_colormap(1, colormap)
+                with atomic_output(outfile) as partial:
+                    rasterio.shutil.copy(mem,
+                                         partial,
+                                         driver="COG",
+                                         compress=COG_COMPRESS,
+                                         blocksize=COG_BLOCKSIZE)
+        return outfile
+
+    def metadata(self, dataset: DatasetReader, outfile: str) -> Metadata:
+        """Returns the metadata of the COG that :meth:`subset_dataset` writes
+        for this tile, from the grid of the (first) source dataset rather
+        than the written file."""
+        window = self.window(dataset.transform)
+        return Metadata.from_grid(outfile, dataset.crs,
+                                  dataset.window_transform(window),
+                                  (window.height, window.width))
+
+
+@contextmanager
+def atomic_output(outfile: str) -> Iterator[str]:
+    """Yields a temporary path next to ``outfile`` that is renamed to
+    ``outfile`` when the block succeeds and removed when it fails, so that
+    ``outfile`` never holds a partially written file.
+
+    Args:
+        outfile (str): Path of the file to write.
+    Returns:
+        Iterator[str]: The temporary path to write to, a hidden
+        ``.<name>.partial`` file in the directory of ``outfile``.
+    """
+    directory, name = os.path.split(outfile)
+    partial = os.path.join(directory, f".{name}.partial")
+    try:
+        yield partial
+        os.replace(partial, outfile)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+
+
+class TileJournal:
+    """Records the tiles completed by a :func:`tile` run, one JSON line per
+    tile, so that an interrupted run can be resumed.
+
+    The first line holds the tiling parameters. Each following line holds
+    the name and size of a tile that was renamed into place. Lines are
+    flushed to disk as they are written, and a truncated last line, as left
+    by a crash, is dropped on resume.
+    """
+
+    def __init__(self, path: str, parameters: Dict[str, Any],
+                 resume: bool) -> None:
+        self.path = path
+        self.parameters = parameters
+        self._completed: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._file: Optional[TextIO] = None
+        if resume and os.path.exists(path):
+            self._load()
+        elif os.path.exists(path):
+            os.remove(path)
+
+    def _load(self) -> None:
+        with open(self.path) as file:
+            lines = file.read().splitlines()
+        records = []
+        for line in lines:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                break
+        if not records:
+            return
+        if records[0] != self.parameters:
+            raise ValueError(
+                f"Cannot resume: {self.path} was written with parameters "
+                f"{records[0]}, not {self.parameters}")
+        for record in records[1:]:
+            self._completed[record["name"]] = record["size"]
+        # Rewrite the journal without any truncated line before appending.
+        self._file = open(self.path, "w")
+        for record in records:
+            self._write(record)
+
+    def is_complete(self, outfile: str) -> bool:
+        """Returns True if ``outfile`` was recorded as complete and is still
+        present with the recorded size."""
+        size = self._completed.get(os.path.basename(outfile))
+        return size is not None and os.path.exists(
+            outfile) and os.path.getsize(outfile) == size
+
+    def record(self, outfile: str) -> None:
+        """Records ``outfile`` as complete."""
+        name = os.path.basename(outfile)
+        size = os.path.getsize(outfile)
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "w")
+                self._write(self.parameters)
+            self._write({"name": name, "size": size})
+            self._completed[name] = size
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        assert self._file is not None
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def _has_pixels(window: Window) -> bool:
+    """Tiles narrower than half a pixel, e.g. slivers caused by floating point
+    dataset bounds, have no pixels to write."""
+    return window.width > 0 and window.height > 0
+
+
+def has_valid_data(dataset: DatasetReader,
+                   window: Optional[Window] = None,
+                   nodata: Optional[int] = None,
+                   factor: int = 1) -> bool:
+    """Returns True if any pixel in the window of band 1 is valid data.
+
+    If ``factor`` is greater than one the window is first read decimated by
+    that factor. When that finds nothing, the dataset has an overview at
+    that factor and ``nodata`` is the dataset's own, the overview is read
+    again with a margin of one overview pixel around the window. If the
+    margin is empty too, no valid data is returned without reading the
+    full resolution, so an isolated patch of valid data smaller than an
+    overview pixel can be missed. Overview pixels sample the data, so
+    valid pixels in the margin make the result ambiguous. In that case, or
+    without such an overview, the window is read one internal block at a
+    time, stopping at the first valid pixel, so memory is bounded by a
+    single block.
+
+    Args:
+        dataset (DatasetReader): Open dataset.
+        window (Optional[Window]): Window to check, defaults to the whole
+            dataset.
+        nodata (Optional[int]): nodata value, defaults to the dataset's
+            nodata value.
+        factor (int): Decimation factor of the initial coarse read.
+    Returns:
+        bool: True if a valid pixel was found.
+    """
+    if window is None:
+        window = Window(0, 0, dataset.width, dataset.height)
+    if factor > 1:
+        out_shape = (max(1, math.ceil(window.height / factor)),
+                     max(1, math.ceil(window.width / factor)))
+        if _any_valid(dataset, window, nodata, out_shape):
+            return True
+        if factor in dataset.overviews(1) and (
+                nodata is None
+                or nodata == dataset.nodata) and not _any_valid_around(
+                    dataset, window, factor):
+            return False
+    return any(
+        _any_valid(dataset, block_window, nodata)
+        for block_window in block_windows(dataset, window))
+
+
+def _any_valid(dataset: DatasetReader,
+               window: Window,
+               nodata: Optional[int] = None,
+               out_shape: Optional[Tuple[int, int]] = None) -> bool:
+    if nodata is None or nodata == dataset.nodata:
+        mask = dataset.read_masks(1, window=window, out_shape=out_shape)
+        return bool(mask.any())
+    else:
+        data = dataset.read(1, window=window, out_shape=out_shape)
+        return bool((data != nodata).any())
+
 
+def _any_valid_around(dataset: DatasetReader, window: Window,
+                      factor: int) -> bool:
+    """Returns True if the overview at ``factor`` has a valid pixel in the
+    window or within one overview pixel of it.
 
-def tile(infile: str,
+    The window is snapped outwards to the overview's pixels and grown by one
+    on each side, so that each overview pixel is read once, unresampled.
+    """
+    col_start = max((window.col_off // factor - 1) * factor, 0)
+    row_start = max((window.row_off // factor - 1) * factor, 0)
+    col_stop = min((math.ceil(
+        (window.col_off + window.width) / factor) + 1) * factor, dataset.width)
+    row_stop = min((math.ceil(
+        (window.row_off + window.height) / factor) + 1) * factor,
+                   dataset.height)
+    out_shape = (max(1, math.ceil((row_stop - row_start) / factor)),
+                 max(1, math.ceil((col_stop - col_start) / factor)))
+    return _any_valid(dataset,
+                      Window(col_start, row_start, col_stop - col_start,
+                             row_stop - row_start),
+                      out_shape=out_shape)
+
+
+def block_windows(dataset: DatasetReader, window: Window) -> Iterator[Window]:
+    """Yields the parts of the dataset's internal blocks that fall in
+    ``window``, in row-major order."""
+    block_height, block_width = dataset.block_shapes[0]
+    row_stop = window.row_off + window.height
+    col_stop = window.col_off + window.width
+    row = (window.row_off // block_height) * block_height
+    while row < row_stop:
+        col = (window.col_off // block_width) * block_width
+        while col < col_stop:
+            top = max(row, window.row_off)
+            left = max(col, window.col_off)
+            bottom = min(row + block_height, row_stop)
+            right = min(col + block_width, col_stop)
+            yield Window(left, top, right - left, bottom - top)
+            col += block_width
+        row += block_height
+
+
+def _scan_factor(dataset: DatasetReader, size: int) -> int:
+    """Returns the coarsest overview factor that still leaves several pixels
+    across a tile, or 1 if the dataset has no overviews."""
+    tile_pixels = size / abs(dataset.res[0])
+    factors = [
+        factor for factor in dataset.overviews(1) if factor <= tile_pixels / 8
+    ]
+    return max(factors, default=1)
+
+
+def _read_filled(dataset: DatasetReader, window: Window,
+                 nodata: Optional[float]) -> np.ndarray:
+    """Reads a window, filling any part outside the dataset with nodata."""
+    data = np.full((dataset.count, window.height, window.width),
+                   nodata if nodata is not None else 0,
+                   dtype=dataset.dtypes[0])
+    inside = _inside(dataset, window)
+    if inside is not None:
+        data[(slice(None), ) + inside[1]] = dataset.read(window=inside[0])
+    return data
+
+
+def _read_valid(dataset: DatasetReader, window: Window) -> np.ndarray:
+    """Returns the band 1 validity mask of a window as booleans, with any
+    part outside the dataset invalid."""
+    valid = np.zeros((window.height, window.width), dtype=bool)
+    inside = _inside(dataset, window)
+    if inside is not None:
+        valid[inside[1]] = dataset.read_masks(1, window=inside[0]) > 0
+    return valid
+
+
+def _inside(dataset: DatasetReader,
+            window: Window) -> Optional[Tuple[Window, Tuple[slice, slice]]]:
+    """Returns the part of a window inside the dataset and the rows and
+    columns of the window it covers, or None if there is none."""
+    row_start = max(window.row_off, 0)
+    col_start = max(window.col_off, 0)
+    row_stop = min(window.row_off + window.height, dataset.height)
+    col_stop = min(window.col_off + window.width, dataset.width)
+    if row_start >= row_stop or col_start >= col_stop:
+        return None
+    inside = Window(col_start, row_start, col_stop - col_start,
+                    row_stop - row_start)
+    rows = slice(row_start - window.row_off, row_stop - window.row_off)
+    cols = slice(col_start - window.col_off, col_stop - window.col_off)
+    return inside, (rows, cols)
+
+
+def _colormap(dataset: DatasetReader) -> Optional[Dict[int, Any]]:
+    try:
+        return dataset.colormap(1)
+    except ValueError:
+        return None
+
+
+class _DatasetPool:
+    """Keeps one open dataset per source and thread so that each worker
+    reuses its handles, and with them the GDAL block cache, across tiles."""
+
+    def __init__(self) -> None:
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._datasets: List[DatasetReader] = []
+
+    def get(self, infile: str) -> DatasetReader:
+        datasets = getattr(self._local, "datasets", None)
+        if datasets is None:
+            datasets = self._local.datasets = {}
+        dataset = datasets.get(infile)
+        if dataset is None:
+            dataset = datasets[infile] = rasterio.open(infile)
+            with self._lock:
+                self._datasets.append(dataset)
+        return dataset
+
+    def close(self) -> None:
+        with self._lock:
+            for dataset in self._datasets:
+                dataset.close()
+            self._datasets = []
+
+
+def tile(infile: Union[str, Sequence[str]],
          outdir: str,
          size: int,
          left_bottom: Tuple[(int, int)],
-         nodata: Optional[int] = None) -> None:
-    """Tiles the given input to a grid."""
-    with rasterio.open(infile) as dataset:
-        _, _, right, top = dataset.bounds
+         nodata: Optional[int] = None,
+         workers: int = 1,
+         engine: TileEngine = TileEngine.GDAL,
+         skip_nodata: bool = False,
+         resume: bool = False,
+         bbox: Optional[Tuple[float, float, float, float]] = None,
+         shard: Optional[Tuple[int, int]] = None) -> List[str]:
+    """Tiles the given input to a grid.
+
+    Tiles are written concurrently when ``workers`` is greater than one. A
+    progress character is printed as each tile completes. If any tile fails,
+    tiles that have not yet started are cancelled and the error is raised.
+
+    The ``gdal`` engine runs one ``gdal_translate`` process per tile. The
+    ``rasterio`` engine opens the source once per worker and reads each tile
+    as a window, avoiding process startup and repeated header reads.
+
+    Several sources, e.g. per-state mosaics with the same CRS, resolution
+    and data type, can be tiled together with the ``rasterio`` engine,
+    without merging them first. The grid covers all sources, each tile
+    reads only the sources that overlap it, and later sources take
+    precedence where sources overlap. Tiles are named after the first
+    source. Grid cells that no source overlaps are not written.
+
+    With ``skip_nodata``, grid cells that contain only nodata are detected
+    from the source's overviews and are not written.
+
+    Each tile is written to a temporary file that is renamed into place when
+    complete, and is then recorded in a journal in ``outdir``. With
+    ``resume``, tiles recorded by an earlier run with the same parameters,
+    and still present with the recorded size, are not written again.
+
+    With ``shard``, only one of several disjoint shares of the grid cells is
+    written, see :meth:`TileIndex.shard`, so that the grid can be split
+    across machines that each run the same command with their own shard.
+    Each shard has its own journal, see :func:`journal_name`, so shards
+    can write to the same ``outdir``, concurrently or not.
+
+    Args:
+        infile (Union[str, Sequence[str]]): HREF to source GeoTIFF to be
+            tiled, or HREFs to several source GeoTIFFs.
+        outdir (str): Directory that will contain the tiles.
+        size (int): Tile size in meters.
+        left_bottom (Tuple[int, int]): X, Y coordinates of tile grid origin.
+        nodata (Optional[int]): nodata value to use for tiled COGs.
+        workers (int): Number of tiles to write concurrently.
+        engine (TileEngine): Engine used to write the tiles.
+        skip_nodata (bool): Do not write tiles that contain only nodata.
+        resume (bool): Skip tiles completed by an earlier run.
+        bbox (Optional[Tuple[float, float, float, float]]): If provided,
+            only tiles that intersect this left, bottom, right, top box, in
+            the source CRS, are written.
+        shard (Optional[Tuple[int, int]]): If provided, the index and count
+            of the shard of grid cells to write.
+    Returns:
+        List[str]: Paths of the written tiles, in grid order.
+    """
+    if workers < 1:
+        raise ValueError(f"workers must be at least 1, got {workers}")
+    engine = TileEngine(engine)
+    sources = _sources(infile)
+    if engine == TileEngine.GDAL and len(sources) > 1:
+        raise ValueError("Tiling several sources requires the rasterio engine")
+    index, overlaps = _plan(sources, size, left_bottom, nodata, skip_nodata,
+                            bbox, shard)
+    cells = list(zip(_to_tiles(index, nodata), overlaps))
+
+    parameters: Dict[str, Any] = {
+        "infile": infile if isinstance(infile, str) else sources,
+        "size": size,
+        "left_bottom": list(left_bottom),
+        "nodata": nodata
+    }
+    if shard is not None:
+        parameters["shard"] = list(shard)
+    journal = TileJournal(os.path.join(outdir, journal_name(shard)),
+                          parameters, resume)
+
+    def run(write: Callable[[Tile, List[int]], str]) -> List[str]:
+
+        def func(cell: Tuple[Tile, List[int]]) -> str:
+            tile, positions = cell
+            outfile = tile.outfile(sources[0], outdir)
+            if journal.is_complete(outfile):
+                return outfile
+            write(tile, positions)
+            journal.record(outfile)
+            return outfile
+
+        return _run(func, cells, workers)
+
+    try:
+        if engine == TileEngine.RASTERIO:
+            pool = _DatasetPool()
+            try:
+                return run(lambda tile, positions: tile.subset_datasets(
+                    [pool.get(sources[i])
+                     for i in positions], sources[0], outdir))
+            finally:
+                pool.close()
+        else:
+            return run(lambda tile, _: tile.subset(sources[0], outdir))
+    finally:
+        journal.close()
+
+
+def iter_tiles(
+        infile: Union[str, Sequence[str]],
+        outdir: str,
+        size: int,
+        left_bottom: Tuple[(int, int)],
+        nodata: Optional[int] = None,
+        workers: int = 1,
+        bbox: Optional[Tuple[float, float, float, float]] = None,
+        shard: Optional[Tuple[int,
+                              int]] = None) -> Iterator[Tuple[str, Metadata]]:
+    """Tiles the given input to a grid, yielding each tile as it is written.
+
+    Tiles are written with the ``rasterio`` engine and grid cells that
+    contain only nodata are skipped, as with ``tile(..., skip_nodata=True)``.
+    Each tile is yielded with its :class:`Metadata`, which is built from the
+    source grid so that the written COG is never read back. At most twice
+    ``workers`` tiles are in flight.
+
+    Args:
+        infile (Union[str, Sequence[str]]): HREF to source GeoTIFF to be
+            tiled, or HREFs to several source GeoTIFFs, see :func:`tile`.
+        outdir (str): Directory that will contain the tiles.
+        size (int): Tile size in meters.
+        left_bottom (Tuple[int, int]): X, Y coordinates of tile grid origin.
+        nodata (Optional[int]): nodata value to use for tiled COGs.
+        workers (int): Number of tiles to write concurrently.
+        bbox (Optional[Tuple[float, float, float, float]]): If provided,
+            only tiles that intersect this left, bottom, right, top box, in
+            the source CRS, are written.
+        shard (Optional[Tuple[int, int]]): If provided, the index and count
+            of the shard of grid cells to write, see :func:`tile`.
+    Returns:
+        Iterator[Tuple[str, Metadata]]: The path and metadata of each
+        written tile, in grid order.
+    """
+    if workers < 1:
+        raise ValueError(f"workers must be at least 1, got {workers}")
+    sources = _sources(infile)
+    index, overlaps = _plan(sources, size, left_bottom, nodata, True, bbox,
+                            shard)
+    pool = _DatasetPool()
+
+    def write(cell: Tuple[Tile, List[int]]) -> Tuple[str, Metadata]:
+        tile, positions = cell
+        datasets = [pool.get(sources[i]) for i in positions]
+        outfile = tile.subset_datasets(datasets, sources[0], outdir)
+        return outfile, tile.metadata(datasets[0], outfile)
+
+    try:
+        yield from imap(write, list(zip(_to_tiles(index, nodata), overlaps)),
+                        workers)
+    finally:
+        pool.close()
+
+
+def tile_index(infile: Union[str, Sequence[str]],
+               size: int,
+               left_bottom: Tuple[(int, int)],
+               nodata: Optional[int] = None,
+               skip_nodata: bool = False,
+               bbox: Optional[Tuple[float, float, float, float]] = None,
+               shard: Optional[Tuple[int, int]] = None) -> TileIndex:
+    """Returns the index of the tiles that :func:`tile` writes with the same
+    arguments, without writing them.
+
+    Args:
+        infile (Union[str, Sequence[str]]): HREF to source GeoTIFF to be
+            tiled, or HREFs to several source GeoTIFFs.
+        size (int): Tile size in meters.
+        left_bottom (Tuple[int, int]): X, Y coordinates of tile grid origin.
+        nodata (Optional[int]): nodata value to use for tiled COGs.
+        skip_nodata (bool): Leave out tiles that contain only nodata.
+        bbox (Optional[Tuple[float, float, float, float]]): If provided,
+            only tiles that intersect this left, bottom, right, top box, in
+            the source CRS, are included.
+        shard (Optional[Tuple[int, int]]): If provided, the index and count
+            of the shard of grid cells to include, see :func:`tile`.
+    Returns:
+        TileIndex: The tiles, in the source CRS.
+    """
+    index, _ = _plan(_sources(infile), size, left_bottom, nodata, skip_nodata,
+                     bbox, shard)
+    return index
+
+
+def shard_items(items: Iterable[T],
+                shard: Optional[Tuple[int, int]] = None) -> Iterator[T]:
+    """Yields every ``count``-th item, starting at the ``index``-th, for
+    ``shard`` as an index and count, or all items if ``shard`` is None.
+
+    Items are consumed lazily, so a shard of the lines of an open file is
+    read without holding the other shards' lines.
+    """
+    if shard is None:
+        return iter(items)
+    index, count = shard
+    check_shard(index, count)
+    return islice(items, index, None, count)
+
+
+def journal_name(shard: Optional[Tuple[int, int]] = None) -> str:
+    """Returns the file name of the journal of a :func:`tile` run, or of one
+    shard of a sharded run."""
+    if shard is None:
+        return TILE_JOURNAL
+    index, count = shard
+    return TILE_SHARD_JOURNAL.format(index=index, count=count)
+
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    """Parses a shard given as ``index/count``, e.g. ``0/4``."""
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise ValueError(f"Invalid shard {value!r}: expected index/count, "
+                         "e.g. 0/4") from None
+    check_shard(index, count)
+    return index, count
+
+
+def _sources(infile: Union[str, Sequence[str]]) -> List[str]:
+    sources = [infile] if isinstance(infile, str) else list(infile)
+    if not sources:
+        raise ValueError("At least one source is required")
+    return sources
+
+
+def _plan(
+    sources: List[str],
+    size: int,
+    left_bottom: Tuple[(int, int)],
+    nodata: Optional[int],
+    skip_nodata: bool,
+    bbox: Optional[Tuple[float, float, float, float]],
+    shard: Optional[Tuple[int,
+                          int]] = None) -> Tuple[TileIndex, List[List[int]]]:
+    """Returns the grid cells to write and, for each, the positions of the
+    sources to read.
+
+    The grid is sharded before cells are checked for data, so each shard
+    only scans its own cells. A cell is kept if a source overlaps it with at
+    least one pixel and, with ``skip_nodata``, has valid data in it. Only
+    such sources are read for the cell.
+    """
+    datasets = [rasterio.open(source) for source in sources]
+    try:
+        _check_sources(datasets)
+        source_index = SourceIndex(
+            np.array([list(dataset.bounds) for dataset in datasets]))
+        _, _, right, top = source_index.extent
         left, bottom = left_bottom
-        tiles = create_tiles(left, bottom, right, top, size, nodata)
-    for tile in tiles:
-        tile.subset(infile, outdir)
+        index = TileIndex.create(left, bottom, right, top, size, bbox,
+                                 datasets[0].crs)
+        if shard is not None:
+            index = index.shard(*shard)
+        factors = [_scan_factor(dataset, size) for dataset in datasets]
+        keep = []
+        overlaps = []
+        for tile, positions in zip(_to_tiles(index, nodata),
+                                   source_index.overlapping(index)):
+            positions = [
+                i for i in positions if _overlaps(tile, datasets[i]) and (
+                    not skip_nodata or tile.has_data(datasets[i], factors[i]))
+            ]
+            keep.append(bool(positions))
+            if positions:
+                overlaps.append(positions)
+        return index.select(np.array(keep, dtype=bool)), overlaps
+    finally:
+        for dataset in datasets:
+            dataset.close()
+
+
+def _overlaps(tile: Tile, dataset: DatasetReader) -> bool:
+    """Returns True if the tile's window, snapped to the dataset's pixel
+    grid, includes at least one of its pixels. Bounds alone can overlap by
+    a floating point error."""
+    window = tile.window(dataset.transform)
+    if not _has_pixels(window):
+        return False
+    try:
+        window = window.intersection(
+            Window(0, 0, dataset.width, dataset.height))
+    except WindowError:
+        return False
+    return _has_pixels(window)
+
+
+def _check_sources(datasets: List[DatasetReader]) -> None:
+    """Raises a ValueError if the sources cannot be tiled together.
+
+    Besides sharing a CRS, resolution and bands, the sources' pixel grids
+    must be aligned: each origin must be a whole number of pixels from the
+    first, since a tile's window is snapped to the first source's grid and
+    read at the same size from the others.
+    """
+    first = datasets[0]
+    for dataset in datasets[1:]:
+        for name in ["crs", "res", "count", "dtypes"]:
+            if getattr(dataset, name) != getattr(first, name):
+                raise ValueError(
+                    f"The {name} of {dataset.name} does not match that of "
+                    f"{first.name}: {getattr(dataset, name)} != "
+                    f"{getattr(first, name)}")
+        col = (dataset.transform.c - first.transform.c) / first.transform.a
+        row = (dataset.transform.f - first.transform.f) / first.transform.e
+        if not np.allclose([col, row],
+                           np.round([col, row]),
+                           rtol=0,
+                           atol=GRID_ALIGNMENT_TOLERANCE):
+            raise ValueError(
+                f"The pixel grid of {dataset.name} is not aligned with that "
+                f"of {first.name}: its origin is {col}, {row} pixels from "
+                "the first source's origin")
+
+
+def _to_tiles(index: TileIndex, nodata: Optional[int]) -> List[Tile]:
+    return [
+        Tile(left, bottom, right, top, nodata)
+        for left, bottom, right, top in index.bounds.tolist()
+    ]
+
+
+def imap(func: Callable[[T], R], items: List[T], workers: int) -> Iterator[R]:
+    """Lazily applies ``func`` to each item in a pool of threads, yielding
+    results in item order with at most twice ``workers`` items in flight.
+
+    If ``func`` raises, items that have not yet started are cancelled and
+    the error is raised.
+
+    Args:
+        func (Callable[[T], R]): Function to apply.
+        items (List[T]): Items to apply it to.
+        workers (int): Number of items to process concurrently. With 1,
+            items are processed in the calling thread.
+    Returns:
+        Iterator[R]: The result for each item, in item order.
+    """
+    if workers == 1:
+        for item in items:
+            yield func(item)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending: Deque[Future] = deque()
+        try:
+            for item in items:
+                pending.append(executor.submit(func, item))
+                if len(pending) >= 2 * workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        except BaseException:
+            _cancel(list(pending))
+            raise
+
+
+def _run(func: Callable[[T], R],
+         items: List[T],
+         workers: int,
+         progress: Callable[[R], str] = lambda _: ".") -> List[R]:
+    """Applies ``func`` to each item, returning results in item order.
+
+    ``progress`` maps each result to the character printed when it
+    completes.
+    """
+    results = []
+    for result in imap(func, items, workers):
+        results.append(result)
+        print(f"{progress(result)} ", end="", flush=True)
+    print()
+    return results
+
+
+def _cancel(futures: List[Future]) -> None:
+    for future in futures:
+        future.cancel()
 
 
 def create_tiles(left: float,
@@ -61,44 +844,159 @@ def create_tiles(left: float,
                  right: float,
                  top: float,
                  size: int,
-                 nodata: Optional[int] = None) -> List[Tile]:
-    x = left
-    y = bottom
-    tiles = []
-    while x < right:
-        while y < top:
-            tile = Tile(x, y, min(x + size, right), min(y + size, top), nodata)
-            tiles.append(tile)
-            y += size
-        x += size
-        y = bottom
+                 nodata: Optional[int] = None,
+                 dataset: Optional[DatasetReader] = None,
+                 bbox: Optional[Tuple[float, float, float, float]] = None,
+                 shard: Optional[Tuple[int, int]] = None) -> List[Tile]:
+    """Creates a grid of tiles covering the given bounds.
+
+    The grid is generated by :meth:`TileIndex.create`.
+
+    Args:
+        left (float): Left coordinate of the grid origin.
+        bottom (float): Bottom coordinate of the grid origin.
+        right (float): Right limit of the grid.
+        top (float): Top limit of the grid.
+        size (int): Tile size in the units of the coordinates.
+        nodata (Optional[int]): nodata value to use for tiled COGs.
+        dataset (Optional[DatasetReader]): If provided, only tiles that
+            intersect valid data in this dataset are returned.
+        bbox (Optional[Tuple[float, float, float, float]]): If provided,
+            only tiles that intersect this left, bottom, right, top box are
+            returned.
+        shard (Optional[Tuple[int, int]]): If provided, only the tiles of
+            this shard index and count are returned, see
+            :meth:`TileIndex.shard`.
+    Returns:
+        List[Tile]: The tiles, ordered by column and then by row.
+    """
+    index = TileIndex.create(left, bottom, right, top, size, bbox)
+    if shard is not None:
+        index = index.shard(*shard)
+    tiles = _to_tiles(index, nodata)
+    if dataset is not None:
+        factor = _scan_factor(dataset, size)
+        tiles = [tile for tile in tiles if tile.has_data(dataset, factor)]
     return tiles
 
 
-def remove_nodata(indir: str, nodata_dir: str) -> None:
+class NodataResult:
+    """Result of checking a single TIF file for valid data."""
+
+    def __init__(self, path: str, has_data: bool, valid_pixels: Optional[int],
+                 elapsed: float) -> None:
+        self.path = path
+        self.has_data = has_data
+        self.valid_pixels = valid_pixels
+        self.elapsed = elapsed
+
+    @property
+    def status(self) -> str:
+        return "valid" if self.has_data else "nodata"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "status": self.status,
+            "valid_pixels": self.valid_pixels,
+            "elapsed": self.elapsed,
+        }
+
+
+@metrics.timed("nodata.check")
+def check_nodata(tif_file: str, count_pixels: bool = False) -> NodataResult:
+    """Checks whether a TIF file contains any valid data.
+
+    The file is checked at its coarsest overview first and then block by
+    block, stopping at the first valid pixel. With ``count_pixels`` every
+    block is read to count the valid pixels instead.
+
+    Args:
+        tif_file (str): Path to the TIF file.
+        count_pixels (bool): Count valid pixels instead of stopping at the
+            first one.
+    Returns:
+        NodataResult: The result of the check.
+    """
+    start = time.perf_counter()
+    with rasterio.open(tif_file) as src:
+        if count_pixels:
+            valid_pixels: Optional[int] = count_valid_pixels(src)
+            has_data = bool(valid_pixels)
+        else:
+            valid_pixels = None
+            factor = max(src.overviews(1), default=1)
+            has_data = has_valid_data(src, factor=factor)
+            if not has_data:
+                valid_pixels = 0
+    return NodataResult(tif_file, has_data, valid_pixels,
+                        time.perf_counter() - start)
+
+
+def count_valid_pixels(dataset: DatasetReader) -> int:
+    """Counts the valid pixels in band 1, reading one block at a time."""
+    window = Window(0, 0, dataset.width, dataset.height)
+    return sum(
+        int(np.count_nonzero(dataset.read_masks(1, window=block_window)))
+        for block_window in block_windows(dataset, window))
+
+
+def remove_nodata(indir: str,
+                  nodata_dir: str,
+                  workers: int = 1,
+                  dry_run: bool = False,
+                  count_pixels: bool = False) -> List[NodataResult]:
     """Removes TIF files that contain only nodata values to a new directory.
 
+    Each file is checked with :func:`check_nodata`. Files are checked
+    concurrently when ``workers`` is greater than one.
+
     Args:
         indir (str): Directory containing the TIF files.
         nodata_dir (str): New directory for the TIF files that contain only
             nodata values.
+        workers (int): Number of files to check concurrently.
+        dry_run (bool): Check the files without moving them.
+        count_pixels (bool): Count the valid pixels in every file.
+    Returns:
+        List[NodataResult]: The result for each file, sorted by path.
     """
-    os.mkdir(nodata_dir)
+    if workers < 1:
+        raise ValueError(f"workers must be at least 1, got {workers}")
+    if not dry_run:
+        os.mkdir(nodata_dir)
 
-    tif_files = glob(f"{indir}/*.tif")
-    for tif_file in tif_files:
-        all_nodata = False
-        with rasterio.open(tif_file) as src:
-            nodata = src.nodata
-            data = src.read(1)
-            if np.all((data == nodata)):
-                all_nodata = True
-
-        if all_nodata:
+    def check(tif_file: str) -> NodataResult:
+        result = check_nodata(tif_file, count_pixels)
+        if not result.has_data and not dry_run:
             filename = os.path.basename(tif_file)
             shutil.move(tif_file, os.path.join(nodata_dir, filename))
-            print("R ", end="", flush=True)
-        else:
-            print(". ", end="", flush=True)
+        return result
 
-    print()
+    tif_files = sorted(glob(f"{indir}/*.tif"))
+    return _run(check,
+                tif_files,
+                workers,
+                progress=lambda result: "." if result.has_data else "R")
+
+
+def write_manifest(results: List[NodataResult], path: str) -> None:
+    """Writes nodata check results to a JSON or CSV file.
+
+    The format is chosen from the file extension; anything other than
+    ``.csv`` is written as JSON.
+
+    Args:
+        results (List[NodataResult]): Results from :func:`remove_nodata`.
+        path (str): Path of the manifest file.
+    """
+    rows = [result.to_dict() for result in results]
+    if os.path.splitext(path)[1].lower() == ".csv":
+        with open(path, "w", newline="") as file:
+            writer = csv.DictWriter(
+                file, fieldnames=["path", "status", "valid_pixels", "elapsed"])
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        with open(path, "w") as file:
+            json.dump(rows, file, indent=2)
@@ -0,0 +1,219 @@
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import IO, Any, Dict, List, Optional, Sequence, Union
+
+import jsonschema
+from pystac import Collection, Item, StacIO, STACValidationError
+from pystac.serialization import identify_stac_object_type
+from pystac.validation.schema_uri_map import DefaultSchemaUriMap
+from referencing import Registry, Resource
+
+from stactools.chesapeake_lulc.constants import (VALIDATION_BATCH_SIZE,
+                                                 VALIDATION_SAMPLE_STRIDE,
+                                                 ValidationMode)
+from stactools.chesapeake_lulc.instrumentation import metrics
+from stactools.chesapeake_lulc.stac_io import use_fsspec
+
+SCHEMA_FILES = (
+    "projection-v2.0.0.json",
+    "raster-v1.1.0.json",
+    "item-assets-v1.0.0.json",
+    "classification-v1.0.0.json",
+    "projjson-v0.7.json",
+)
+
+
+class SchemaValidator:
+    """Validates STAC objects against JSON schemas that are loaded and
+    compiled once.
+
+    The STAC core schemas bundled with pystac and the extension schemas
+    bundled with this package are used without network access. Any other
+    schema is fetched once, on first use. Instances are thread safe; use
+    :func:`get_validator` for the shared instance.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._validators: Dict[str, Any] = {}
+        self._schema_uri_map = DefaultSchemaUriMap()
+        registry: Registry = Registry(retrieve=_retrieve)  # type: ignore
+        self._registry = registry.with_resources([
+            (uri, Resource.from_contents(schema))
+            for uri, schema in _local_schemas().items()
+        ])
+
+    def validate(self, stac_object: Union[Item, Collection]) -> None:
+        """Validates an Item or Collection, without its children.
+
+        Args:
+            stac_object (Union[Item, Collection]): The object to validate.
+        Raises:
+            STACValidationError: If the object does not match a schema.
+        """
+        self.validate_dict(_to_dict(stac_object), stac_object.get_self_href())
+
+    @metrics.timed("validation")
+    def validate_dict(self,
+                      stac_dict: Dict[str, Any],
+                      href: Optional[str] = None) -> None:
+        """Validates the dictionary of an Item or Collection against the core
+        schema and the schema of each of its extensions.
+
+        Args:
+            stac_dict (Dict[str, Any]): The STAC object as a dictionary.
+            href (Optional[str]): HREF of the object, used in error messages.
+        Raises:
+            STACValidationError: If the object does not match a schema.
+        """
+        object_type = identify_stac_object_type(stac_dict)
+        if object_type is None:
+            raise STACValidationError(
+                f"Not a STAC object: {stac_dict.get('id')}")
+        core_uri = self._schema_uri_map.get_object_schema_uri(
+            object_type, stac_dict["stac_version"])
+        for uri in [core_uri] + stac_dict.get("stac_extensions", []):
+            if uri is None:
+                continue
+            errors = list(self._validator(uri).iter_errors(stac_dict))
+            if errors:
+                best = jsonschema.exceptions.best_match(errors)
+                message = f"Validation failed for {stac_dict.get('id')} "
+                if href is not None:
+                    message += f"at {href} "
+                raise STACValidationError(
+                    f"{message}against schema at {uri}\n{best}",
+                    source=errors) from best
+
+    def _validator(self, uri: str) -> Any:
+        with self._lock:
+            if uri not in self._validators:
+                retrieved = self._registry.get_or_retrieve(uri)
+                self._registry = retrieved.registry
+                schema = retrieved.value.contents
+                cls = jsonschema.validators.validator_for(schema)
+                cls.check_schema(schema)
+                self._validators[uri] = cls(schema, registry=self._registry)
+            return self._validators[uri]
+
+
+@lru_cache(maxsize=None)
+def get_validator() -> SchemaValidator:
+    """Returns the validator shared by this process."""
+    return SchemaValidator()
+
+
+def in_sample(index: int, mode: ValidationMode) -> bool:
+    """Returns True if the Item at ``index`` is validated in ``mode``."""
+    if mode == ValidationMode.ALL:
+        return True
+    if mode == ValidationMode.SAMPLE:
+        return index % VALIDATION_SAMPLE_STRIDE == 0
+    return False
+
+
+def validate_items(items: Sequence[Item],
+                   mode: ValidationMode = ValidationMode.ALL,
+                   workers: int = 1) -> None:
+    """Validates Items in batches, optionally in parallel.
+
+    Validation is CPU bound, so batches are validated in worker processes,
+    each of which compiles the schemas once.
+
+    Args:
+        items (Sequence[Item]): The Items to validate.
+        mode (ValidationMode): Validate all Items, a sample of them, or none.
+        workers (int): Number of processes validating batches.
+    Raises:
+        STACValidationError: For the first invalid Item.
+    """
+    if workers < 1:
+        raise ValueError(f"workers must be at least 1, got {workers}")
+    dicts = [
+        _to_dict(item) for index, item in enumerate(items)
+        if in_sample(index, mode)
+    ]
+    batches = [
+        dicts[start:start + VALIDATION_BATCH_SIZE]
+        for start in range(0, len(dicts), VALIDATION_BATCH_SIZE)
+    ]
+    if workers == 1 or len(batches) < 2:
+        validator = get_validator()
+        for stac_dict in dicts:
+            validator.validate_dict(stac_dict)
+        return
+    with ProcessPoolExecutor(max_workers=min(workers, len(batches))) as pool:
+        for _ in pool.map(_validate_batch, batches):
+            pass
+
+
+def validate_collection(collection: Collection,
+                        mode: ValidationMode = ValidationMode.ALL,
+                        workers: int = 1) -> None:
+    """Validates a Collection and its Items.
+
+    Args:
+        collection (Collection): The Collection to validate.
+        mode (ValidationMode): Validate all Items, a sample of them, or none.
+            The Collection itself is validated unless ``mode`` is "none".
+        workers (int): Number of processes validating Items.
+    Raises:
+        STACValidationError: If the Collection or one of the validated Items
+            is invalid.
+    """
+    if mode == ValidationMode.NONE:
+        return
+    get_validator().validate(collection)
+    validate_items(list(collection.get_items()), mode, workers)
+
+
+def _validate_batch(batch: List[Dict[str, Any]]) -> None:
+    validator = get_validator()
+    for stac_dict in batch:
+        try:
+            validator.validate_dict(stac_dict)
+        except STACValidationError as error:
+            # The jsonschema errors in the source cannot be pickled.
+            raise STACValidationError(str(error)) from None
+
+
+def _to_dict(stac_object: Union[Item, Collection]) -> Dict[str, Any]:
+    # Validate the JSON that is written: Item dictionaries contain tuples,
+    # e.g. the geometry coordinates, which JSON schema does not accept as
+    # arrays.
+    return json.loads(json.dumps(stac_object.to_dict()))
+
+
+def _local_schemas() -> Dict[str, Dict[str, Any]]:
+    schemas: Dict[str, Dict[str, Any]] = {}
+    try:
+        from pystac.validation.local_validator import get_local_schema_cache
+        schemas.update(get_local_schema_cache())
+    except ImportError:
+        pass
+    for file_name in SCHEMA_FILES:
+        with _open(file_name) as stream:
+            schema = json.load(stream)
+        schemas[schema["$id"]] = schema
+    return schemas
+
+
+def _open(file_name: str) -> IO[bytes]:
+    if sys.version_info >= (3, 9):
+        from importlib.resources import files
+        package = files("stactools.chesapeake_lulc")
+        return (package / "schemas" / file_name).open("rb")
+    else:
+        return open(
+            os.path.join(os.path.dirname(__file__), "schemas", file_name),
+            "rb")
+
+
+@lru_cache(maxsize=None)
+def _retrieve(uri: str) -> Resource:
+    use_fsspec()
+    return Resource.from_contents(json.loads(StacIO.default().read_text(uri)))
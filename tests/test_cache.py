@@ -0,0 +1,118 @@
+import json
+import os
+import shutil
+import sqlite3
+from tempfile import TemporaryDirectory
+from unittest import TestCase, mock
+
+import fsspec
+
+from stactools.chesapeake_lulc import cache as cache_module
+from stactools.chesapeake_lulc import stac
+from stactools.chesapeake_lulc.cache import MetadataCache
+from tests import test_data
+
+FILE_NAMES = [
+    "BayWide_1m_LU_E1300000_N1770000.tif",
+    "Baywide_13Class_20132014_E1300000_N1770000.tif",
+    "Baywide_7class_20132014_E1300000_N1770000.tif",
+]
+
+
+class MetadataCacheTest(TestCase):
+
+    def setUp(self) -> None:
+        self.tmp_dir = TemporaryDirectory()
+        self.hrefs = []
+        for file_name in FILE_NAMES:
+            href = os.path.join(self.tmp_dir.name, file_name)
+            shutil.copy(test_data.get_path(f"data-files/{file_name}"), href)
+            self.hrefs.append(href)
+        self.cache_path = os.path.join(self.tmp_dir.name, "cache.sqlite")
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_cached_items_match(self) -> None:
+        with MetadataCache(self.cache_path) as cache:
+            first = [
+                stac.create_item(href, cache=cache) for href in self.hrefs
+            ]
+            self.assertEqual((cache.hits, cache.misses), (0, 3))
+        with MetadataCache(self.cache_path) as cache:
+            second = [
+                stac.create_item(href, cache=cache) for href in self.hrefs
+            ]
+            self.assertEqual((cache.hits, cache.misses), (3, 0))
+        for a, b in zip(first, second):
+            self.assertEqual(json.dumps(a.geometry), json.dumps(b.geometry))
+            self.assertEqual(a.bbox, b.bbox)
+            self.assertEqual(a.properties["proj:shape"],
+                             b.properties["proj:shape"])
+            self.assertEqual(a.properties["proj:transform"],
+                             b.properties["proj:transform"])
+            self.assertEqual(a.properties["proj:wkt2"],
+                             b.properties["proj:wkt2"])
+
+    def test_changed_file_is_read_again(self) -> None:
+        with MetadataCache(self.cache_path) as cache:
+            cache.get_metadata(self.hrefs[0])
+            stat = os.stat(self.hrefs[0])
+            os.utime(self.hrefs[0],
+                     ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+            cache.get_metadata(self.hrefs[0])
+            self.assertEqual((cache.hits, cache.misses), (0, 2))
+            self.assertEqual(len(cache), 1)
+
+    def test_unversioned_file_is_not_cached(self) -> None:
+        fs = fsspec.filesystem("memory")
+        fs.pipe("/cache-test/file.tif", b"data")
+        try:
+            # The memory file system reports no ETag or modification time.
+            self.assertIsNone(
+                cache_module._fingerprint("memory://cache-test/file.tif"))
+        finally:
+            fs.rm("/cache-test", recursive=True)
+        with MetadataCache(self.cache_path) as cache, mock.patch.object(
+                cache_module, "_fingerprint", return_value=None):
+            cache.get_metadata(self.hrefs[0])
+            cache.get_metadata(self.hrefs[0])
+            self.assertEqual((cache.hits, cache.misses), (0, 2))
+            self.assertEqual(len(cache), 0)
+
+    def test_eviction(self) -> None:
+        with MetadataCache(self.cache_path, max_entries=2) as cache:
+            for href in self.hrefs:
+                cache.get_metadata(href)
+            self.assertEqual(len(cache), 2)
+            cache.get_metadata(self.hrefs[0])
+            self.assertEqual(cache.misses, 4)
+
+    def test_eviction_keeps_hits(self) -> None:
+        with MetadataCache(self.cache_path, max_entries=2) as cache:
+            cache.get_metadata(self.hrefs[0])
+            cache.get_metadata(self.hrefs[1])
+            # The hit makes hrefs[0] the most recently used entry, so
+            # hrefs[1] is evicted.
+            cache.get_metadata(self.hrefs[0])
+            cache.get_metadata(self.hrefs[2])
+            self.assertEqual(len(cache), 2)
+            cache.get_metadata(self.hrefs[0])
+            self.assertEqual((cache.hits, cache.misses), (2, 3))
+
+    def test_hits_recorded_on_close(self) -> None:
+        with MetadataCache(self.cache_path) as cache:
+            cache.get_metadata(self.hrefs[0])
+        connection = sqlite3.connect(self.cache_path)
+        query = "SELECT last_used FROM metadata"
+        try:
+            (written, ), = connection.execute(query).fetchall()
+            with MetadataCache(self.cache_path) as cache:
+                cache.get_metadata(self.hrefs[0])
+                self.assertEqual(cache.hits, 1)
+                self.assertEqual(
+                    connection.execute(query).fetchall(), [(written, )])
+            (used, ), = connection.execute(query).fetchall()
+        finally:
+            connection.close()
+        self.assertGreater(used, written)
@@ -1,12 +1,18 @@
+import csv
+import json
 import os.path
 from tempfile import TemporaryDirectory
 from typing import Callable, List
 
+import numpy as np
 import pystac
+import rasterio
 from click import Command, Group
 from stactools.testing import CliTestCase
 
 from stactools.chesapeake_lulc.commands import create_chesapeake_lulc_command
+from stactools.chesapeake_lulc.constants import TileEngine
+from stactools.chesapeake_lulc.utils import tile
 from tests import test_data
 
 
@@ -47,3 +53,151 @@ class ItemCommandTest(CliTestCase):
                                      "BayWide_1m_LU_E1300000_N1770000.json")
             item = pystac.read_file(item_path)
         item.validate()
+
+
+class CollectionCommandTest(CliTestCase):
+
+    def create_subcommand_functions(self) -> List[Callable[[Group], Command]]:
+        return [create_chesapeake_lulc_command]
+
+    def test_create_collection_validate(self) -> None:
+        infile = test_data.get_path(
+            "data-files/Baywide_7class_20132014_E1300000_N1770000.tif")
+        with TemporaryDirectory() as tmp_dir:
+            hrefs = os.path.join(tmp_dir, "hrefs.txt")
+            with open(hrefs, "w") as file:
+                file.write(infile)
+            outdir = os.path.join(tmp_dir, "collection")
+            for mode in ["all", "sample", "none"]:
+                result = self.run_command(
+                    f"chesapeake-lulc create-collection {hrefs} {outdir} "
+                    f"chesapeake-lc-7 --validate {mode}")
+                self.assertEqual(result.exit_code, 0, msg=result.output)
+            collection = pystac.Collection.from_file(
+                os.path.join(outdir, "collection.json"))
+            items = list(collection.get_items())
+            self.assertEqual(len(items), 1)
+            self.assertEqual(collection.extent.spatial.bboxes, [items[0].bbox])
+
+            stream_dir = os.path.join(tmp_dir, "stream")
+            result = self.run_command(
+                f"chesapeake-lulc create-collection {hrefs} {stream_dir} "
+                "chesapeake-lc-7 --stream --validate none")
+            self.assertEqual(result.exit_code, 0, msg=result.output)
+            streamed = pystac.Collection.from_file(
+                os.path.join(stream_dir, "collection.json"))
+            self.assertEqual(streamed.extent.to_dict(),
+                             collection.extent.to_dict())
+
+    def test_create_items_ndjson(self) -> None:
+        infile = test_data.get_path(
+            "data-files/Baywide_7class_20132014_E1300000_N1770000.tif")
+        with TemporaryDirectory() as tmp_dir:
+            hrefs = os.path.join(tmp_dir, "hrefs.txt")
+            with open(hrefs, "w") as file:
+                file.write(infile)
+            outfile = os.path.join(tmp_dir, "items.ndjson")
+            result = self.run_command(
+                f"chesapeake-lulc create-items {hrefs} {outfile} "
+                "chesapeake-lc-7")
+            self.assertEqual(result.exit_code, 0, msg=result.output)
+            with open(outfile) as file:
+                lines = file.readlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0])["collection"], "chesapeake-lc-7")
+
+    def test_tile_collection(self) -> None:
+        infile = test_data.get_path(
+            "data-files/Baywide_7class_20132014_E1300000_N1770000.tif")
+        with TemporaryDirectory() as tmp_dir:
+            tile_dir = os.path.join(tmp_dir, "tiles")
+            os.mkdir(tile_dir)
+            outdir = os.path.join(tmp_dir, "collection")
+            result = self.run_command(
+                f"chesapeake-lulc tile-collection {infile} {tile_dir} "
+                f"{outdir} chesapeake-lc-7 -s 2500 -l 1300000 1770000")
+            self.assertEqual(result.exit_code, 0, msg=result.output)
+            collection = pystac.Collection.from_file(
+                os.path.join(outdir, "collection.json"))
+            self.assertEqual(len(list(collection.get_items())), 5)
+            self.assertEqual(len(os.listdir(tile_dir)), 5)
+
+    def test_tile_collection_shards_merge(self) -> None:
+        infile = test_data.get_path(
+            "data-files/Baywide_7class_20132014_E1300000_N1770000.tif")
+        with TemporaryDirectory() as tmp_dir:
+            tile_dir = os.path.join(tmp_dir, "tiles")
+            os.mkdir(tile_dir)
+            paths = []
+            for index in range(2):
+                outdir = os.path.join(tmp_dir, f"shard-{index}")
+                result = self.run_command(
+                    f"chesapeake-lulc tile-collection {infile} {tile_dir} "
+                    f"{outdir} chesapeake-lc-7 -s 2500 -l 1300000 1770000 "
+                    f"--shard {index}/2 --validate none")
+                self.assertEqual(result.exit_code, 0, msg=result.output)
+                paths.append(os.path.join(outdir, "collection.json"))
+            outdir = os.path.join(tmp_dir, "collection")
+            result = self.run_command(
+                f"chesapeake-lulc merge {outdir} {' '.join(paths)}")
+            self.assertEqual(result.exit_code, 0, msg=result.output)
+            collection = pystac.Collection.from_file(
+                os.path.join(outdir, "collection.json"))
+            self.assertEqual(len(list(collection.get_items())), 5)
+            self.assertEqual(len(os.listdir(tile_dir)), 5)
+
+            result = self.run_command(
+                f"chesapeake-lulc tile-collection {infile} {tile_dir} "
+                f"{outdir} chesapeake-lc-7 --shard 2/2")
+            self.assertNotEqual(result.exit_code, 0)
+
+
+class RemoveNodataTifsCommandTest(CliTestCase):
+
+    def create_subcommand_functions(self) -> List[Callable[[Group], Command]]:
+        return [create_chesapeake_lulc_command]
+
+    def test_remove_nodata_tifs_dry_run(self) -> None:
+        infile = test_data.get_path(
+            "data-files/Baywide_7class_20132014_E1300000_N1770000.tif")
+        with TemporaryDirectory() as tmp_dir:
+            tile(infile,
+                 tmp_dir,
+                 2500, (1300000, 1770000),
+                 engine=TileEngine.RASTERIO)
+            manifest = os.path.join(tmp_dir, "manifest.csv")
+            cmd = (f"chesapeake-lulc remove-nodata-tifs {tmp_dir} "
+                   f"--workers 4 --dry-run --manifest {manifest}")
+            self.run_command(cmd)
+            self.assertFalse(
+                os.path.exists(os.path.join(tmp_dir, "nodata_tifs")))
+            with open(manifest) as file:
+                rows = list(csv.DictReader(file))
+        self.assertEqual(len(rows), 16)
+        self.assertEqual([row["path"] for row in rows],
+                         sorted(row["path"] for row in rows))
+        self.assertEqual(
+            len([row for row in rows if row["status"] == "nodata"]), 11)
+
+    def test_remove_nodata_tifs_count_pixels(self) -> None:
+        infile = test_data.get_path(
+            "data-files/Baywide_7class_20132014_E1300000_N1770000.tif")
+        with TemporaryDirectory() as tmp_dir:
+            tile(infile,
+                 tmp_dir,
+                 5000, (1300000, 1770000),
+                 engine=TileEngine.RASTERIO)
+            manifest = os.path.join(tmp_dir, "manifest.json")
+            cmd = (f"chesapeake-lulc remove-nodata-tifs {tmp_dir} "
+                   f"--count-pixels --manifest {manifest}")
+            self.run_command(cmd)
+            with open(manifest) as file:
+                rows = json.load(file)
+            with rasterio.open(infile) as dataset:
+                expected = int(np.count_nonzero(dataset.read_masks(1)))
+            self.assertEqual(sum(row["valid_pixels"] for row in rows),
+                             expected)
+            nodata_tifs = os.listdir(os.path.join(tmp_dir, "nodata_tifs"))
+            self.assertEqual(
+                len(nodata_tifs),
+                len([row for row in rows if row["status"] == "nodata"]))
@@ -0,0 +1,88 @@
+import json
+import os
+import unittest
+from tempfile import TemporaryDirectory
+
+from stactools.chesapeake_lulc import stac
+from stactools.chesapeake_lulc.constants import ExportFormat, ValidationMode
+from stactools.chesapeake_lulc.export import export_items, write_geoparquet
+from tests import test_data
+
+try:
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+
+class ExportTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.hrefs = [
+            test_data.get_path(
+                "data-files/Baywide_7class_20132014_E1300000_N1770000.tif"),
+            test_data.get_path("data-files/does-not-exist.tif"),
+        ]
+
+    def test_export_ndjson(self) -> None:
+        with TemporaryDirectory() as tmp_dir:
+            outfile = os.path.join(tmp_dir, "items.ndjson")
+            errors = export_items("chesapeake-lc-7",
+                                  self.hrefs,
+                                  outfile,
+                                  validate=ValidationMode.ALL)
+            with open(outfile) as file:
+                items = [json.loads(line) for line in file]
+        self.assertEqual(list(errors), [self.hrefs[1]])
+        self.assertEqual(len(items), 1)
+        item = items[0]
+        self.assertEqual(item["id"],
+                         "Baywide_7class_20132014_E1300000_N1770000")
+        self.assertEqual(item["collection"], "chesapeake-lc-7")
+        self.assertEqual(item["assets"]["data"]["href"], self.hrefs[0])
+        self.assertNotIn("self", [link["rel"] for link in item["links"]])
+
+    @unittest.skipUnless(HAS_PYARROW, "pyarrow is not installed")
+    def test_export_geoparquet(self) -> None:
+        from shapely import wkb
+        with TemporaryDirectory() as tmp_dir:
+            outfile = os.path.join(tmp_dir, "items.parquet")
+            errors = export_items("chesapeake-lc-7", self.hrefs * 2, outfile,
+                                  ExportFormat.GEOPARQUET)
+            table = pq.read_table(outfile)
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(table.num_rows, 2)
+        geo = json.loads(table.schema.metadata[b"geo"])
+        self.assertEqual(geo["primary_column"], "geometry")
+        self.assertEqual(str(table.schema.field("start_datetime").type),
+                         "timestamp[us, tz=UTC]")
+        row = table.to_pylist()[0]
+        self.assertEqual(row["collection"], "chesapeake-lc-7")
+        self.assertEqual(row["proj:shape"], [10000, 10000])
+        geometry = wkb.loads(row["geometry"])
+        self.assertEqual(
+            list(geometry.bounds),
+            [row["bbox"][key] for key in ["xmin", "ymin", "xmax", "ymax"]])
+
+    @unittest.skipUnless(HAS_PYARROW, "pyarrow is not installed")
+    def test_geoparquet_fields_after_first_batch(self) -> None:
+        first = stac.create_item(self.hrefs[0])
+        second = first.clone()
+        second.id = f"{first.id}_statistics"
+        band = second.assets["data"].extra_fields["raster:bands"][0]
+        band["statistics"] = {"minimum": 1, "maximum": 7}
+        second.properties["updated"] = "2022-06-01T00:00:00Z"
+        with TemporaryDirectory() as tmp_dir:
+            outfile = os.path.join(tmp_dir, "items.parquet")
+            count = write_geoparquet([first, second], outfile, batch_size=1)
+            table = pq.read_table(outfile)
+        self.assertEqual(count, 2)
+        self.assertEqual(table.num_rows, 2)
+        rows = table.to_pylist()
+        bands = [row["assets"]["data"]["raster:bands"][0] for row in rows]
+        self.assertIsNone(bands[0]["statistics"])
+        self.assertEqual(bands[1]["statistics"], {"minimum": 1, "maximum": 7})
+        self.assertIsNone(rows[0]["updated"])
+        self.assertEqual(rows[1]["updated"].year, 2022)
+        self.assertEqual(str(table.schema.field("updated").type),
+                         "timestamp[us, tz=UTC]")
@@ -0,0 +1,58 @@
+import unittest
+from tempfile import TemporaryDirectory
+
+import rasterio
+from shapely.geometry import shape
+
+from stactools.chesapeake_lulc import stac
+from stactools.chesapeake_lulc.constants import TileEngine
+from stactools.chesapeake_lulc.footprint import data_footprint
+from stactools.chesapeake_lulc.utils import has_valid_data, tile
+from stactools.chesapeake_lulc.validation import get_validator
+from tests import test_data
+
+
+class FootprintTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.href = test_data.get_path(
+            "data-files/Baywide_7class_20132014_E1300000_N1770000.tif")
+
+    def test_data_footprint(self) -> None:
+        bounds = shape(stac.create_item(self.href).geometry)
+        footprint = shape(data_footprint(self.href, 20))
+        with rasterio.open(self.href) as dataset:
+            mask = dataset.read_masks(1, out_shape=(1000, 1000))
+        valid_fraction = (mask > 0).mean()
+        self.assertTrue(bounds.buffer(1e-6).contains(footprint))
+        self.assertAlmostEqual(footprint.area / bounds.area,
+                               valid_fraction,
+                               delta=0.01)
+
+    def test_tolerance_bounds_vertices(self) -> None:
+        counts = [
+            len(shape(data_footprint(self.href, tolerance)).exterior.coords)
+            for tolerance in [1, 20, 100]
+        ]
+        self.assertEqual(counts, sorted(counts, reverse=True))
+        self.assertLess(counts[-1], counts[0])
+
+    def test_create_item_footprint(self) -> None:
+        item = stac.create_item(self.href, footprint_tolerance=20)
+        self.assertEqual(item.geometry, data_footprint(self.href, 20))
+        self.assertEqual(item.bbox, list(shape(item.geometry).bounds))
+        get_validator().validate(item)
+
+    def test_create_item_footprint_no_data(self) -> None:
+        with TemporaryDirectory() as tmp_dir:
+            outfiles = tile(self.href,
+                            tmp_dir,
+                            2500, (1300000, 1770000),
+                            engine=TileEngine.RASTERIO)
+            for outfile in outfiles:
+                with rasterio.open(outfile) as dataset:
+                    if not has_valid_data(dataset):
+                        break
+            self.assertIsNone(data_footprint(outfile, 20))
+            item = stac.create_item(outfile, footprint_tolerance=20)
+            self.assertEqual(item.geometry, stac.create_item(outfile).geometry)
@@ -0,0 +1,27 @@
+import unittest
+
+from stactools.chesapeake_lulc.fragments import (StacFragments,
+                                                 preload_fragments)
+
+
+class FragmentsTest(unittest.TestCase):
+
+    def test_invalid_collection_id(self) -> None:
+        with self.assertRaises(ValueError):
+            StacFragments("chesapeake-lc-8")
+
+    def test_get_asset_returns_copies(self) -> None:
+        preload_fragments()
+        fragments = StacFragments("chesapeake-lc-13")
+        asset = fragments.get_asset("https://example.com/a.tif")
+        self.assertEqual(asset.href, "https://example.com/a.tif")
+        asset.extra_fields["classification:classes"].clear()
+        other = fragments.get_asset("https://example.com/b.tif")
+        self.assertEqual(other.href, "https://example.com/b.tif")
+        self.assertEqual(len(other.extra_fields["classification:classes"]), 13)
+
+    def test_get_collection_returns_copies(self) -> None:
+        fragments = StacFragments("chesapeake-lu")
+        collection = fragments.get_collection()
+        collection["keywords"].clear()
+        self.assertNotEqual(fragments.get_collection()["keywords"], [])
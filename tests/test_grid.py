@@ -0,0 +1,121 @@
+import json
+import os
+import unittest
+from tempfile import TemporaryDirectory
+
+from shapely import wkb
+from shapely.geometry import box, shape
+
+from stactools.chesapeake_lulc.constants import TileEngine
+from stactools.chesapeake_lulc.grid import TileIndex
+from stactools.chesapeake_lulc.utils import tile, tile_index
+from tests import test_data
+
+try:
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+
+class GridTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.infile = test_data.get_path(
+            "data-files/Baywide_7class_20132014_E1300000_N1770000.tif")
+
+    def test_create(self) -> None:
+        index = TileIndex.create(0, 0, 2500, 1000, 1000)
+        self.assertEqual(len(index), 3)
+        self.assertEqual(index.cols.tolist(), [0, 1, 2])
+        self.assertEqual(index.rows.tolist(), [0, 0, 0])
+        self.assertEqual(index.bounds[-1].tolist(), [2000, 0, 2500, 1000])
+
+        index = TileIndex.create(0, 0, 2000, 2000, 1000)
+        self.assertEqual(list(zip(index.cols.tolist(), index.rows.tolist())),
+                         [(0, 0), (0, 1), (1, 0), (1, 1)])
+
+    def test_create_no_drift(self) -> None:
+        index = TileIndex.create(0, 0, 1000, 0.1, 0.1)
+        self.assertEqual(len(index), 10000)
+        self.assertEqual(index.bounds[-1, 0], 9999 * 0.1)
+
+    def test_create_bbox(self) -> None:
+        index = TileIndex.create(0,
+                                 0,
+                                 10000,
+                                 10000,
+                                 1000,
+                                 bbox=(1500, 1500, 3000, 2500))
+        self.assertEqual(list(zip(index.cols.tolist(), index.rows.tolist())),
+                         [(1, 1), (1, 2), (2, 1), (2, 2)])
+
+    def test_shard(self) -> None:
+        index = TileIndex.create(0, 0, 5000, 5000, 1000)
+        shards = [index.shard(i, 3) for i in range(3)]
+        self.assertEqual([len(shard) for shard in shards], [9, 8, 8])
+        cells = sorted(
+            (col, row) for shard in shards
+            for col, row in zip(shard.cols.tolist(), shard.rows.tolist()))
+        self.assertEqual(cells,
+                         sorted(zip(index.cols.tolist(), index.rows.tolist())))
+        self.assertEqual(
+            index.shard(0, 1).bounds.tolist(), index.bounds.tolist())
+        for invalid in [(3, 3), (-1, 3), (0, 0)]:
+            with self.assertRaises(ValueError):
+                index.shard(*invalid)
+
+    def test_create_invalid_size(self) -> None:
+        with self.assertRaises(ValueError):
+            TileIndex.create(0, 0, 1000, 1000, 0)
+
+    def test_tile_index_matches_tile(self) -> None:
+        bbox = (1302000, 1772000, 1308000, 1778000)
+        index = tile_index(self.infile,
+                           2500, (1300000, 1770000),
+                           skip_nodata=True,
+                           bbox=bbox)
+        with TemporaryDirectory() as tmp_dir:
+            outfiles = tile(self.infile,
+                            tmp_dir,
+                            2500, (1300000, 1770000),
+                            engine=TileEngine.RASTERIO,
+                            skip_nodata=True,
+                            bbox=bbox)
+        names = [
+            f"E{int(left)}_N{int(bottom)}.tif"
+            for left, bottom in index.bounds[:, :2].tolist()
+        ]
+        self.assertGreater(len(names), 0)
+        self.assertEqual([name.split("_N1770000_")[1] for name in outfiles],
+                         names)
+
+    def test_to_geojson(self) -> None:
+        index = tile_index(self.infile, 5000, (1300000, 1770000))
+        with TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "index.geojson")
+            index.write(path)
+            with open(path) as file:
+                data = json.load(file)
+        self.assertEqual(len(data["features"]), 4)
+        feature = data["features"][0]
+        self.assertEqual(set(feature["properties"]),
+                         {"col", "row", "left", "bottom", "right", "top"})
+        lon, lat = shape(feature["geometry"]).centroid.coords[0]
+        self.assertTrue(-81 < lon < -80 and 38 < lat < 39)
+
+    @unittest.skipUnless(HAS_PYARROW, "pyarrow is not installed")
+    def test_to_geoparquet(self) -> None:
+        index = tile_index(self.infile, 5000, (1300000, 1770000))
+        with TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "index.parquet")
+            index.write(path)
+            table = pq.read_table(path)
+        self.assertEqual(table.num_rows, 4)
+        geo = json.loads(table.schema.metadata[b"geo"])
+        self.assertIn("crs", geo["columns"]["geometry"])
+        rows = table.to_pylist()
+        for row in rows:
+            self.assertTrue(
+                wkb.loads(row["geometry"]).equals(
+                    box(row["left"], row["bottom"], row["right"], row["top"])))
@@ -0,0 +1,87 @@
+import json
+import os
+import pstats
+import unittest
+from tempfile import TemporaryDirectory
+from typing import Callable, List
+
+from click import Command, Group
+from stactools.testing import CliTestCase
+
+from stactools.chesapeake_lulc.commands import create_chesapeake_lulc_command
+from stactools.chesapeake_lulc.instrumentation import (Metrics, Profiler,
+                                                       format_report, metrics)
+from tests import test_data
+
+
+class MetricsTest(unittest.TestCase):
+
+    def test_disabled(self) -> None:
+        recorder = Metrics()
+        with recorder.stage("read"):
+            pass
+        recorder.count("hit")
+        self.assertEqual(recorder.to_dict(), {"stages": {}, "counters": {}})
+
+    def test_stage(self) -> None:
+        recorder = Metrics()
+        recorder.enabled = True
+
+        @recorder.timed("double")
+        def double(value: int) -> int:
+            return value * 2
+
+        self.assertEqual(double(2), 4)
+        with self.assertRaises(ValueError):
+            with recorder.stage("double"):
+                raise ValueError()
+        recorder.count("hit")
+        recorder.count("hit", 2)
+        result = recorder.to_dict()
+        self.assertEqual(result["stages"]["double"]["calls"], 2)
+        self.assertEqual(result["counters"], {"hit": 3})
+        recorder.reset()
+        self.assertEqual(recorder.to_dict(), {"stages": {}, "counters": {}})
+
+    def test_profiler(self) -> None:
+        with TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "profile.prof")
+            profiler = Profiler(path, trace_memory=True)
+            profiler.start()
+            with metrics.stage("allocate"):
+                data = [bytearray(1024) for _ in range(100)]
+            report = profiler.stop()
+            stats = pstats.Stats(path)
+        del data
+        self.assertFalse(metrics.enabled)
+        self.assertGreater(stats.total_calls, 0)
+        self.assertEqual(report["stages"]["allocate"]["calls"], 1)
+        self.assertGreater(report["memory"]["peak_bytes"], 100 * 1024)
+        self.assertIn("allocate", format_report(report))
+
+
+class ProfileCommandTest(CliTestCase):
+
+    def create_subcommand_functions(self) -> List[Callable[[Group], Command]]:
+        return [create_chesapeake_lulc_command]
+
+    def test_metrics_out(self) -> None:
+        infile = test_data.get_path(
+            "data-files/Baywide_7class_20132014_E1300000_N1770000.tif")
+        with TemporaryDirectory() as tmp_dir:
+            metrics_path = os.path.join(tmp_dir, "metrics.json")
+            cmd = (f"chesapeake-lulc --metrics-out {metrics_path} create-item "
+                   f"{infile} {tmp_dir} --validate all")
+            result = self.run_command(cmd)
+            self.assertEqual(result.exit_code, 0, msg=result.output)
+            with open(metrics_path) as file:
+                report = json.load(file)
+        stages = report["stages"]
+        for name in [
+                "item.create", "metadata.read", "metadata.transform",
+                "validation", "write.item"
+        ]:
+            self.assertEqual(stages[name]["calls"], 1, msg=name)
+        self.assertGreaterEqual(report["elapsed_seconds"],
+                                stages["item.create"]["total_seconds"])
+        self.assertFalse(metrics.enabled)
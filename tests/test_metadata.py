@@ -0,0 +1,66 @@
+import os
+import re
+import threading
+import unittest
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from stactools.chesapeake_lulc.metadata import Metadata, ReadStats
+from tests import test_data
+
+
+class RangeRequestHandler(SimpleHTTPRequestHandler):
+    """Serves single byte ranges, which GDAL requires for /vsicurl."""
+
+    def do_GET(self) -> None:
+        match = re.match(r"bytes=(\d+)-(\d+)", self.headers.get("Range", ""))
+        if not match:
+            return super().do_GET()
+        path = self.translate_path(self.path)
+        size = os.path.getsize(path)
+        start, end = int(match.group(1)), min(int(match.group(2)), size - 1)
+        with open(path, "rb") as file:
+            file.seek(start)
+            data = file.read(end - start + 1)
+        self.send_response(206)
+        self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+class MetadataTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.path = test_data.get_path(
+            "data-files/Baywide_7class_20132014_E1300000_N1770000.tif")
+        handler = partial(RangeRequestHandler,
+                          directory=os.path.dirname(self.path))
+        self.server = ThreadingHTTPServer(("localhost", 0), handler)
+        thread = threading.Thread(target=self.server.serve_forever,
+                                  daemon=True)
+        thread.start()
+
+    def tearDown(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_read_stats_remote(self) -> None:
+        port = self.server.server_address[1]
+        href = f"http://localhost:{port}/{os.path.basename(self.path)}"
+        stats = ReadStats()
+        metadata = Metadata(href, read_stats=stats)
+        local = Metadata(self.path)
+        self.assertEqual(metadata.proj_properties, local.proj_properties)
+        self.assertGreaterEqual(stats.requests, 1)
+        self.assertGreater(stats.bytes, 0)
+        self.assertLess(stats.bytes, os.path.getsize(self.path) / 4)
+
+    def test_read_stats_local(self) -> None:
+        stats = ReadStats()
+        Metadata(self.path, read_stats=stats)
+        self.assertEqual(stats.requests, 0)
+        self.assertEqual(stats.bytes, 0)
@@ -1,9 +1,41 @@
+import subprocess
+import sys
 import unittest
 
 import stactools.chesapeake_lulc
 
+# Microseconds. The package import should not pull in rasterio, shapely,
+# pystac or pkg_resources, which together take hundreds of milliseconds.
+IMPORT_TIME_BUDGET = 50000
+HEAVY_MODULES = ["rasterio", "shapely", "pystac", "pkg_resources"]
+
 
 class TestModule(unittest.TestCase):
 
     def test_version(self):
         self.assertIsNotNone(stactools.chesapeake_lulc.__version__)
+
+    def test_lazy_attributes(self):
+        self.assertTrue(callable(stactools.chesapeake_lulc.create_item))
+        with self.assertRaises(AttributeError):
+            stactools.chesapeake_lulc.not_an_attribute
+
+    def test_import_time(self):
+        result = subprocess.run(
+            [
+                sys.executable, "-X", "importtime", "-c",
+                "import stactools.chesapeake_lulc"
+            ],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        cumulative = {}
+        for line in result.stderr.splitlines()[1:]:
+            _, times = line.split(":", 1)
+            _, total, name = times.split("|")
+            cumulative[name.strip()] = int(total)
+        for module in HEAVY_MODULES:
+            self.assertNotIn(module, cumulative)
+        self.assertLess(cumulative["stactools.chesapeake_lulc"],
+                        IMPORT_TIME_BUDGET)
@@ -0,0 +1,171 @@
+import json
+import os
+import subprocess
+import sys
+import unittest
+from tempfile import TemporaryDirectory
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+import rasterio
+from click import Command, Group
+from rasterio.features import geometry_mask
+from rasterio.warp import transform, transform_geom
+from rasterio.windows import Window
+from shapely.geometry import Polygon, mapping
+from stactools.testing import CliTestCase
+
+from stactools.chesapeake_lulc.commands import create_chesapeake_lulc_command
+from stactools.chesapeake_lulc.constants import CollectionId
+from stactools.chesapeake_lulc.query import TileQuery
+from stactools.chesapeake_lulc.streaming import tile_collection
+from tests import test_data
+
+INFILE = "data-files/Baywide_7class_20132014_E1300000_N1770000.tif"
+
+# Crosses the boundary between two 2500 m tiles, in ESRI:102039
+POLYGON = Polygon([(1308000.3, 1774500.6), (1309500.2, 1774700.9),
+                   (1309200.7, 1776000.1), (1308300.4, 1775600.8)])
+
+
+class QueryTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.tmp_dir = TemporaryDirectory()
+        cls.infile = test_data.get_path(INFILE)
+        tile_dir = os.path.join(cls.tmp_dir.name, "tiles")
+        os.mkdir(tile_dir)
+        cls.collection_path = os.path.join(cls.tmp_dir.name, "stac",
+                                           "collection.json")
+        tile_collection(cls.infile, tile_dir,
+                        os.path.dirname(cls.collection_path),
+                        CollectionId.LC7.value, 2500, (1300000, 1770000))
+
+        rng = np.random.default_rng(0)
+        with rasterio.open(cls.infile) as dataset:
+            rows = np.concatenate([
+                rng.integers(0, dataset.height, 50),
+                rng.integers(3072, 4096, 50)
+            ])
+            cols = np.concatenate([
+                rng.integers(0, dataset.width, 50),
+                rng.integers(8192, 9216, 50)
+            ])
+            data = dataset.read(1,
+                                window=Window(0, 0, dataset.width,
+                                              dataset.height))
+            cls.expected = [
+                None if value == dataset.nodata else int(value)
+                for value in data[rows, cols].tolist()
+            ]
+            xs, ys = rasterio.transform.xy(dataset.transform, rows, cols)
+            lons, lats = transform(dataset.crs, "EPSG:4326", xs, ys)
+        cls.points = list(zip(lons, lats))
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.tmp_dir.cleanup()
+
+    def test_classes_at(self) -> None:
+        self.assertGreater(len(set(self.expected)), 3)
+        with TileQuery.from_collection(self.collection_path) as tile_query:
+            self.assertEqual(len(tile_query.hrefs), 5)
+            self.assertEqual(tile_query.classes_at(self.points), self.expected)
+        with TileQuery.from_hrefs([self.infile]) as tile_query:
+            self.assertEqual(tile_query.classes_at(self.points), self.expected)
+
+    def test_classes_at_outside(self) -> None:
+        with TileQuery.from_collection(self.collection_path) as tile_query:
+            self.assertEqual(tile_query.classes_at([(0.0, 0.0)]), [None])
+            self.assertEqual(tile_query.classes_at([]), [])
+
+    def test_locate_without_grid_names(self) -> None:
+        with TileQuery.from_collection(self.collection_path) as tile_query:
+            unnamed = TileQuery(
+                [f"tile-{i}.tif" for i in range(len(tile_query.hrefs))],
+                tile_query.index.bounds, tile_query.crs)
+            lons, lats = zip(*self.points)
+            xs, ys = transform("EPSG:4326", tile_query.crs, lons, lats)
+            self.assertEqual(
+                unnamed.locate(np.array(xs), np.array(ys)).tolist(),
+                tile_query.locate(np.array(xs), np.array(ys)).tolist())
+
+    def test_from_collection_uses_fsspec(self) -> None:
+        # In a fresh interpreter, without importing the stac module
+        code = (
+            "import sys\n"
+            "from pystac import StacIO\n"
+            "from stactools.core.io import FsspecStacIO\n"
+            "from stactools.chesapeake_lulc.query import TileQuery\n"
+            f"TileQuery.from_collection({self.collection_path!r}).close()\n"
+            "assert isinstance(StacIO.default(), FsspecStacIO)\n"
+            "assert 'stactools.chesapeake_lulc.stac' not in sys.modules\n")
+        result = subprocess.run([sys.executable, "-c", code],
+                                capture_output=True,
+                                text=True)
+        self.assertEqual(result.returncode, 0, msg=result.stderr)
+
+    def test_max_open(self) -> None:
+        with TileQuery.from_collection(self.collection_path,
+                                       max_open=1) as tile_query:
+            self.assertEqual(tile_query.classes_at(self.points), self.expected)
+            self.assertEqual(len(tile_query._datasets), 1)
+
+    def test_class_counts(self) -> None:
+        geometry = transform_geom("ESRI:102039", "EPSG:4326", mapping(POLYGON))
+        with TileQuery.from_collection(self.collection_path) as tile_query:
+            counts = tile_query.class_counts(geometry)
+        self.assertEqual(counts, _expected_counts(self.infile, geometry))
+        self.assertGreater(len(counts), 1)
+
+
+class QueryCommandTest(CliTestCase):
+
+    def create_subcommand_functions(self) -> List[Callable[[Group], Command]]:
+        return [create_chesapeake_lulc_command]
+
+    def test_query(self) -> None:
+        infile = test_data.get_path(INFILE)
+        geometry = transform_geom("ESRI:102039", "EPSG:4326", mapping(POLYGON))
+        lon, lat = POLYGON.centroid.coords[0]
+        (lon, ), (lat, ) = transform("ESRI:102039", "EPSG:4326", [lon], [lat])
+        with TemporaryDirectory() as tmp_dir:
+            tile_dir = os.path.join(tmp_dir, "tiles")
+            os.mkdir(tile_dir)
+            collection_path = os.path.join(tmp_dir, "stac", "collection.json")
+            tile_collection(infile, tile_dir, os.path.dirname(collection_path),
+                            CollectionId.LC7.value, 2500, (1300000, 1770000))
+            geometry_path = os.path.join(tmp_dir, "geometry.json")
+            with open(geometry_path, "w") as file:
+                json.dump({"type": "Feature", "geometry": geometry}, file)
+            cmd = (f"chesapeake-lulc query {collection_path} "
+                   f"-p {lon} {lat} -g {geometry_path}")
+            result = self.run_command(cmd)
+            self.assertEqual(result.exit_code, 0, msg=result.output)
+            with TileQuery.from_hrefs([infile]) as tile_query:
+                value = tile_query.classes_at([(lon, lat)])[0]
+        output = json.loads(result.output.strip().splitlines()[-1])
+        self.assertEqual(output["points"], [{
+            "lon": lon,
+            "lat": lat,
+            "class": value
+        }])
+        self.assertEqual(
+            output["counts"], {
+                str(value): count
+                for value, count in _expected_counts(infile, geometry).items()
+            })
+
+
+def _expected_counts(href: str, geometry: Dict[str, Any]) -> Dict[int, int]:
+    with rasterio.open(href) as dataset:
+        source_geometry = transform_geom("EPSG:4326", dataset.crs, geometry)
+        inside = geometry_mask([source_geometry],
+                               dataset.shape,
+                               dataset.transform,
+                               invert=True)
+        data = dataset.read(1)
+        valid = inside & (dataset.read_masks(1) != 0)
+    values, counts = np.unique(data[valid], return_counts=True)
+    return dict(zip(values.tolist(), counts.tolist()))
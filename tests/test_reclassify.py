@@ -0,0 +1,102 @@
+import json
+import os
+import unittest
+from tempfile import TemporaryDirectory
+from typing import Callable, List
+
+import pystac
+import rasterio
+from click import Command, Group
+from rasterio.windows import Window
+from stactools.testing import CliTestCase
+
+from stactools.chesapeake_lulc.commands import create_chesapeake_lulc_command
+from stactools.chesapeake_lulc.constants import CollectionId, ValidationMode
+from stactools.chesapeake_lulc.reclassify import class_lut, output_name
+from stactools.chesapeake_lulc.streaming import reclassify_collection
+from tests import test_data
+
+LC13 = "data-files/Baywide_13Class_20132014_E1300000_N1770000.tif"
+LU = "data-files/BayWide_1m_LU_E1300000_N1770000.tif"
+
+
+class ReclassifyTest(unittest.TestCase):
+
+    def test_class_lut(self) -> None:
+        lut = class_lut(CollectionId.LC13.value, CollectionId.LC7.value)
+        self.assertEqual(lut[1:14].tolist(),
+                         [1, 3, 2, 2, 3, 4, 5, 5, 6, 2, 2, 2, 7])
+        self.assertEqual(lut[0], 15)
+        self.assertEqual(lut[255], 15)
+
+    def test_class_lut_unmapped(self) -> None:
+        with self.assertRaisesRegex(ValueError, "Forest"):
+            class_lut(CollectionId.LU.value, CollectionId.LC7.value)
+        mapping = {value: 1 for value in range(1, 18)}
+        lut = class_lut(CollectionId.LU.value, CollectionId.LC7.value, mapping)
+        self.assertEqual(lut[17], 1)
+        mapping[17] = 8
+        with self.assertRaises(ValueError):
+            class_lut(CollectionId.LU.value, CollectionId.LC7.value, mapping)
+
+    def test_output_name(self) -> None:
+        self.assertEqual(output_name(LC13, CollectionId.LC7.value),
+                         "Baywide_7class_20132014_E1300000_N1770000.tif")
+        self.assertEqual(output_name(LU, CollectionId.LC13.value),
+                         "BayWide_1m_13Class_E1300000_N1770000.tif")
+
+    def test_reclassify_collection(self) -> None:
+        infile = test_data.get_path(LC13)
+        lut = class_lut(CollectionId.LC13.value, CollectionId.LC7.value)
+        with TemporaryDirectory() as tmp_dir:
+            tile_dir = os.path.join(tmp_dir, "tiles")
+            os.mkdir(tile_dir)
+            outfiles = reclassify_collection([infile],
+                                             tile_dir,
+                                             os.path.join(tmp_dir, "stac"),
+                                             CollectionId.LC7.value,
+                                             validate=ValidationMode.ALL)
+            self.assertEqual(len(outfiles), 1)
+            window = Window(8192, 3072, 1024, 1024)
+            with rasterio.open(infile) as src, rasterio.open(
+                    outfiles[0]) as dst:
+                self.assertEqual(dst.nodata, 15)
+                self.assertEqual(dst.transform, src.transform)
+                self.assertEqual(dst.profile["blockxsize"], 512)
+                self.assertGreater(len(dst.overviews(1)), 0)
+                source = src.read(1, window=window)
+                self.assertGreater(len(set(source.ravel())), 2)
+                self.assertEqual(
+                    dst.read(1, window=window).tolist(), lut[source].tolist())
+            collection = pystac.read_file(
+                os.path.join(tmp_dir, "stac", "collection.json"))
+            item = next(collection.get_items())
+        self.assertEqual(collection.id, CollectionId.LC7.value)
+        self.assertEqual(item.id, "Baywide_7class_20132014_E1300000_N1770000")
+        self.assertEqual(
+            len(item.assets["data"].extra_fields["classification:classes"]), 7)
+
+
+class ReclassifyCommandTest(CliTestCase):
+
+    def create_subcommand_functions(self) -> List[Callable[[Group], Command]]:
+        return [create_chesapeake_lulc_command]
+
+    def test_reclassify_lut(self) -> None:
+        infile = test_data.get_path(LU)
+        with TemporaryDirectory() as tmp_dir:
+            lut_path = os.path.join(tmp_dir, "lut.json")
+            with open(lut_path, "w") as file:
+                json.dump({str(value): 1 for value in range(1, 18)}, file)
+            cmd = (f"chesapeake-lulc reclassify {infile} {tmp_dir} "
+                   f"{tmp_dir}/stac chesapeake-lc-7 --lut {lut_path}")
+            result = self.run_command(cmd)
+            self.assertEqual(result.exit_code, 0, msg=result.output)
+            outfile = os.path.join(tmp_dir,
+                                   "BayWide_1m_7class_E1300000_N1770000.tif")
+            with rasterio.open(outfile) as dataset:
+                values = set(dataset.read(1, out_shape=(500, 500)).ravel())
+            self.assertTrue(
+                os.path.exists(os.path.join(tmp_dir, "stac",
+                                            "collection.json")))
+        self.assertEqual(values, {1, 15})
@@ -60,3 +60,21 @@ class StacTest(unittest.TestCase):
         collection.set_self_href("")
         self.assertEqual(collection.id, "chesapeake-lu")
         collection.validate()
+
+    def test_create_items(self) -> None:
+        hrefs = [
+            test_data.get_path(
+                "data-files/BayWide_1m_LU_E1300000_N1770000.tif"),
+            test_data.get_path("data-files/missing.tif"),
+            test_data.get_path(
+                "data-files/Baywide_7class_20132014_E1300000_N1770000.tif"),
+            test_data.get_path(
+                "data-files/Baywide_13Class_20132014_E1300000_N1770000.tif"),
+        ]
+        items, errors = stac.create_items(hrefs, workers=3)
+        self.assertEqual([item.id for item in items], [
+            "BayWide_1m_LU_E1300000_N1770000",
+            "Baywide_7class_20132014_E1300000_N1770000",
+            "Baywide_13Class_20132014_E1300000_N1770000",
+        ])
+        self.assertEqual(list(errors), [hrefs[1]])
@@ -0,0 +1,55 @@
+import unittest
+
+import numpy as np
+import rasterio
+
+from stactools.chesapeake_lulc import stac
+from stactools.chesapeake_lulc.constants import StatisticsMode
+from stactools.chesapeake_lulc.statistics import (class_statistics,
+                                                  count_classes)
+from stactools.chesapeake_lulc.validation import get_validator
+from tests import test_data
+
+
+class StatisticsTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.href = test_data.get_path(
+            "data-files/Baywide_7class_20132014_E1300000_N1770000.tif")
+        with rasterio.open(self.href) as dataset:
+            data = dataset.read(1)
+            self.expected = np.bincount(data[dataset.read_masks(1) != 0],
+                                        minlength=16)
+
+    def test_count_classes(self) -> None:
+        with rasterio.open(self.href) as dataset:
+            counts = count_classes(dataset)
+        self.assertEqual(counts.tolist(), self.expected.tolist())
+
+    def test_class_statistics(self) -> None:
+        statistics, histogram = class_statistics(self.href, list(range(1, 8)))
+        self.assertEqual(histogram.buckets, self.expected[1:8].tolist())
+        self.assertEqual(histogram.count, 7)
+        self.assertEqual((histogram.min, histogram.max), (0.5, 7.5))
+        self.assertEqual(statistics.minimum, 1)
+        self.assertEqual(statistics.maximum, 6)
+        self.assertAlmostEqual(statistics.valid_percent,
+                               100 * self.expected.sum() / 10000**2)
+
+    def test_class_statistics_approximate(self) -> None:
+        _, histogram = class_statistics(self.href,
+                                        list(range(1, 8)),
+                                        approximate=True)
+        for count, expected in zip(histogram.buckets, self.expected[1:8]):
+            self.assertAlmostEqual(count, expected, delta=0.05 * expected)
+
+    def test_create_item_statistics(self) -> None:
+        item = stac.create_item(self.href, statistics=StatisticsMode.EXACT)
+        band = item.assets["data"].extra_fields["raster:bands"][0]
+        self.assertEqual(band["histogram"]["buckets"],
+                         self.expected[1:8].tolist())
+        self.assertIn("valid_percent", band["statistics"])
+        get_validator().validate(item)
+        item = stac.create_item(self.href)
+        band = item.assets["data"].extra_fields["raster:bands"][0]
+        self.assertNotIn("histogram", band)
@@ -0,0 +1,211 @@
+import gc
+import json
+import os
+import weakref
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+import pystac
+from pystac import CatalogType
+
+from stactools.chesapeake_lulc import stac
+from stactools.chesapeake_lulc.constants import TileEngine
+from stactools.chesapeake_lulc.streaming import (StreamingCollectionWriter,
+                                                 merge_collections,
+                                                 tile_collection,
+                                                 write_collection)
+from stactools.chesapeake_lulc.update import update_collection
+from stactools.chesapeake_lulc.utils import tile
+from tests import test_data
+
+ITEM_ID = "Baywide_13Class_20132014_E1300000_N1770000"
+
+
+class StreamingTest(TestCase):
+
+    def setUp(self) -> None:
+        self.href = test_data.get_path(f"data-files/{ITEM_ID}.tif")
+
+    def test_matches_collection_save(self) -> None:
+        with TemporaryDirectory() as tmp_dir:
+            streamed_dir = os.path.join(tmp_dir, "streamed")
+            errors = write_collection("chesapeake-lc-13", [self.href],
+                                      streamed_dir)
+            self.assertEqual(errors, {})
+
+            saved_dir = os.path.join(tmp_dir, "saved")
+            collection = stac.create_collection("chesapeake-lc-13")
+            collection.set_self_href(os.path.join(saved_dir,
+                                                  "collection.json"))
+            collection.catalog_type = CatalogType.SELF_CONTAINED
+            item = stac.create_item(self.href)
+            collection.add_item(item)
+            stac.set_extent_from_items(collection, [item])
+            collection.make_all_asset_hrefs_relative()
+            collection.save()
+
+            for path in [
+                    "collection.json",
+                    os.path.join(ITEM_ID, f"{ITEM_ID}.json"),
+            ]:
+                with open(os.path.join(streamed_dir, path)) as file:
+                    streamed = json.load(file)
+                with open(os.path.join(saved_dir, path)) as file:
+                    saved = json.load(file)
+                streamed.get("properties", {}).pop("created", None)
+                saved.get("properties", {}).pop("created", None)
+                self.assertEqual(streamed, saved)
+
+            collection = pystac.read_file(
+                os.path.join(streamed_dir, "collection.json"))
+            self.assertEqual([item.id for item in collection.get_items()],
+                             [ITEM_ID])
+
+    def test_extent(self) -> None:
+        with TemporaryDirectory() as tmp_dir:
+            write_collection("chesapeake-lc-13", [self.href], tmp_dir)
+            collection_path = os.path.join(tmp_dir, "collection.json")
+            with open(collection_path) as file:
+                streamed = json.load(file)["extent"]
+            update_collection(collection_path, [self.href])
+            with open(collection_path) as file:
+                updated = json.load(file)["extent"]
+        item = stac.create_item(self.href)
+        self.assertEqual(streamed["spatial"]["bbox"], [item.bbox])
+        self.assertEqual(streamed["temporal"]["interval"],
+                         [["2013-01-01T00:00:00Z", "2014-12-31T23:59:59Z"]])
+        self.assertEqual(updated, streamed)
+
+    def test_errors(self) -> None:
+        with TemporaryDirectory() as tmp_dir:
+            missing = os.path.join(tmp_dir, "missing_13class.tif")
+            errors = write_collection("chesapeake-lc-13", [missing, self.href],
+                                      tmp_dir,
+                                      workers=2)
+            self.assertEqual(list(errors), [missing])
+            self.assertTrue(
+                os.path.exists(os.path.join(tmp_dir, "collection.json")))
+
+    def test_items_released(self) -> None:
+        item = stac.create_item(self.href)
+        with TemporaryDirectory() as tmp_dir:
+            with StreamingCollectionWriter("chesapeake-lc-13",
+                                           tmp_dir) as writer:
+                references = []
+                for index in range(3):
+                    copy = item.clone()
+                    copy.id = f"{ITEM_ID}_{index}"
+                    writer.add_item(copy)
+                    references.append(weakref.ref(copy))
+                del copy
+                gc.collect()
+                self.assertEqual([ref() for ref in references],
+                                 [None] * len(references))
+            self.assertEqual(len(writer.collection.get_item_links()), 3)
+
+    def test_no_collection_after_failure(self) -> None:
+        with TemporaryDirectory() as tmp_dir:
+            with self.assertRaises(RuntimeError):
+                with StreamingCollectionWriter("chesapeake-lc-13",
+                                               tmp_dir) as writer:
+                    writer.add_item(stac.create_item(self.href))
+                    raise RuntimeError("interrupted")
+            self.assertTrue(
+                os.path.exists(
+                    os.path.join(tmp_dir, ITEM_ID, f"{ITEM_ID}.json")))
+            self.assertFalse(
+                os.path.exists(os.path.join(tmp_dir, "collection.json")))
+
+    def test_tile_collection(self) -> None:
+        with TemporaryDirectory() as tmp_dir:
+            tile_dir = os.path.join(tmp_dir, "tiles")
+            os.mkdir(tile_dir)
+            outdir = os.path.join(tmp_dir, "collection")
+            outfiles = tile_collection(self.href,
+                                       tile_dir,
+                                       outdir,
+                                       "chesapeake-lc-13",
+                                       2500, (1300000, 1770000),
+                                       workers=2)
+            expected_dir = os.path.join(tmp_dir, "expected")
+            os.mkdir(expected_dir)
+            expected = tile(self.href,
+                            expected_dir,
+                            2500, (1300000, 1770000),
+                            engine=TileEngine.RASTERIO,
+                            skip_nodata=True)
+            self.assertEqual([os.path.basename(f) for f in outfiles],
+                             [os.path.basename(f) for f in expected])
+
+            collection = pystac.read_file(
+                os.path.join(outdir, "collection.json"))
+            items = list(collection.get_items())
+            self.assertEqual(
+                [item.id for item in items],
+                [os.path.splitext(os.path.basename(f))[0] for f in outfiles])
+            for item, outfile in zip(items, outfiles):
+                read_back = json.loads(
+                    json.dumps(stac.create_item(outfile).to_dict()))
+                self.assertEqual(item.geometry, read_back["geometry"])
+                self.assertEqual(item.bbox, read_back["bbox"])
+                self.assertEqual(item.properties["proj:shape"],
+                                 read_back["properties"]["proj:shape"])
+                self.assertEqual(item.properties["proj:transform"],
+                                 read_back["properties"]["proj:transform"])
+                self.assertEqual(item.assets["data"].get_absolute_href(),
+                                 outfile)
+
+    def test_merge_collections(self) -> None:
+        with TemporaryDirectory() as tmp_dir:
+            tile_dir = os.path.join(tmp_dir, "tiles")
+            os.mkdir(tile_dir)
+            paths = []
+            outfiles = []
+            for index in range(2):
+                outdir = os.path.join(tmp_dir, f"shard-{index}")
+                outfiles.extend(
+                    tile_collection(self.href,
+                                    tile_dir,
+                                    outdir,
+                                    "chesapeake-lc-13",
+                                    2500, (1300000, 1770000),
+                                    shard=(index, 2)))
+                paths.append(os.path.join(outdir, "collection.json"))
+            self.assertEqual(len(outfiles), 5)
+
+            merged_dir = os.path.join(tmp_dir, "merged")
+            item_ids = merge_collections(paths, merged_dir)
+            collection = pystac.read_file(
+                os.path.join(merged_dir, "collection.json"))
+            items = list(collection.get_items())
+            self.assertEqual(
+                sorted(item_ids),
+                sorted(
+                    os.path.splitext(os.path.basename(f))[0]
+                    for f in outfiles))
+            self.assertEqual([item.id for item in items], item_ids)
+            self.assertEqual(
+                sorted(item.assets["data"].get_absolute_href()
+                       for item in items), sorted(outfiles))
+            self.assertTrue(
+                all(item.get_self_href().startswith(merged_dir)
+                    for item in items))
+            bbox = collection.extent.spatial.bboxes[0]
+            self.assertEqual(bbox[0], min(item.bbox[0] for item in items))
+            self.assertEqual(bbox[1], min(item.bbox[1] for item in items))
+            self.assertEqual(bbox[2], max(item.bbox[2] for item in items))
+            self.assertEqual(bbox[3], max(item.bbox[3] for item in items))
+            start, end = collection.extent.temporal.intervals[0]
+            self.assertEqual(start, items[0].common_metadata.start_datetime)
+            self.assertEqual(end, items[0].common_metadata.end_datetime)
+
+            with self.assertRaisesRegex(ValueError, "more than one"):
+                merge_collections([paths[0], paths[0]],
+                                  os.path.join(tmp_dir, "duplicate"))
+            other_dir = os.path.join(tmp_dir, "other")
+            write_collection("chesapeake-lc-7", [], other_dir)
+            with self.assertRaisesRegex(ValueError, "one id"):
+                merge_collections(
+                    [paths[0],
+                     os.path.join(other_dir, "collection.json")],
+                    os.path.join(tmp_dir, "mixed"))
@@ -0,0 +1,124 @@
+import json
+import os
+import shutil
+import time
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+import fsspec
+import pystac
+from pystac import CatalogType
+
+from stactools.chesapeake_lulc import stac
+from stactools.chesapeake_lulc.update import update_collection
+from tests import test_data
+
+
+class UpdateCollectionTest(TestCase):
+
+    def setUp(self) -> None:
+        self.tmp_dir = TemporaryDirectory()
+        source = test_data.get_path(
+            "data-files/Baywide_7class_20132014_E1300000_N1770000.tif")
+        self.hrefs = {}
+        for name in ["a", "b", "c", "d"]:
+            href = os.path.join(self.tmp_dir.name,
+                                f"Baywide_7class_20132014_{name}.tif")
+            shutil.copy(source, href)
+            self.hrefs[name] = href
+        self.outdir = os.path.join(self.tmp_dir.name, "collection")
+        self.collection_path = os.path.join(self.outdir, "collection.json")
+
+        collection = stac.create_collection("chesapeake-lc-7")
+        collection.set_self_href(self.collection_path)
+        collection.catalog_type = CatalogType.SELF_CONTAINED
+        items, _ = stac.create_items(
+            [self.hrefs["a"], self.hrefs["b"], self.hrefs["d"]])
+        for item in items:
+            collection.add_item(item)
+        collection.make_all_asset_hrefs_relative()
+        collection.save()
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def item_path(self, name: str) -> str:
+        item_id = f"Baywide_7class_20132014_{name}"
+        return os.path.join(self.outdir, item_id, f"{item_id}.json")
+
+    def test_update_collection(self) -> None:
+        later = time.time() + 10
+        os.utime(self.hrefs["a"], (later, later))
+        unchanged_mtime = os.stat(self.item_path("d")).st_mtime_ns
+
+        update = update_collection(
+            self.collection_path,
+            [self.hrefs["a"], self.hrefs["c"], self.hrefs["d"]])
+
+        self.assertEqual(update.added, ["Baywide_7class_20132014_c"])
+        self.assertEqual(update.updated, ["Baywide_7class_20132014_a"])
+        self.assertEqual(update.removed, ["Baywide_7class_20132014_b"])
+        self.assertEqual(update.unchanged, ["Baywide_7class_20132014_d"])
+        self.assertFalse(os.path.exists(self.item_path("b")))
+        self.assertTrue(os.path.exists(self.item_path("c")))
+        self.assertEqual(
+            os.stat(self.item_path("d")).st_mtime_ns, unchanged_mtime)
+
+        collection = pystac.read_file(self.collection_path)
+        self.assertEqual(sorted(item.id for item in collection.get_items()), [
+            "Baywide_7class_20132014_a", "Baywide_7class_20132014_c",
+            "Baywide_7class_20132014_d"
+        ])
+        with open(self.item_path("c")) as file:
+            item_dict = json.load(file)
+        self.assertEqual(item_dict["assets"]["data"]["href"],
+                         "../../Baywide_7class_20132014_c.tif")
+        self.assertNotIn("self", [link["rel"] for link in item_dict["links"]])
+        self.assertEqual(collection.extent.spatial.bboxes, [item_dict["bbox"]])
+        start, end = collection.extent.temporal.intervals[0]
+        self.assertEqual(start.isoformat(), "2013-01-01T00:00:00+00:00")
+        self.assertEqual(end.isoformat(), "2014-12-31T23:59:59+00:00")
+
+    def test_failed_update_keeps_item(self) -> None:
+        with open(self.hrefs["a"], "w") as file:
+            file.write("not a COG")
+        later = time.time() + 10
+        os.utime(self.hrefs["a"], (later, later))
+        update = update_collection(self.collection_path,
+                                   [self.hrefs["a"], self.hrefs["d"]])
+        self.assertEqual(list(update.errors), [self.hrefs["a"]])
+        self.assertEqual(update.updated, [])
+        self.assertTrue(os.path.exists(self.item_path("a")))
+        collection = pystac.read_file(self.collection_path)
+        self.assertIn("Baywide_7class_20132014_a",
+                      [item.id for item in collection.get_items()])
+
+    def test_duplicate_hrefs(self) -> None:
+        update = update_collection(self.collection_path, [
+            self.hrefs["a"], self.hrefs["c"], self.hrefs["d"], self.hrefs["c"]
+        ])
+        self.assertEqual(update.added, ["Baywide_7class_20132014_c"])
+        self.assertEqual(update.errors, {})
+        collection = pystac.read_file(self.collection_path)
+        self.assertEqual([
+            link.href for link in collection.get_item_links()
+        ].count("./Baywide_7class_20132014_c/Baywide_7class_20132014_c.json"),
+                         1)
+
+    def test_remote_collection(self) -> None:
+        fs = fsspec.filesystem("memory")
+        fs.put(self.outdir, "/update-test", recursive=True)
+        try:
+            update = update_collection("memory://update-test/collection.json",
+                                       [self.hrefs["a"], self.hrefs["d"]])
+            self.assertEqual(update.removed, ["Baywide_7class_20132014_b"])
+            self.assertFalse(
+                fs.exists("/update-test/Baywide_7class_20132014_b/"
+                          "Baywide_7class_20132014_b.json"))
+            collection = pystac.read_file(
+                "memory://update-test/collection.json")
+            self.assertEqual(
+                sorted(item.id for item in collection.get_items()),
+                ["Baywide_7class_20132014_a", "Baywide_7class_20132014_d"])
+        finally:
+            fs.rm("/update-test", recursive=True)
@@ -0,0 +1,448 @@
+import json
+import os
+import shutil
+import unittest
+from tempfile import TemporaryDirectory
+from typing import Optional
+
+import numpy as np
+import rasterio
+from affine import Affine
+from rasterio.enums import Resampling
+from rasterio.windows import Window
+
+from stactools.chesapeake_lulc.constants import TILE_JOURNAL, TileEngine
+from stactools.chesapeake_lulc.utils import (atomic_output, create_tiles,
+                                             has_valid_data, imap,
+                                             journal_name, parse_shard,
+                                             remove_nodata, shard_items, tile,
+                                             tile_index)
+from tests import test_data
+
+HAS_GDAL_TRANSLATE = shutil.which("gdal_translate") is not None
+
+
+class UtilsTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.infile = test_data.get_path(
+            "data-files/Baywide_7class_20132014_E1300000_N1770000.tif")
+
+    def test_create_tiles(self) -> None:
+        tiles = create_tiles(0, 0, 25, 15, 10)
+        self.assertEqual(len(tiles), 6)
+        self.assertEqual(
+            [tile.outfile("a.tif", "") for tile in tiles[:2]],
+            ["a_E0_N0.tif", "a_E0_N10.tif"],
+        )
+
+    def test_create_tiles_with_dataset(self) -> None:
+        with rasterio.open(self.infile) as dataset:
+            _, _, right, top = dataset.bounds
+            tiles = create_tiles(1300000, 1770000, right, top, 1000)
+            valid_tiles = create_tiles(1300000,
+                                       1770000,
+                                       right,
+                                       top,
+                                       1000,
+                                       dataset=dataset)
+            self.assertEqual(len(tiles), 110)
+            self.assertEqual(len(valid_tiles), 17)
+            valid_names = [cell.outfile("", "") for cell in valid_tiles]
+            for cell in tiles:
+                self.assertEqual(
+                    cell.outfile("", "") in valid_names,
+                    cell.has_data(dataset),
+                )
+
+    def test_tile_invalid_workers(self) -> None:
+        with TemporaryDirectory() as tmp_dir:
+            with self.assertRaises(ValueError):
+                tile(self.infile, tmp_dir, 5000, (1300000, 1770000), workers=0)
+
+    @unittest.skipUnless(HAS_GDAL_TRANSLATE, "gdal_translate is not available")
+    def test_tile_workers(self) -> None:
+        with TemporaryDirectory() as tmp_dir:
+            serial_dir = os.path.join(tmp_dir, "serial")
+            parallel_dir = os.path.join(tmp_dir, "parallel")
+            os.mkdir(serial_dir)
+            os.mkdir(parallel_dir)
+            serial = tile(self.infile, serial_dir, 5000, (1300000, 1770000))
+            parallel = tile(self.infile,
+                            parallel_dir,
+                            5000, (1300000, 1770000),
+                            workers=4)
+            self.assertEqual([os.path.basename(path) for path in serial],
+                             [os.path.basename(path) for path in parallel])
+            for path in parallel:
+                self.assertTrue(os.path.exists(path))
+
+    @unittest.skipUnless(HAS_GDAL_TRANSLATE, "gdal_translate is not available")
+    def test_tile_failure(self) -> None:
+        with TemporaryDirectory() as tmp_dir:
+            outdir = os.path.join(tmp_dir, "does-not-exist")
+            with self.assertRaises(RuntimeError):
+                tile(self.infile, outdir, 5000, (1300000, 1770000), workers=2)
+
+    def test_tile_rasterio_engine(self) -> None:
+        infile = test_data.get_path(
+            "data-files/BayWide_1m_LU_E1300000_N1770000.tif")
+        with TemporaryDirectory() as tmp_dir:
+            outfiles = tile(infile,
+                            tmp_dir,
+                            6000, (1300000, 1770000),
+                            workers=2,
+                            engine=TileEngine.RASTERIO)
+            self.assertEqual(len(outfiles), 4)
+            with rasterio.open(infile) as src, rasterio.open(
+                    outfiles[0]) as dst:
+                self.assertEqual(dst.profile["compress"], "deflate")
+                self.assertEqual(dst.block_shapes, [(512, 512)])
+                self.assertEqual(dst.nodata, src.nodata)
+                self.assertEqual(dst.colormap(1), src.colormap(1))
+                window = src.window(*dst.bounds).round_offsets()
+                expected = src.read(1, window=window.round_lengths())
+                self.assertTrue((dst.read(1) == expected).all())
+
+    def test_tile_skip_nodata(self) -> None:
+        with TemporaryDirectory() as tmp_dir:
+            outfiles = tile(self.infile,
+                            tmp_dir,
+                            2500, (1300000, 1770000),
+                            engine=TileEngine.RASTERIO,
+                            skip_nodata=True)
+            self.assertEqual(len(outfiles), 5)
+            for outfile in outfiles:
+                with rasterio.open(outfile) as dataset:
+                    self.assertTrue(dataset.read_masks(1).any())
+
+    def test_tile_shards(self) -> None:
+        with TemporaryDirectory() as tmp_dir:
+            expected = tile(self.infile,
+                            tmp_dir,
+                            2500, (1300000, 1770000),
+                            engine=TileEngine.RASTERIO,
+                            skip_nodata=True)
+            shards = []
+            for index in range(2):
+                shard_dir = os.path.join(tmp_dir, str(index))
+                os.mkdir(shard_dir)
+                shards.append(
+                    tile(self.infile,
+                         shard_dir,
+                         2500, (1300000, 1770000),
+                         engine=TileEngine.RASTERIO,
+                         skip_nodata=True,
+                         shard=(index, 2)))
+        self.assertTrue(all(shards))
+        self.assertEqual(
+            sorted(
+                os.path.basename(f) for outfiles in shards for f in outfiles),
+            sorted(os.path.basename(f) for f in expected))
+
+    def test_tile_shards_share_outdir(self) -> None:
+        with TemporaryDirectory() as tmp_dir:
+            outfiles = [
+                tile(self.infile,
+                     tmp_dir,
+                     2500, (1300000, 1770000),
+                     engine=TileEngine.RASTERIO,
+                     skip_nodata=True,
+                     shard=(index, 2)) for index in range(2)
+            ]
+            resumed = tile(self.infile,
+                           tmp_dir,
+                           2500, (1300000, 1770000),
+                           engine=TileEngine.RASTERIO,
+                           skip_nodata=True,
+                           resume=True,
+                           shard=(0, 2))
+            names = os.listdir(tmp_dir)
+        self.assertEqual(resumed, outfiles[0])
+        self.assertEqual(journal_name((0, 2)), "tile-journal-0-of-2.jsonl")
+        self.assertIn(journal_name((0, 2)), names)
+        self.assertIn(journal_name((1, 2)), names)
+        self.assertNotIn(TILE_JOURNAL, names)
+
+    def test_atomic_output(self) -> None:
+        with TemporaryDirectory() as tmp_dir:
+            outfile = os.path.join(tmp_dir, "tile.tif")
+            with atomic_output(outfile) as partial:
+                self.assertEqual(os.path.dirname(partial), tmp_dir)
+                with open(partial, "w") as file:
+                    file.write("complete")
+                self.assertFalse(os.path.exists(outfile))
+            with open(outfile) as file:
+                self.assertEqual(file.read(), "complete")
+
+            with self.assertRaises(RuntimeError):
+                with atomic_output(outfile) as partial:
+                    with open(partial, "w") as file:
+                        file.write("partial")
+                    raise RuntimeError("interrupted")
+            with open(outfile) as file:
+                self.assertEqual(file.read(), "complete")
+            self.assertEqual(os.listdir(tmp_dir), ["tile.tif"])
+
+    def test_imap(self) -> None:
+        items = list(range(20))
+        for workers in [1, 4]:
+            self.assertEqual(list(imap(lambda x: x * 2, items, workers)),
+                             [x * 2 for x in items])
+
+        def fail(item: int) -> int:
+            if item == 3:
+                raise ValueError(item)
+            return item
+
+        with self.assertRaises(ValueError):
+            list(imap(fail, items, 2))
+
+    def test_shard_items(self) -> None:
+        items = list(range(10))
+        self.assertEqual(list(shard_items(items, (1, 3))), [1, 4, 7])
+        self.assertEqual(list(shard_items(iter(items), (2, 3))), [2, 5, 8])
+        self.assertEqual(list(shard_items(items)), items)
+        with self.assertRaises(ValueError):
+            list(shard_items(items, (3, 3)))
+
+    def test_parse_shard(self) -> None:
+        self.assertEqual(parse_shard("0/4"), (0, 4))
+        self.assertEqual(parse_shard("3/4"), (3, 4))
+        for invalid in ["4/4", "1", "a/4", "1/0", "1/2/3"]:
+            with self.assertRaises(ValueError, msg=invalid):
+                parse_shard(invalid)
+
+    def test_tile_resume(self) -> None:
+        with TemporaryDirectory() as tmp_dir:
+            outfiles = tile(self.infile,
+                            tmp_dir,
+                            5000, (1300000, 1770000),
+                            engine=TileEngine.RASTERIO)
+            self.assertEqual(len(outfiles), 4)
+            self.assertEqual(
+                sorted(os.listdir(tmp_dir)),
+                sorted([os.path.basename(f)
+                        for f in outfiles] + [TILE_JOURNAL]))
+
+            # Simulate a crash: one tile missing, one partially written and
+            # a truncated journal line.
+            os.remove(outfiles[1])
+            with open(outfiles[2], "r+b") as file:
+                file.truncate(1000)
+            journal = os.path.join(tmp_dir, TILE_JOURNAL)
+            with open(journal, "a") as file:
+                file.write('{"name": "trunc')
+            mtimes = {
+                f: os.stat(f).st_mtime_ns
+                for f in [outfiles[0], outfiles[3]]
+            }
+
+            resumed = tile(self.infile,
+                           tmp_dir,
+                           5000, (1300000, 1770000),
+                           engine=TileEngine.RASTERIO,
+                           resume=True)
+            self.assertEqual(resumed, outfiles)
+            self.assertEqual(
+                os.stat(outfiles[0]).st_mtime_ns, mtimes[outfiles[0]])
+            self.assertEqual(
+                os.stat(outfiles[3]).st_mtime_ns, mtimes[outfiles[3]])
+            for outfile in outfiles:
+                with rasterio.open(outfile) as dataset:
+                    dataset.read(1, out_shape=(10, 10))
+            with open(journal) as file:
+                records = [json.loads(line) for line in file]
+            self.assertEqual(records[0]["size"], 5000)
+            sizes = {record["name"]: record["size"] for record in records[1:]}
+            self.assertEqual(
+                sizes, {
+                    os.path.basename(outfile): os.path.getsize(outfile)
+                    for outfile in outfiles
+                })
+
+    def test_tile_resume_other_parameters(self) -> None:
+        with TemporaryDirectory() as tmp_dir:
+            tile(self.infile,
+                 tmp_dir,
+                 5000, (1300000, 1770000),
+                 engine=TileEngine.RASTERIO)
+            with self.assertRaises(ValueError):
+                tile(self.infile,
+                     tmp_dir,
+                     2500, (1300000, 1770000),
+                     engine=TileEngine.RASTERIO,
+                     resume=True)
+
+    def test_has_valid_data(self) -> None:
+        with rasterio.open(self.infile) as dataset:
+            self.assertTrue(has_valid_data(dataset))
+            self.assertTrue(has_valid_data(dataset, factor=64))
+            window = Window(0, 0, 1000, 1000)
+            self.assertFalse(has_valid_data(dataset, window))
+            self.assertFalse(has_valid_data(dataset, window, factor=4))
+            self.assertTrue(has_valid_data(dataset, window, nodata=0))
+
+    def test_has_valid_data_trusts_overview(self) -> None:
+        with TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "sparse.tif")
+            data = np.zeros((1, 1024, 1024), dtype="uint8")
+            data[0, 1, 1] = 1
+            with rasterio.open(path,
+                               "w",
+                               driver="GTiff",
+                               width=1024,
+                               height=1024,
+                               count=1,
+                               dtype="uint8",
+                               nodata=0,
+                               tiled=True,
+                               blockxsize=512,
+                               blockysize=512) as dataset:
+                dataset.write(data)
+                dataset.build_overviews([4], Resampling.nearest)
+            with rasterio.open(path) as dataset:
+                # The single valid pixel is not sampled by the overview.
+                self.assertFalse(has_valid_data(dataset, factor=4))
+                self.assertTrue(has_valid_data(dataset, factor=2))
+                self.assertTrue(has_valid_data(dataset, nodata=255, factor=4))
+                self.assertTrue(has_valid_data(dataset))
+
+    def test_remove_nodata(self) -> None:
+        with TemporaryDirectory() as tmp_dir:
+            outfiles = tile(self.infile,
+                            tmp_dir,
+                            2500, (1300000, 1770000),
+                            engine=TileEngine.RASTERIO)
+            nodata_dir = os.path.join(tmp_dir, "nodata_tifs")
+            remove_nodata(tmp_dir, nodata_dir)
+            self.assertEqual(len(outfiles), 16)
+            self.assertEqual(len(os.listdir(nodata_dir)), 11)
+            for outfile in outfiles:
+                with rasterio.open(
+                        outfile if os.path.exists(outfile) else os.path.
+                        join(nodata_dir, os.path.basename(outfile))) as src:
+                    self.assertEqual(os.path.exists(outfile),
+                                     bool((src.read(1) != src.nodata).any()))
+
+
+class MultiSourceTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.infile = test_data.get_path(
+            "data-files/Baywide_7class_20132014_E1300000_N1770000.tif")
+        self.tmp_dir = TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+
+    def write_source(self,
+                     name: str,
+                     window: Window,
+                     nodata: Optional[int] = None,
+                     shift: float = 0) -> str:
+        path = os.path.join(self.tmp_dir.name, f"{name}.tif")
+        with rasterio.open(self.infile) as src:
+            data = src.read(window=window)
+            profile = src.profile
+            if nodata is not None:
+                data[data == src.nodata] = nodata
+                profile.update(nodata=nodata)
+            profile.update(width=window.width,
+                           height=window.height,
+                           transform=src.window_transform(window),
+                           tiled=True,
+                           blockxsize=512,
+                           blockysize=512)
+            transform = profile["transform"]
+            profile.update(transform=Affine(
+                transform.a, transform.b, transform.c +
+                shift * transform.a, transform.d, transform.e, transform.f))
+            with rasterio.open(path, "w", **profile) as dst:
+                dst.write(data)
+        return path
+
+    def test_tile_sources_matches_mosaic(self) -> None:
+        west = self.write_source("Baywide_7class_west",
+                                 Window(0, 0, 6000, 10000))
+        east = self.write_source("Baywide_7class_east",
+                                 Window(5000, 0, 5000, 10000))
+        single_dir = os.path.join(self.tmp_dir.name, "single")
+        multi_dir = os.path.join(self.tmp_dir.name, "multi")
+        os.mkdir(single_dir)
+        os.mkdir(multi_dir)
+        single = tile(self.infile,
+                      single_dir,
+                      2500, (1300000, 1770000),
+                      engine=TileEngine.RASTERIO)
+        multi = tile([west, east],
+                     multi_dir,
+                     2500, (1300000, 1770000),
+                     workers=2,
+                     engine=TileEngine.RASTERIO)
+        self.assertEqual(len(multi), 16)
+        self.assertTrue(
+            all(
+                os.path.basename(path).startswith("Baywide_7class_west_")
+                for path in multi))
+        for single_path, multi_path in zip(single, multi):
+            with rasterio.open(single_path) as expected, rasterio.open(
+                    multi_path) as actual:
+                self.assertEqual(actual.transform, expected.transform)
+                self.assertTrue((actual.read() == expected.read()).all())
+
+    def test_tile_sources_uses_each_source_mask(self) -> None:
+        west = self.write_source("Baywide_7class_west",
+                                 Window(0, 0, 6000, 10000))
+        east = self.write_source("Baywide_7class_east",
+                                 Window(5000, 0, 5000, 10000),
+                                 nodata=255)
+        single_dir = os.path.join(self.tmp_dir.name, "single")
+        multi_dir = os.path.join(self.tmp_dir.name, "multi")
+        os.mkdir(single_dir)
+        os.mkdir(multi_dir)
+        single = tile(self.infile,
+                      single_dir,
+                      2500, (1300000, 1770000),
+                      engine=TileEngine.RASTERIO)
+        multi = tile([west, east],
+                     multi_dir,
+                     2500, (1300000, 1770000),
+                     engine=TileEngine.RASTERIO)
+        self.assertEqual(len(multi), len(single))
+        for single_path, multi_path in zip(single, multi):
+            with rasterio.open(single_path) as expected, rasterio.open(
+                    multi_path) as actual:
+                valid = expected.read_masks(1) > 0
+                self.assertTrue(np.array_equal(
+                    actual.read_masks(1) > 0, valid))
+                self.assertTrue(
+                    np.array_equal(
+                        actual.read(1)[valid],
+                        expected.read(1)[valid]))
+
+    def test_tile_sources_requires_aligned_grids(self) -> None:
+        west = self.write_source("west", Window(0, 0, 5000, 10000))
+        east = self.write_source("east",
+                                 Window(5000, 0, 5000, 10000),
+                                 shift=0.5)
+        with self.assertRaisesRegex(ValueError, "not aligned"):
+            tile([west, east],
+                 self.tmp_dir.name,
+                 2500, (1300000, 1770000),
+                 engine=TileEngine.RASTERIO)
+
+    def test_tile_sources_skips_untouched_cells(self) -> None:
+        west = self.write_source("west", Window(0, 0, 5000, 10000))
+        corner = self.write_source("corner", Window(7500, 0, 2500, 2500))
+        outfiles = tile([west, corner],
+                        self.tmp_dir.name,
+                        2500, (1300000, 1770000),
+                        engine=TileEngine.RASTERIO)
+        self.assertEqual(len(outfiles), 9)
+        self.assertEqual(
+            len(tile_index([west, corner], 2500, (1300000, 1770000))), 9)
+
+    def test_tile_sources_requires_rasterio_engine(self) -> None:
+        west = self.write_source("west", Window(0, 0, 5000, 10000))
+        east = self.write_source("east", Window(5000, 0, 5000, 10000))
+        with self.assertRaises(ValueError):
+            tile([west, east], self.tmp_dir.name, 2500, (1300000, 1770000))
@@ -0,0 +1,73 @@
+import unittest
+
+from pystac import STACValidationError
+
+from stactools.chesapeake_lulc import constants, stac
+from stactools.chesapeake_lulc.constants import CollectionId, ValidationMode
+from stactools.chesapeake_lulc.validation import (get_validator, in_sample,
+                                                  validate_collection,
+                                                  validate_items)
+from tests import test_data
+
+HREFS = [
+    "data-files/Baywide_7class_20132014_E1300000_N1770000.tif",
+    "data-files/Baywide_13Class_20132014_E1300000_N1770000.tif",
+    "data-files/BayWide_1m_LU_E1300000_N1770000.tif",
+]
+
+
+class ValidationTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.items = [
+            stac.create_item(test_data.get_path(href)) for href in HREFS
+        ]
+
+    def test_validate_items(self) -> None:
+        for item in self.items:
+            get_validator().validate(item)
+        for collection_id in CollectionId:
+            collection = stac.create_collection(collection_id.value)
+            collection.set_self_href("collection.json")
+            get_validator().validate(collection)
+
+    def test_validate_invalid_item(self) -> None:
+        item = self.items[0]
+        item.assets["data"].extra_fields["raster:bands"][0]["sampling"] = "x"
+        with self.assertRaisesRegex(STACValidationError, "raster"):
+            get_validator().validate(item)
+
+    def test_validators_compiled_once(self) -> None:
+        validator = get_validator()
+        validator.validate(self.items[0])
+        self.assertIs(validator._validator(constants.CLASSIFICATION_SCHEMA),
+                      validator._validator(constants.CLASSIFICATION_SCHEMA))
+
+    def test_validate_items_modes(self) -> None:
+        items = [self.items[0].clone() for _ in range(150)]
+        items[1].properties["proj:shape"] = [1]
+        validate_items(items, ValidationMode.NONE)
+        validate_items(items, ValidationMode.SAMPLE)
+        with self.assertRaises(STACValidationError):
+            validate_items(items, ValidationMode.ALL)
+        with self.assertRaises(STACValidationError):
+            validate_items(items, ValidationMode.ALL, workers=2)
+
+    def test_in_sample(self) -> None:
+        sampled = [
+            index for index in range(250)
+            if in_sample(index, ValidationMode.SAMPLE)
+        ]
+        self.assertEqual(sampled, [0, 100, 200])
+        self.assertFalse(in_sample(0, ValidationMode.NONE))
+        self.assertTrue(in_sample(1, ValidationMode.ALL))
+
+    def test_validate_collection(self) -> None:
+        collection = stac.create_collection("chesapeake-lc-7")
+        collection.set_self_href("collection.json")
+        collection.add_item(self.items[0])
+        validate_collection(collection)
+        self.items[0].properties["proj:shape"] = [1]
+        with self.assertRaises(STACValidationError):
+            validate_collection(collection)
+        validate_collection(collection, ValidationMode.NONE)